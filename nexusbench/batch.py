@@ -0,0 +1,139 @@
+from typing import Any, Dict, List, Optional, Type
+
+from concurrent.futures import ThreadPoolExecutor
+
+import json
+
+from nexusbench.benchmarks import SingleTurnBenchmark
+from nexusbench.context import benchmark_context
+from nexusbench.pipeline import CPUTask, run_cpu_task
+from nexusbench.scheduler import BenchmarkJob
+from nexusbench.utils import print_benchmark_results, report_exception
+
+
+def batch_custom_id(job: BenchmarkJob, index: int) -> str:
+    """Identifier of a sample's request in a batch, matched with its result."""
+    return f"{job.name}-{job.sample_ids[index]}"
+
+
+def prepare_batch_jobs(
+    runner, benchmarks: List[Type], limit: Optional[int] = None
+) -> List[BenchmarkJob]:
+    """Jobs of the single-turn benchmarks, which need exactly one request per sample."""
+    assert len(runner.targets) == 1, "A batch holds the requests of a single model"
+    single_turn = [b for b in benchmarks if issubclass(b, SingleTurnBenchmark)]
+    for benchmark_class in benchmarks:
+        if benchmark_class not in single_turn:
+            print(f"Skipping {benchmark_class.__name__}, which is not single-turn")
+
+    with ThreadPoolExecutor(runner.num_benchmarks_parallel) as executor:
+        per_benchmark = list(
+            executor.map(lambda b: runner.prepare_benchmark(b, limit), single_turn)
+        )
+    return [job for jobs in per_benchmark for job in jobs]
+
+
+def export_batch(
+    runner, benchmarks: List[Type], path: str, limit: Optional[int] = None
+) -> int:
+    """
+    Write the request of every sample that is not finished yet to `path`, as a batch
+    input file of the model's provider. Returns the number of requests.
+    """
+    jobs = prepare_batch_jobs(runner, benchmarks, limit)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for job in jobs:
+            client = job.target.prompter.get_batch_client()
+            for index, inputs in enumerate(job.inputs):
+                if index in job.completed:
+                    continue
+                steps = job.benchmark.sample_steps(inputs)
+                try:
+                    prompt, _ = next(steps)
+                finally:
+                    steps.close()
+                request = client.get_batch_request(
+                    batch_custom_id(job, index), prompt, job.target.model
+                )
+                f.write(json.dumps(request, default=str) + "\n")
+                count += 1
+
+    print(f"Wrote {count} request(s) to {path}")
+    return count
+
+
+def score_response(job: BenchmarkJob, index: int, response: Any) -> Dict[str, Any]:
+    """
+    Result of a sample whose request was answered by `response`, through the same
+    steps as a live run. A failed request (an exception) fails the sample the same
+    way a request that ran out of retries does.
+    """
+    steps = job.benchmark.sample_steps(job.inputs[index])
+    value, error = response, None
+    if isinstance(response, Exception):
+        value, error = None, response
+    with benchmark_context(job.name):
+        next(steps)
+        while True:
+            try:
+                step = steps.throw(error) if error is not None else steps.send(value)
+            except StopIteration as stop:
+                return stop.value
+
+            if not isinstance(step, CPUTask):
+                steps.close()
+                raise ValueError(f"{job.name} made a second request for a sample")
+            try:
+                value, error = run_cpu_task(step), None
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                value, error = None, e
+
+
+def ingest_batch(
+    runner, benchmarks: List[Type], path: str, limit: Optional[int] = None
+) -> List[tuple]:
+    """
+    Score the samples with the responses of a batch output file at `path`, and
+    print and return their metrics like a run.
+    """
+    jobs = prepare_batch_jobs(runner, benchmarks, limit)
+    client = runner.targets[0].prompter.get_batch_client()
+    responses = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                custom_id, response = client.parse_batch_result(json.loads(line))
+                responses[custom_id] = response
+
+    accuracies = []
+    for job in jobs:
+        missing = 0
+        for index in range(len(job.inputs)):
+            if index in job.completed:
+                continue
+            response = responses.pop(batch_custom_id(job, index), None)
+            if response is None:
+                missing += 1
+                continue
+            try:
+                result = score_response(job, index, response)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                report_exception(e, runner.debug)
+                result = e
+            job.results[index] = result
+            job.completed.add(index)
+            runner.record_result(job, index, result)
+
+        if missing:
+            print(f"{job.name}: {missing} sample(s) have no result in {path}")
+        if job.completed:
+            accuracies.append(
+                (job.benchmark_class, runner.get_metrics(job), job.finished_results())
+            )
+
+    if responses:
+        print(f"{len(responses)} result(s) in {path} match no selected sample")
+    if accuracies:
+        print_benchmark_results(accuracies)
+    return accuracies
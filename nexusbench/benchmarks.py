@@ -1,5 +1,5 @@
 # pylint: disable=unused-wildcard-import,wildcard-import,redefined-outer-name
-from typing import List, Callable, Any, Dict
+from typing import List, Callable, Any, Dict, Generator, Optional, Tuple
 
 from dataclasses import dataclass
 
@@ -11,11 +11,22 @@ import json
 
 import ast
 
+import asyncio
+
 from datasets import load_dataset
 
 from huggingface_hub import create_collection
 
-from nexusbench.utils import parallelize
+from nexusbench.cassettes import CassetteMismatch
+from nexusbench.context import benchmark_context
+from nexusbench.deadlines import (
+    SampleTimeout,
+    check_deadline,
+    deadline_expired,
+    remaining_time,
+)
+from nexusbench.pipeline import CPUTask, arun_cpu_task, io_stage, run_cpu_task
+from nexusbench.utils import parallel_map, report_exception
 
 # Imports here to enable tools to be used
 from nexusbench.tools.relational import *
@@ -116,13 +127,177 @@ class BaseBenchmark(ABC):
     def get_additional_instructions(self):
         return None
 
+    def stream_samples(
+        self,
+        inputs,
+        on_result=None,
+        max_workers: Optional[int] = None,
+        debug: bool = False,
+    ):
+        """
+        Run `inputs` in parallel, yielding `(index, result)` as each sample finishes.
+
+        `index` is the position of the sample in `inputs`, and a sample that raised
+        yields its exception as the result. Runs go through `nexusbench.scheduler`
+        instead; this is for running a single benchmark on its own.
+        """
+        for idx, result in parallel_map(
+            self.process_single_sample,
+            inputs,
+            max_workers=max_workers,
+            on_result=on_result,
+            desc=f"Processing {self.__class__.__name__}",
+        ):
+            if isinstance(result, Exception):
+                report_exception(result, debug)
+            yield idx, result
+
+    def process_sample(
+        self, inputs, max_workers: Optional[int] = None, debug: bool = False
+    ):
+        results = [None] * len(inputs)
+        for idx, result in self.stream_samples(
+            inputs, max_workers=max_workers, debug=debug
+        ):
+            results[idx] = result
+        return results
+
+    def sample_steps(self, inputs) -> Generator[Tuple[Dict, List] | CPUTask, Any, Dict]:
+        """
+        Run a single sample as a generator of model requests.
+
+        Every `(prompt, context)` pair that is yielded must be answered by sending
+        back the raw completion (or throwing the exception raised while getting it),
+        and the result of the sample is the generator's return value. Keeping the
+        sample logic free of I/O lets the same code be driven by a thread or by a
+        coroutine.
+
+        CPU-bound steps such as running the model's calls and scoring them are
+        yielded as a `CPUTask` and answered with its return value, so that they can
+        run on the CPU pool of a `nexusbench.pipeline.Pipeline`.
+        """
+        raise NotImplementedError("Subclasses must implement sample_steps method")
+
+    def timeout_result(self, sample, context=None) -> Dict[str, Any]:
+        """Result recorded for a sample that ran out of its time budget."""
+        return {"Final Accuracy": False, "Timed Out": True, "context": context or []}
+
+    def process_single_sample(self, inputs):
+        sample, _, _, prompter, model = inputs
+        steps = self.sample_steps(inputs)
+        with benchmark_context(type(self).__name__):
+            response, error = None, None
+            while True:
+                try:
+                    if error is not None:
+                        step = steps.throw(error)
+                    else:
+                        step = steps.send(response)
+                except StopIteration as stop:
+                    return stop.value
+
+                if isinstance(step, CPUTask):
+                    try:
+                        response, error = run_cpu_task(step), None
+                    except Exception as e:
+                        response, error = None, e
+                    continue
+
+                prompt, context = step
+                try:
+                    check_deadline()
+                    with io_stage():
+                        response = prompter.get_completion(
+                            prompt, model=model, contextual_history=context
+                        )
+                    error = None
+                except SampleTimeout:
+                    steps.close()
+                    return self.timeout_result(sample, context)
+                except CassetteMismatch:
+                    # A replay that has gone stale is an error of the sample, not
+                    # an answer of the model to score.
+                    steps.close()
+                    raise
+                except Exception as e:
+                    response, error = None, e
+
+    async def aprocess_single_sample(self, inputs):
+        sample, _, _, prompter, model = inputs
+        steps = self.sample_steps(inputs)
+        with benchmark_context(type(self).__name__):
+            response, error = None, None
+            while True:
+                try:
+                    if error is not None:
+                        step = steps.throw(error)
+                    else:
+                        step = steps.send(response)
+                except StopIteration as stop:
+                    return stop.value
+
+                if isinstance(step, CPUTask):
+                    try:
+                        response, error = await arun_cpu_task(step), None
+                    except Exception as e:
+                        response, error = None, e
+                    continue
+
+                prompt, context = step
+                try:
+                    check_deadline()
+                    # Unlike a blocking call, a coroutine can be cut off at the deadline.
+                    with io_stage():
+                        response = await asyncio.wait_for(
+                            prompter.aget_completion(
+                                prompt, model=model, contextual_history=context
+                            ),
+                            remaining_time(),
+                        )
+                    error = None
+                except (SampleTimeout, asyncio.TimeoutError) as e:
+                    if isinstance(e, SampleTimeout) or deadline_expired():
+                        steps.close()
+                        return self.timeout_result(sample, context)
+                    response, error = None, e
+                except CassetteMismatch:
+                    steps.close()
+                    raise
+                except Exception as e:
+                    response, error = None, e
+
+    def estimate_cost(self, sample) -> float:
+        """
+        Expected number of model calls for a sample, used to start long samples first.
+
+        Costs are compared across benchmarks, so overrides should stay in the same
+        unit. Turn counts from previous runs take precedence, see `--cost_history`.
+        """
+        return 1.0
+
+    def reference_calls(self, sample) -> List[str]:
+        """
+        Calls that solve a sample, in the order a model should make them. Used by
+        `nexusbench fake-server` to answer requests from the ground truth, so empty
+        if the ground truth of a benchmark is not a sequence of calls.
+        """
+        reference = sample.reference
+        if isinstance(reference, str):
+            return [call.strip() for call in reference.split(";") if call.strip()]
+        if isinstance(reference, list) and all(isinstance(c, str) for c in reference):
+            return [call.strip() for call in reference if call.strip()]
+        return []
+
+    @staticmethod
+    def sample_accuracy(call) -> float:
+        """Contribution of a single sample result to Accuracy."""
+        if isinstance(call, Exception):
+            return 0
+        return call["Final Accuracy"]
+
     def get_metrics(self, correct_calls):
         return {
-            "Accuracy": sum(
-                call["Final Accuracy"]
-                for call in correct_calls
-                if not isinstance(call, Exception)
-            )
+            "Accuracy": sum(self.sample_accuracy(call) for call in correct_calls)
             / len(correct_calls),
         }
 
@@ -217,8 +392,7 @@ class BaseBenchmark(ABC):
 
 @dataclass
 class SingleTurnBenchmark(BaseBenchmark):
-    @parallelize()
-    def process_sample(inputs):
+    def sample_steps(self, inputs):
         sample, tool_descriptions, benchmark, prompter, model = inputs
         tool_descriptions = benchmark.modify_tool_descriptions(
             tool_descriptions, sample
@@ -237,15 +411,17 @@ class SingleTurnBenchmark(BaseBenchmark):
         # Get completion can raise ValueError hence initializing raw_model_call and model_call to None
         raw_model_call, model_call = None, None
         try:
-            raw_model_call = prompter.get_completion(
-                prompt, model=model, contextual_history=context
-            )
+            raw_model_call = yield prompt, context
             if not isinstance(raw_model_call, str):
                 model_call, _ = prompter.post_process_call(raw_model_call)
             else:
                 model_call = raw_model_call
-            result = benchmark.run_function_calls(model_call, sample)[0]
-            ground_truth = benchmark.run_function_calls(ground_truth, sample)[0]
+            result = (
+                yield CPUTask(benchmark.run_function_calls, (model_call, sample))
+            )[0]
+            ground_truth = (
+                yield CPUTask(benchmark.run_function_calls, (ground_truth, sample))
+            )[0]
         except Exception as e:
             context = prompter.register_context(
                 prompt,
@@ -255,12 +431,22 @@ class SingleTurnBenchmark(BaseBenchmark):
                 f"EXCEPTION: {str(e)}",
                 context,
             )
-            return benchmark.get_result(ground_truth, model_call, None, sample, context)
+            return (
+                yield CPUTask(
+                    benchmark.get_result,
+                    (ground_truth, model_call, None, sample, context),
+                )
+            )
 
         context = prompter.register_context(
             prompt, query, raw_model_call, model_call, result, context
         )
-        return benchmark.get_result(ground_truth, model_call, result, sample, context)
+        return (
+            yield CPUTask(
+                benchmark.get_result,
+                (ground_truth, model_call, result, sample, context),
+            )
+        )
 
     def get_result(self, ground_truth, model_call, result, sample, context):
         return {
@@ -283,6 +469,17 @@ class AgentBenchmark(BaseBenchmark):
     MAX_TURNS: int = 20
     NAME = "AGENT_ABC"
 
+    def timeout_result(self, sample, context=None) -> Dict[str, Any]:
+        result = super().timeout_result(sample, context)
+        result.update({"Max Turns Hit": False, "Invalid Plan": False})
+        return result
+
+    def estimate_cost(self, sample) -> float:
+        # One call per reference step, plus the call that ends the trajectory.
+        if isinstance(sample.reference, list):
+            return min(self.MAX_TURNS, len(sample.reference) + 1)
+        return 2.0
+
     def terminal_condition(
         self, result, ground_truth, model_call, number_of_calls, sample
     ):
@@ -300,8 +497,7 @@ class AgentBenchmark(BaseBenchmark):
         model_call = "END_TOKEN_PREDICTED" if number_of_calls == 0 else "SYNTAX_ERROR"
         return model_call, number_of_calls
 
-    @parallelize()
-    def process_sample(inputs):
+    def sample_steps(self, inputs):
         sample, tool_descriptions, benchmark, prompter, model = inputs
         tool_descriptions = benchmark.modify_tool_descriptions(
             tool_descriptions, sample
@@ -324,9 +520,7 @@ class AgentBenchmark(BaseBenchmark):
             # Get completion can raise ValueError hence initializing raw_model_call and model_call to None
             raw_model_call, model_call = None, None
             try:
-                raw_model_call = prompter.get_completion(
-                    prompt, model=model, contextual_history=context
-                )
+                raw_model_call = yield prompt, context
 
                 model_call, number_of_calls = prompter.post_process_call(raw_model_call)
 
@@ -345,7 +539,9 @@ class AgentBenchmark(BaseBenchmark):
                         context,
                     )
                     break
-                result = benchmark.generate_result(ground_truth, model_call, sample)
+                result = yield CPUTask(
+                    benchmark.generate_result, (ground_truth, model_call, sample)
+                )
             except Exception as e:
                 context = prompter.register_context(
                     prompt,
@@ -355,14 +551,14 @@ class AgentBenchmark(BaseBenchmark):
                     str(e),
                     context,
                 )
+                correct = yield CPUTask(
+                    benchmark.check_correctness,
+                    (ground_truth, prompter.get_model_calls(context), output, sample),
+                )
                 return {
-                    "Final Accuracy": benchmark.check_correctness(
-                        ground_truth, prompter.get_model_calls(context), output, sample
-                    ),
+                    "Final Accuracy": correct,
                     "Max Turns Hit": False,
-                    "Invalid Plan": not benchmark.check_correctness(
-                        ground_truth, prompter.get_model_calls(context), output, sample
-                    ),
+                    "Invalid Plan": not correct,
                     "context": context,
                 }
             output, result = benchmark.aggregate_step(output, result)
@@ -376,8 +572,11 @@ class AgentBenchmark(BaseBenchmark):
             )
 
         return {
-            "Final Accuracy": benchmark.check_correctness(
-                ground_truth, prompter.get_model_calls(context), output, sample
+            "Final Accuracy": (
+                yield CPUTask(
+                    benchmark.check_correctness,
+                    (ground_truth, prompter.get_model_calls(context), output, sample),
+                )
             ),
             "Max Turns Hit": turn_iteration >= benchmark.MAX_TURNS - 1,
             "Invalid Plan": False,
@@ -394,11 +593,7 @@ class AgentBenchmark(BaseBenchmark):
 
     def get_metrics(self, correct_calls):
         return {
-            "Accuracy": sum(
-                call["Final Accuracy"]
-                for call in correct_calls
-                if not isinstance(call, Exception)
-            )
+            "Accuracy": sum(self.sample_accuracy(call) for call in correct_calls)
             / len(correct_calls),
             "Max Turns Hit": sum(
                 call["Max Turns Hit"]
@@ -580,6 +775,9 @@ class TMIHallucination(SingleTurnBenchmark):
             all_samples.append(this_sample)
         return all_samples
 
+    def reference_calls(self, sample) -> List[str]:
+        return [sample.ground_truth_removed]
+
     @property
     def get_additional_instructions(self):
         return "Always use keyword arguments when issuing the function call."
@@ -669,6 +867,13 @@ class LangChainMath(AgentBenchmark):
         so_far = next_item
         return so_far, next_item
 
+    def reference_calls(self, sample) -> List[str]:
+        # Only the answers are known, so they are returned as constants.
+        answers = sample.reference
+        if not isinstance(answers, list):
+            answers = [answers]
+        return [f"return_constant(a={answer!r})" for answer in answers]
+
     @property
     def tools(self) -> List[Callable[..., Any]]:
         from nexusbench.tools.langchain_math import (
@@ -709,6 +914,27 @@ class LangChainMultitoolTypeWriterHard(AgentBenchmark):
     class MTHSample(Sample):
         breadth: int
 
+    def estimate_cost(self, sample) -> float:
+        # The answer is typed one character per call.
+        return min(self.MAX_TURNS, len(str(sample.reference)) + 1)
+
+    # Tools typing the characters that are not letters
+    CHARACTER_TOOLS = {
+        "_": "underscore",
+        "@": "at_sign",
+        ".": "period",
+        ":": "colon",
+        "!": "exclamation_mark",
+        ",": "comma",
+        "-": "hyphen",
+    }
+
+    def reference_calls(self, sample) -> List[str]:
+        return [
+            f"{self.CHARACTER_TOOLS.get(character, character.lower())}()"
+            for character in str(sample.reference)
+        ]
+
     def run_function_calls(
         self, function_calls_str: str, sample: MTHSample
     ) -> List[FunctionCall] | None:
@@ -752,6 +978,20 @@ class LangChainTypeWriterHard(AgentBenchmark):
     class MTHSample(Sample):
         breadth: int
 
+    def estimate_cost(self, sample) -> float:
+        # The answer is typed one character per call.
+        return min(self.MAX_TURNS, len(str(sample.reference)) + 1)
+
+    def reference_calls(self, sample) -> List[str]:
+        return [
+            (
+                f"type_letter(letter={character!r})"
+                if character.isalpha()
+                else f"type_character(character={character!r})"
+            )
+            for character in str(sample.reference)
+        ]
+
     def run_function_calls(
         self, function_calls_str: str, sample: MTHSample
     ) -> List[FunctionCall] | None:
@@ -796,6 +1036,13 @@ class LangChainRelational(AgentBenchmark):
         expected_steps: List[str]
         num_functions: int
 
+    def estimate_cost(self, sample) -> float:
+        return min(self.MAX_TURNS, len(sample.expected_steps) + 1)
+
+    def reference_calls(self, sample) -> List[str]:
+        # Only the functions of the steps are known, not their arguments.
+        return [f"{step}()" for step in sample.expected_steps]
+
     NUM_OF_FUNCTIONS = 10
 
     def run_function_calls(
@@ -851,22 +1098,17 @@ class LangChainRelational(AgentBenchmark):
         local_random.shuffle(sampled_tools)
         return sampled_tools
 
-    def process_sample(self, inputs):
-        new_inputs = []
-        for input in inputs:
-            sample, tool_descriptions, benchmark, prompter, model = input
-            sampled_tools = benchmark.get_sampled_tools(sample)
-            tool_descriptions = prompter.construct_tool_descriptions(
-                benchmark, sampled_tools
-            )
-            new_inputs.append((sample, tool_descriptions, benchmark, prompter, model))
-
-        result = super(LangChainRelational, benchmark).process_sample(new_inputs)
-
-        for res in result:
-            if not isinstance(res, Exception):
-                res["Num Functions"] = sample.num_functions
+    def sample_steps(self, inputs):
+        sample, tool_descriptions, benchmark, prompter, model = inputs
+        sampled_tools = benchmark.get_sampled_tools(sample)
+        tool_descriptions = prompter.construct_tool_descriptions(
+            benchmark, sampled_tools
+        )
 
+        result = yield from super().sample_steps(
+            (sample, tool_descriptions, benchmark, prompter, model)
+        )
+        result["Num Functions"] = sample.num_functions
         return result
 
     def aggregate_step(self, so_far, next_item):
@@ -917,6 +1159,10 @@ class MultiverseMathHard(LangChainMath):
         depth: int
         breadth: int
 
+    def estimate_cost(self, sample) -> float:
+        # Roughly one call per operation of the nested expression.
+        return min(self.MAX_TURNS, sample.depth * max(1, sample.breadth) + 1)
+
     def check_correctness(self, ground_truth, model_calls, output, sample):
         if not output:
             return False
@@ -979,16 +1225,18 @@ class MultiverseMathHard(LangChainMath):
             for d in dataset
         ]
 
-    def process_sample(self, inputs):
-        results = LangChainMath.process_sample(self, inputs)
+    def sample_steps(self, inputs):
+        result = yield from super().sample_steps(inputs)
 
-        for this_sample, this_result in zip(inputs, results):
-            if not isinstance(this_result, Exception):
-                # Add depth and breadth to each sample
-                this_result["Depth"] = this_sample[0].depth
-                this_result["Breadth"] = this_sample[0].breadth
+        # Add depth and breadth to each sample
+        result["Depth"] = inputs[0].depth
+        result["Breadth"] = inputs[0].breadth
+        return result
 
-        return results
+    def timeout_result(self, sample, context=None) -> Dict[str, Any]:
+        result = super().timeout_result(sample, context)
+        result.update({"Depth": sample.depth, "Breadth": sample.breadth})
+        return result
 
     def get_metrics(self, correct_calls):
         from tabulate import tabulate
@@ -0,0 +1,147 @@
+from typing import Any, List, Optional, Tuple
+
+from contextlib import contextmanager
+
+from contextvars import ContextVar
+
+import gzip
+
+import os
+
+import pickle
+
+import threading
+
+
+CASSETTE_MODES = ("record", "replay")
+CASSETTE_VERSION = 1
+
+
+class CassetteMismatch(Exception):
+    """A replayed sample made a request that its cassette does not have."""
+
+
+class Cassette:
+    """
+    The requests of a single sample and their responses, in the order they were made.
+
+    A replayed cassette hands out its responses in the same order, and checks that
+    every request has the key (see `nexusbench.completion_cache.cache_key`) it was
+    recorded with, so that a change to how prompts are built is caught instead of
+    silently scored against stale responses.
+    """
+
+    def __init__(self, mode: str, interactions: Optional[List[Tuple[str, Any]]] = None):
+        self.mode = mode
+        self.interactions = interactions if interactions is not None else []
+        self.position = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, key: str, response: Any):
+        self.interactions.append((key, response))
+
+    def replay(self, key: str) -> Any:
+        if self.position >= len(self.interactions):
+            raise CassetteMismatch(
+                f"Request {self.position + 1} was not recorded, the cassette has "
+                f"{len(self.interactions)} request(s)"
+            )
+        recorded_key, response = self.interactions[self.position]
+        if recorded_key != key:
+            raise CassetteMismatch(
+                f"Request {self.position + 1} differs from the recorded request"
+            )
+        self.position += 1
+        return response
+
+
+# Cassette of the sample being processed. Set by the schedulers, and read by
+# `FCAPIPrompter.get_completion` to record or replay the sample's requests.
+current_cassette: ContextVar[Optional[Cassette]] = ContextVar(
+    "current_cassette", default=None
+)
+
+
+class CassetteLibrary:
+    """
+    Directory of cassettes, one gzipped pickle per model, benchmark and sample.
+
+    While recording, the cassette of a sample is written once the sample finishes, so
+    that samples that raised are not recorded. While replaying, no request leaves the
+    process: every response comes from the cassettes, and a sample without a
+    cassette fails.
+    """
+
+    def __init__(self, directory: str, mode: str):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(
+                f"Unknown cassette mode {mode}, expected one of {CASSETTE_MODES}"
+            )
+        self.directory = directory
+        self.mode = mode
+        self.recorded = 0
+        self.replayed = 0
+        self.interactions = 0
+        self._lock = threading.Lock()
+
+    def path(self, config_key: str, benchmark_name: str, sample_id: str) -> str:
+        return os.path.join(
+            self.directory, config_key, benchmark_name, f"{sample_id}.pkl.gz"
+        )
+
+    def load(self, path: str) -> Cassette:
+        try:
+            with gzip.open(path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError as e:
+            raise CassetteMismatch(f"No cassette at {path}") from e
+        if data.get("version") != CASSETTE_VERSION:
+            raise CassetteMismatch(f"Unsupported cassette version at {path}")
+        return Cassette("replay", data["interactions"])
+
+    def save(self, path: str, cassette: Cassette):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a temporary file first, so that an interrupted run never leaves
+        # a truncated cassette behind.
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(partial, "wb") as f:
+            pickle.dump(
+                {"version": CASSETTE_VERSION, "interactions": cassette.interactions},
+                f,
+            )
+        os.replace(partial, path)
+
+    @contextmanager
+    def sample(self, config_key: str, benchmark_name: str, sample_id: str):
+        """Records or replays the requests of a sample run inside this context."""
+        path = self.path(config_key, benchmark_name, sample_id)
+        cassette = self.load(path) if self.mode == "replay" else Cassette("record")
+        token = current_cassette.set(cassette)
+        try:
+            yield cassette
+        finally:
+            current_cassette.reset(token)
+
+        if cassette.replaying:
+            with self._lock:
+                self.replayed += 1
+                self.interactions += cassette.position
+        elif cassette.interactions:
+            self.save(path, cassette)
+            with self._lock:
+                self.recorded += 1
+                self.interactions += len(cassette.interactions)
+
+    def summary(self) -> str:
+        if self.mode == "replay":
+            return (
+                f"Cassettes: replayed {self.replayed} sample(s) and "
+                f"{self.interactions} request(s) from {self.directory}"
+            )
+        return (
+            f"Cassettes: recorded {self.recorded} sample(s) and "
+            f"{self.interactions} request(s) to {self.directory}"
+        )
@@ -1,80 +1,559 @@
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from openai import OpenAI
+from dataclasses import dataclass, replace
 
-from anthropic import Anthropic
+from contextlib import asynccontextmanager, contextmanager
 
-from nexusbench.utils import handle_exceptions
+import asyncio
+
+import threading
+
+import time
+
+import httpx
+
+from openai import OpenAI, AsyncOpenAI
+import openai
+
+from anthropic import Anthropic, AsyncAnthropic
+import anthropic
+
+from nexusbench.concurrency import AdaptiveConcurrencyController
+from nexusbench.connections import ConnectionStats
+from nexusbench.context import current_benchmark
+from nexusbench.deadlines import check_deadline, remaining_time
+from nexusbench.endpoints import EndpointPool
+from nexusbench.hedging import HedgingPolicy
+from nexusbench.prompt_caching import PromptCacheStats
+from nexusbench.rate_limits import RateLimiter
+from nexusbench.usage import TokenUsage, count_duplicate
+from nexusbench.streaming import (
+    AnthropicStreamAccumulator,
+    OpenAIStreamAccumulator,
+    QwenStreamAccumulator,
+    StreamStats,
+)
+from nexusbench.retries import FATAL, RetryPolicy, classify_error, with_retries
+from nexusbench.utils import estimate_tokens
+
+
+class BatchRequestError(Exception):
+    """A request of a provider batch (see `nexusbench.batch`) failed."""
+
+
+@dataclass
+class RequestAttempt:
+    prompt: Any
+    estimated_tokens: int = 0
+    response: Any = None
+    # The provider SDK client to send this attempt with, see `BaseClient.request_slot`
+    client: Any = None
+    # Gives back the attempt's concurrency and replica slots, see `BaseClient.send`
+    release: Optional[Callable[..., None]] = None
 
 
 class BaseClient:
-    def __init__(self, api_key, base_url: Optional[str] = None):
+    def __init__(
+        self,
+        api_key,
+        base_url: Optional[str] = None,
+        concurrency_controller: Optional[AdaptiveConcurrencyController] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        endpoint_pool: Optional[EndpointPool] = None,
+        hedging_policy: Optional[HedgingPolicy] = None,
+        request_timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        connection_stats: Optional[ConnectionStats] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        prompt_cache_stats: Optional[PromptCacheStats] = None,
+        stream: bool = False,
+        stream_stats: Optional[StreamStats] = None,
+        sdk_client: bool = True,
+    ):
         self.api_key = api_key
+        self.prompt_cache_stats = prompt_cache_stats
+        # Stream responses, and stop them once their first tool call is complete
+        self.stream = stream
+        self.stream_stats = stream_stats
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.request_timeout = request_timeout
+        self.max_connections = max_connections
+        self.connection_stats = connection_stats
         self.base_url = base_url
-        self.client = self.create_client()
+        self.concurrency_controller = concurrency_controller
+        self.rate_limiter = rate_limiter
+        self.endpoint_pool = endpoint_pool
+        self.hedging_policy = hedging_policy
+        # With an endpoint pool, one SDK client is created lazily per replica. Without
+        # `sdk_client`, none is, and the client only builds and parses requests.
+        self.replica_clients = {}
+        self._replica_lock = threading.Lock()
+        self.client = None
+        if sdk_client and endpoint_pool is None:
+            self.client = self.create_client()
 
-    def create_client(self):
+    def create_client(self, base_url: Optional[str] = None):
         raise NotImplementedError("Subclasses must implement create_client method")
 
-    @handle_exceptions
+    def get_replica_client(self, base_url: str):
+        with self._replica_lock:
+            if base_url not in self.replica_clients:
+                self.replica_clients[base_url] = self.create_client(base_url)
+            return self.replica_clients[base_url]
+
+    def get_sdk_clients(self):
+        if self.client is not None:
+            return [self.client]
+        return list(self.replica_clients.values())
+
+    def classify_error(self, e: Exception) -> str:
+        """Kind of a request error, which decides how it is retried."""
+        return classify_error(e)
+
+    def get_completion_kwargs(self, prompt, model):
+        """Arguments of the provider SDK's completion call."""
+        raise NotImplementedError(
+            "Subclasses must implement get_completion_kwargs method"
+        )
+
+    def get_request_payload(self, prompt, model):
+        """Everything the completion of a request depends on, used as its cache key."""
+        return {"model": model, **self.get_completion_kwargs(prompt, model)}
+
+    def get_batch_request(self, custom_id: str, prompt, model) -> Dict[str, Any]:
+        """A line of the provider's batch input file, see `nexusbench.batch`."""
+        raise ValueError(f"{type(self).__name__} does not support batch APIs")
+
+    def parse_batch_result(self, line: Dict[str, Any]) -> Tuple[str, Any]:
+        """
+        Custom ID and response of a line of the provider's batch output file. A failed
+        request has a `BatchRequestError` instead of a response.
+        """
+        raise ValueError(f"{type(self).__name__} does not support batch APIs")
+
+    def create_completion(self, client, prompt, model):
+        """Send a single request with the given provider SDK client."""
+        raise NotImplementedError("Subclasses must implement create_completion method")
+
+    @with_retries
     def get_completion(self, prompt, model=None, contextual_history=None):
         raise NotImplementedError("Subclasses must implement get_completion method")
 
-    def get_client_params(self, base_url_key: str = "base_url"):
+    def send(self, attempt: RequestAttempt, model):
+        """
+        Send the attempt's prompt, hedged if a hedging policy is set.
+
+        Each copy of a hedged request holds its own quota, concurrency slot and
+        replica until it is done, so a losing copy that is still running keeps
+        counting against them, and it is billed to the request.
+        """
+        if self.hedging_policy is None:
+            return self.create_completion(attempt.client, attempt.prompt, model)
+
+        copies: Dict[str, Any] = {}
+
+        def hedge():
+            # A thread cannot be cancelled, so once fired the duplicate is billed.
+            copies["hedge"] = None
+            hedge_attempt = RequestAttempt(
+                attempt.prompt, attempt.estimated_tokens, client=self.client
+            )
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(hedge_attempt.estimated_tokens)
+            hedge_attempt.release = self._take_slots(hedge_attempt)
+            return self._send_copy(copies, "hedge", hedge_attempt, model)
+
+        response = self.hedging_policy.run(
+            (current_benchmark.get(), model),
+            lambda: self._send_copy(copies, "primary", attempt, model),
+            hedge,
+        )
+        self._count_duplicate(copies, response, cancelled=False)
+        return response
+
+    async def asend(self, attempt: RequestAttempt, model):
+        if self.hedging_policy is None:
+            return await self.create_completion(attempt.client, attempt.prompt, model)
+
+        copies: Dict[str, Any] = {}
+
+        async def hedge():
+            hedge_attempt = RequestAttempt(
+                attempt.prompt, attempt.estimated_tokens, client=self.client
+            )
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(hedge_attempt.estimated_tokens)
+            hedge_attempt.release = await self._atake_slots(hedge_attempt)
+            return await self._asend_copy(copies, "hedge", hedge_attempt, model)
+
+        response = await self.hedging_policy.arun(
+            (current_benchmark.get(), model),
+            lambda: self._asend_copy(copies, "primary", attempt, model),
+            hedge,
+        )
+        # The losing task is cancelled.
+        self._count_duplicate(copies, response, cancelled=True)
+        return response
+
+    def _send_copy(self, copies: Dict[str, Any], name: str, attempt, model):
+        copies[name] = None
+        try:
+            response = self.create_completion(attempt.client, attempt.prompt, model)
+        except BaseException as e:
+            copies[name] = e
+            attempt.release(e)
+            raise
+        attempt.release()
+        copies[name] = response
+        self._finish_attempt(attempt, response)
+        return response
+
+    async def _asend_copy(self, copies: Dict[str, Any], name: str, attempt, model):
+        copies[name] = None
+        try:
+            response = await self.create_completion(
+                attempt.client, attempt.prompt, model
+            )
+        except BaseException as e:
+            copies[name] = e
+            attempt.release(e)
+            raise
+        attempt.release()
+        copies[name] = response
+        self._finish_attempt(attempt, response)
+        return response
+
+    def _count_duplicate(self, copies: Dict[str, Any], response, cancelled: bool):
+        """
+        Bill the losing copy of a hedged request. A loser that is still running is
+        billed the winner's usage, as it was sent the same prompt, or only its input
+        tokens if it is `cancelled`. A loser that failed is not billed.
+        """
+        if "hedge" not in copies:
+            return
+        loser = copies["primary"] if response is copies["hedge"] else copies["hedge"]
+        if isinstance(loser, BaseException):
+            return
+        if loser is not None:
+            count_duplicate(self.get_token_usage(loser))
+            return
+        usage = self.get_token_usage(response)
+        if usage is not None and cancelled:
+            usage = replace(usage, output_tokens=0)
+        count_duplicate(usage)
+
+    def get_client_params(
+        self, base_url_key: str = "base_url", base_url: Optional[str] = None
+    ):
         params = {"api_key": self.api_key}
-        if self.base_url is not None:
-            params[base_url_key] = self.base_url
+        base_url = base_url or self.base_url
+        if base_url is not None:
+            params[base_url_key] = base_url
+        if self.request_timeout is not None:
+            params["timeout"] = self.request_timeout
+        # Retries are left to the retry policy, see `with_retries`.
+        params["max_retries"] = 0
 
         return params
 
+    def get_http_client_kwargs(self, http_client_class, is_async: bool = False):
+        """
+        `http_client` argument of SDKs built on httpx, limited to `max_connections`
+        and counted in `connection_stats`; empty keeps the SDK's own HTTP client.
+        """
+        if self.connection_stats is None and self.max_connections is None:
+            return {}
+        stats = self.connection_stats or ConnectionStats()
+        return {
+            "http_client": http_client_class(
+                **stats.http_client_kwargs(self.max_connections, is_async)
+            )
+        }
+
+    def get_timeout_kwargs(self):
+        """Per-request timeout for SDKs that accept one; empty keeps the SDK default."""
+        timeout = self.get_call_timeout()
+        return {} if timeout is None else {"timeout": timeout}
+
+    def add_call_timeout_hook(self, http_client, is_async: bool = False):
+        """
+        Time out every request of an httpx client at `get_call_timeout`, for SDKs
+        whose calls take no timeout.
+        """
+
+        def set_timeout(request: httpx.Request):
+            timeout = self.get_call_timeout()
+            if timeout is not None:
+                request.extensions["timeout"] = httpx.Timeout(timeout).as_dict()
+
+        async def aset_timeout(request: httpx.Request):
+            set_timeout(request)
+
+        http_client.event_hooks["request"].append(
+            aset_timeout if is_async else set_timeout
+        )
+
+    def get_call_timeout(self) -> Optional[float]:
+        """Timeout of a single request: the request timeout, capped by the sample's budget."""
+        remaining = remaining_time()
+        if remaining is None:
+            return self.request_timeout
+        remaining = max(remaining, 0.001)
+        if self.request_timeout is None:
+            return remaining
+        return min(self.request_timeout, remaining)
+
+    def get_usage_tokens(self, response) -> Optional[int]:
+        """Total tokens billed for a response, if the provider reports them."""
+        usage = getattr(response, "usage", None)
+        return getattr(usage, "total_tokens", None)
+
+    def get_token_usage(self, response) -> Optional[TokenUsage]:
+        """Tokens of a response, if the provider reports them."""
+        # OpenAI-compatible APIs cache long prompts automatically, and only report reads.
+        usage = getattr(response, "usage", None)
+        if getattr(usage, "prompt_tokens", None) is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or 0
+        return TokenUsage(
+            usage.prompt_tokens - cached, usage.completion_tokens or 0, cached
+        )
+
+    def record_stream(self, accumulator):
+        if self.stream_stats is not None:
+            self.stream_stats.record(
+                current_benchmark.get(), accumulator.timer, accumulator.cut_off
+            )
+
+    def _finish_attempt(self, attempt: RequestAttempt, response):
+        """Account for the usage of the response an attempt was sent, once."""
+        if response is None:
+            return
+        if self.rate_limiter is not None:
+            self.rate_limiter.reconcile(
+                attempt.estimated_tokens, self.get_usage_tokens(response)
+            )
+        if self.prompt_cache_stats is not None:
+            usage = self.get_token_usage(response)
+            if usage is not None:
+                self.prompt_cache_stats.record(current_benchmark.get(), usage)
+
+    @contextmanager
+    def request_slot(self, prompt=None):
+        """
+        Held for the duration of every request attempt, retries included.
+
+        Draws from the shared rate limiter before taking a concurrency slot, so that
+        requests waiting on quota do not count as in flight. With an endpoint pool,
+        every attempt (and so every retry) picks its replica anew.
+        """
+        check_deadline()
+        attempt = RequestAttempt(prompt, estimate_tokens(prompt), client=self.client)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(attempt.estimated_tokens)
+
+        attempt.release = self._take_slots(attempt)
+        with self._holding_slots(attempt):
+            yield attempt
+        # Each copy of a hedged request is finished with its own response, while
+        # `attempt.response` is the winner's, see `send`.
+        if self.hedging_policy is None:
+            self._finish_attempt(attempt, attempt.response)
+
+    @asynccontextmanager
+    async def arequest_slot(self, prompt=None):
+        check_deadline()
+        attempt = RequestAttempt(prompt, estimate_tokens(prompt), client=self.client)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(attempt.estimated_tokens)
+
+        attempt.release = await self._atake_slots(attempt)
+        with self._holding_slots(attempt):
+            yield attempt
+        if self.hedging_policy is None:
+            self._finish_attempt(attempt, attempt.response)
+
+    @contextmanager
+    def _holding_slots(self, attempt: RequestAttempt):
+        try:
+            yield
+        except BaseException as e:
+            attempt.release(e)
+            raise
+        # A hedged request's slots are given back by its copy, see `send`.
+        if self.hedging_policy is None:
+            attempt.release()
+
+    def _take_slots(self, attempt: RequestAttempt) -> Callable[..., None]:
+        """Take a concurrency slot and a replica for `attempt`, see `_slot_release`."""
+        if self.concurrency_controller is not None:
+            self.concurrency_controller.acquire()
+        return self._slot_release(attempt)
+
+    async def _atake_slots(self, attempt: RequestAttempt) -> Callable[..., None]:
+        if self.concurrency_controller is not None:
+            await self.concurrency_controller.aacquire()
+        return self._slot_release(attempt)
+
+    def _slot_release(self, attempt: RequestAttempt) -> Callable[..., None]:
+        """
+        Pick the attempt's replica, and return the function giving back its slots
+        (with the error the attempt failed with, if any). It can be called again.
+        """
+        controller = self.concurrency_controller
+        started = time.monotonic()
+        endpoint = None
+        released = False
+        lock = threading.Lock()
+
+        def release(error: Optional[BaseException] = None):
+            nonlocal released
+            with lock:
+                if released:
+                    return
+                released = True
+            if endpoint is not None:
+                self.endpoint_pool.release(endpoint, error)
+            if controller is not None:
+                controller.release(started, error)
+
+        if self.endpoint_pool is not None:
+            endpoint = self.endpoint_pool.acquire()
+            try:
+                attempt.client = self.get_replica_client(endpoint.url)
+            except BaseException as e:
+                release(e)
+                raise
+        return release
+
+    async def aclose(self):
+        pass
+
 
 class QwenFCClient(BaseClient):
-    def __init__(self, api_key, base_url, model):
-        self.api_key = api_key
-        self.base_url = base_url
+    def __init__(
+        self,
+        api_key,
+        base_url,
+        model,
+        concurrency_controller=None,
+        rate_limiter=None,
+        endpoint_pool=None,
+        hedging_policy=None,
+        request_timeout=None,
+        max_connections=None,
+        connection_stats=None,
+        retry_policy=None,
+        prompt_cache_stats=None,
+        stream=False,
+        stream_stats=None,
+        sdk_client=True,
+    ):
         self.model = model
-        self.client = self.create_client()
+        super().__init__(
+            api_key,
+            base_url,
+            concurrency_controller,
+            rate_limiter,
+            endpoint_pool,
+            hedging_policy,
+            request_timeout,
+            max_connections,
+            connection_stats,
+            retry_policy,
+            prompt_cache_stats,
+            stream,
+            stream_stats,
+            sdk_client,
+        )
 
-    def create_client(self):
+    def create_client(self, base_url: Optional[str] = None):
         from qwen_agent.llm import get_chat_model
 
         llm = get_chat_model(
             {
                 "model": self.model,
-                "model_server": self.base_url,
+                "model_server": base_url or self.base_url,
                 "api_key": self.api_key,
             }
         )
         return llm
 
-    @handle_exceptions
-    def get_completion(
-        self,
-        prompt,
-        model="Nexusflow/Qwen-2.5-72B-Instruct",
-        contextual_history=None,
-    ):
-        for responses in self.client.chat(
+    def get_completion_kwargs(self, prompt, model):
+        return dict(
             messages=prompt["messages"],
             functions=prompt["tools"],
             extra_generate_cfg=dict(
                 parallel_function_calls=False, temperature=0.0, max_tokens=1024
             ),
-        ):
+        )
+
+    def get_chat_kwargs(self, prompt, model):
+        """Completion kwargs with this request's timeout, which qwen-agent passes on."""
+        kwargs = self.get_completion_kwargs(prompt, model)
+        timeout = self.get_call_timeout()
+        if timeout is not None:
+            kwargs["extra_generate_cfg"]["request_timeout"] = timeout
+        return kwargs
+
+    def create_completion(self, client, prompt, model):
+        if self.stream:
+            accumulator = QwenStreamAccumulator()
+            stream = client.chat(**self.get_chat_kwargs(prompt, model))
+            try:
+                for responses in stream:
+                    if accumulator.add(responses):
+                        accumulator.cut_off = True
+                        break
+            finally:
+                stream.close()
+            self.record_stream(accumulator)
+            return accumulator.result()
+
+        for responses in client.chat(**self.get_chat_kwargs(prompt, model)):
             pass
 
         return responses[0]
 
+    @with_retries
+    def get_completion(
+        self,
+        prompt,
+        model="Nexusflow/Qwen-2.5-72B-Instruct",
+        contextual_history=None,
+    ):
+        with self.request_slot(prompt) as attempt:
+            attempt.response = self.send(attempt, model)
+        return attempt.response
 
-class OpenAIFCClient(BaseClient):
-    def create_client(self):
-        return OpenAI(**self.get_client_params())
 
-    @handle_exceptions
-    def get_completion(
-        self, prompt, model="gpt-4-0125-preview", contextual_history=None
+class AsyncQwenFCClient(QwenFCClient):
+    async def create_completion(self, client, prompt, model):
+        # qwen-agent only ships a blocking streaming client.
+        return await asyncio.to_thread(super().create_completion, client, prompt, model)
+
+    @with_retries
+    async def get_completion(
+        self,
+        prompt,
+        model="Nexusflow/Qwen-2.5-72B-Instruct",
+        contextual_history=None,
     ):
-        response = self.client.chat.completions.create(
+        async with self.arequest_slot(prompt) as attempt:
+            attempt.response = await self.asend(attempt, model)
+        return attempt.response
+
+
+class OpenAIFCClient(BaseClient):
+    def create_client(self, base_url: Optional[str] = None):
+        return OpenAI(
+            **self.get_client_params(base_url=base_url),
+            **self.get_http_client_kwargs(openai.DefaultHttpxClient),
+        )
+
+    def get_completion_kwargs(self, prompt, model):
+        return dict(
             model=model,
             messages=prompt["messages"],
             tools=prompt["tools"],
@@ -84,20 +563,125 @@ class OpenAIFCClient(BaseClient):
             parallel_tool_calls=False,
         )
 
-        return response
+    def classify_error(self, e: Exception) -> str:
+        # OpenAI reports an exhausted quota as a 429, but it does not come back.
+        if getattr(e, "code", None) == "insufficient_quota":
+            return FATAL
+        return super().classify_error(e)
 
+    def get_batch_request(self, custom_id: str, prompt, model) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": self.get_completion_kwargs(prompt, model),
+        }
 
-class MistralFCClient(BaseClient):
-    def create_client(self):
-        from mistralai.client import MistralClient
+    def parse_batch_result(self, line: Dict[str, Any]) -> Tuple[str, Any]:
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            error = line.get("error") or (response.get("body") or {}).get("error")
+            return line["custom_id"], BatchRequestError(
+                f"Status {response.get('status_code')}: {error}"
+            )
+        completion = openai.types.chat.ChatCompletion.model_validate(response["body"])
+        return line["custom_id"], completion
 
-        return MistralClient(**self.get_client_params("endpoint"))
+    def create_completion(self, client, prompt, model):
+        if self.stream:
+            return self.stream_completion(client, prompt, model)
+        return client.chat.completions.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+        )
 
-    @handle_exceptions
+    def stream_completion(self, client, prompt, model):
+        accumulator = OpenAIStreamAccumulator(estimate_tokens(prompt))
+        stream = client.chat.completions.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            for chunk in stream:
+                if accumulator.add(chunk):
+                    # Closing the connection stops the generation.
+                    accumulator.cut_off = True
+                    break
+        finally:
+            stream.close()
+        self.record_stream(accumulator)
+        return accumulator.result()
+
+    @with_retries
     def get_completion(
-        self, prompt, model="mistral-large-2407", contextual_history=None
+        self, prompt, model="gpt-4-0125-preview", contextual_history=None
     ):
-        response = self.client.chat(
+        with self.request_slot(prompt) as attempt:
+            attempt.response = self.send(attempt, model)
+
+        return attempt.response
+
+
+class AsyncOpenAIFCClient(OpenAIFCClient):
+    def create_client(self, base_url: Optional[str] = None):
+        return AsyncOpenAI(
+            **self.get_client_params(base_url=base_url),
+            **self.get_http_client_kwargs(openai.DefaultAsyncHttpxClient, True),
+        )
+
+    async def create_completion(self, client, prompt, model):
+        if self.stream:
+            return await self.stream_completion(client, prompt, model)
+        return await client.chat.completions.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+        )
+
+    async def stream_completion(self, client, prompt, model):
+        accumulator = OpenAIStreamAccumulator(estimate_tokens(prompt))
+        stream = await client.chat.completions.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        try:
+            async for chunk in stream:
+                if accumulator.add(chunk):
+                    accumulator.cut_off = True
+                    break
+        finally:
+            await stream.close()
+        self.record_stream(accumulator)
+        return accumulator.result()
+
+    @with_retries
+    async def get_completion(
+        self, prompt, model="gpt-4-0125-preview", contextual_history=None
+    ):
+        async with self.arequest_slot(prompt) as attempt:
+            attempt.response = await self.asend(attempt, model)
+
+        return attempt.response
+
+    async def aclose(self):
+        for client in self.get_sdk_clients():
+            await client.close()
+
+
+class MistralFCClient(BaseClient):
+    def create_client(self, base_url: Optional[str] = None):
+        from mistralai.client import MistralClient
+
+        client = MistralClient(**self.get_client_params("endpoint", base_url=base_url))
+        # MistralClient.chat takes no timeout, so it is set on each request instead.
+        self.add_call_timeout_hook(client._client)  # pylint: disable=protected-access
+        return client
+
+    def get_completion_kwargs(self, prompt, model):
+        return dict(
             model=model,
             messages=prompt["messages"],
             tools=prompt["tools"],
@@ -105,18 +689,51 @@ class MistralFCClient(BaseClient):
             max_tokens=2048,
             temperature=0.0,
         )
-        return response
 
+    def create_completion(self, client, prompt, model):
+        return client.chat(**self.get_completion_kwargs(prompt, model))
 
-class AnthropicFCClient(BaseClient):
-    def create_client(self):
-        return Anthropic(**self.get_client_params())
-
-    @handle_exceptions
+    @with_retries
     def get_completion(
-        self, prompt, model="claude-3-5-sonnet-20240620", contextual_history=None
+        self, prompt, model="mistral-large-2407", contextual_history=None
     ):
-        response = self.client.messages.create(
+        with self.request_slot(prompt) as attempt:
+            attempt.response = self.send(attempt, model)
+        return attempt.response
+
+
+class AsyncMistralFCClient(MistralFCClient):
+    def create_client(self, base_url: Optional[str] = None):
+        from mistralai.async_client import MistralAsyncClient
+
+        client = MistralAsyncClient(
+            **self.get_client_params("endpoint", base_url=base_url)
+        )
+        # pylint: disable-next=protected-access
+        self.add_call_timeout_hook(client._client, is_async=True)
+        return client
+
+    async def create_completion(self, client, prompt, model):
+        return await client.chat(**self.get_completion_kwargs(prompt, model))
+
+    @with_retries
+    async def get_completion(
+        self, prompt, model="mistral-large-2407", contextual_history=None
+    ):
+        async with self.arequest_slot(prompt) as attempt:
+            attempt.response = await self.asend(attempt, model)
+        return attempt.response
+
+
+class AnthropicFCClient(BaseClient):
+    def create_client(self, base_url: Optional[str] = None):
+        return Anthropic(
+            **self.get_client_params(base_url=base_url),
+            **self.get_http_client_kwargs(anthropic.DefaultHttpxClient),
+        )
+
+    def get_completion_kwargs(self, prompt, model):
+        return dict(
             model=model,
             messages=prompt["messages"],
             tools=prompt["tools"],
@@ -126,4 +743,116 @@ class AnthropicFCClient(BaseClient):
             temperature=0.0,
         )
 
-        return response
+    def get_usage_tokens(self, response) -> Optional[int]:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None
+        return usage.input_tokens + usage.output_tokens
+
+    def get_token_usage(self, response) -> Optional[TokenUsage]:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None
+        return TokenUsage(
+            usage.input_tokens,
+            usage.output_tokens,
+            getattr(usage, "cache_read_input_tokens", None) or 0,
+            getattr(usage, "cache_creation_input_tokens", None) or 0,
+        )
+
+    def get_batch_request(self, custom_id: str, prompt, model) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "params": self.get_completion_kwargs(prompt, model),
+        }
+
+    def parse_batch_result(self, line: Dict[str, Any]) -> Tuple[str, Any]:
+        result = line["result"]
+        if result["type"] != "succeeded":
+            return line["custom_id"], BatchRequestError(
+                f"Request {result['type']}: {result.get('error')}"
+            )
+        return line["custom_id"], anthropic.types.Message.model_validate(
+            result["message"]
+        )
+
+    def create_completion(self, client, prompt, model):
+        if self.stream:
+            return self.stream_completion(client, prompt, model)
+        return client.messages.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+        )
+
+    def stream_completion(self, client, prompt, model):
+        accumulator = AnthropicStreamAccumulator()
+        stream = client.messages.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+            stream=True,
+        )
+        try:
+            for event in stream:
+                if accumulator.add(event):
+                    # Closing the connection stops the generation.
+                    accumulator.cut_off = True
+                    break
+        finally:
+            stream.close()
+        self.record_stream(accumulator)
+        return accumulator.result()
+
+    @with_retries
+    def get_completion(
+        self, prompt, model="claude-3-5-sonnet-20240620", contextual_history=None
+    ):
+        with self.request_slot(prompt) as attempt:
+            attempt.response = self.send(attempt, model)
+
+        return attempt.response
+
+
+class AsyncAnthropicFCClient(AnthropicFCClient):
+    def create_client(self, base_url: Optional[str] = None):
+        return AsyncAnthropic(
+            **self.get_client_params(base_url=base_url),
+            **self.get_http_client_kwargs(anthropic.DefaultAsyncHttpxClient, True),
+        )
+
+    async def create_completion(self, client, prompt, model):
+        if self.stream:
+            return await self.stream_completion(client, prompt, model)
+        return await client.messages.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+        )
+
+    async def stream_completion(self, client, prompt, model):
+        accumulator = AnthropicStreamAccumulator()
+        stream = await client.messages.create(
+            **self.get_completion_kwargs(prompt, model),
+            **self.get_timeout_kwargs(),
+            stream=True,
+        )
+        try:
+            async for event in stream:
+                if accumulator.add(event):
+                    accumulator.cut_off = True
+                    break
+        finally:
+            await stream.close()
+        self.record_stream(accumulator)
+        return accumulator.result()
+
+    @with_retries
+    async def get_completion(
+        self, prompt, model="claude-3-5-sonnet-20240620", contextual_history=None
+    ):
+        async with self.arequest_slot(prompt) as attempt:
+            attempt.response = await self.asend(attempt, model)
+
+        return attempt.response
+
+    async def aclose(self):
+        for client in self.get_sdk_clients():
+            await client.close()
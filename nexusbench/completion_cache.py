@@ -0,0 +1,177 @@
+from typing import Any, Optional
+
+import hashlib
+
+import json
+
+import os
+
+import pickle
+
+import sqlite3
+
+import threading
+
+import time
+
+
+CACHE_MODES = ("read", "write", "readwrite", "off")
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "nexusbench", "completions.sqlite")
+
+
+def _to_json(value: Any) -> Any:
+    # Responses of previous turns are embedded in the messages as SDK objects.
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def cache_key(
+    provider: str, model: Optional[str], base_url: Optional[str], payload
+) -> str:
+    """Content hash of a request: its provider, model, endpoint and full payload."""
+    canonical = json.dumps(
+        [provider, model, base_url, payload],
+        sort_keys=True,
+        separators=(",", ":"),
+        default=_to_json,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CompletionCache:
+    """
+    On-disk cache of completions, keyed by `cache_key`.
+
+    All clients sample with `temperature=0.0`, so a request is expected to get the
+    same completion every time. Responses are pickled into a SQLite database, and
+    once the stored responses exceed `max_bytes`, the least recently used ones are
+    evicted. In "read" mode only existing entries are used, in "write" mode every
+    completion is requested and (re)stored, and "readwrite" does both.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        mode: str = "readwrite",
+        max_bytes: int = 2 * 1024**3,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(
+                f"Unknown cache mode {mode}, expected one of {CACHE_MODES}"
+            )
+        self.path = os.path.expanduser(path)
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets several runs (e.g. shards) share a cache.
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completions "
+            "(key TEXT PRIMARY KEY, response BLOB, size INTEGER, accessed REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed)"
+        )
+        self._db.commit()
+        # Running total of the stored responses, recounted before evicting as other
+        # processes may share the database.
+        (self._size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+
+    @property
+    def readable(self) -> bool:
+        return self.mode in ("read", "readwrite")
+
+    @property
+    def writable(self) -> bool:
+        return self.mode in ("write", "readwrite")
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached response for `key`, or None on a miss."""
+        if not self.readable:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE completions SET accessed = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+                self._db.commit()
+
+        response = None
+        if row is not None:
+            try:
+                response = pickle.loads(row[0])
+            except Exception:  # pylint: disable=broad-exception-caught
+                # e.g. stored by an incompatible SDK version
+                response = None
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+
+    def put(self, key: str, response: Any):
+        if not self.writable or response is None:
+            return
+        try:
+            blob = pickle.dumps(response)
+        except Exception:  # pylint: disable=broad-exception-caught
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time()),
+            )
+            self.writes += 1
+            self._size += len(blob)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM completions"
+        ).fetchone()
+        self._size = total
+        if total <= self.max_bytes:
+            return
+
+        # Evict down to 90% of the budget, so that eviction does not run on every put.
+        excess = total - int(self.max_bytes * 0.9)
+        evicted = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM completions ORDER BY accessed"
+        ):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM completions WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+        self._size = int(self.max_bytes * 0.9) + excess
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = f" ({self.hits / lookups:.1%} hit rate)" if lookups else ""
+        return (
+            f"Completion cache ({self.mode}): {self.hits} hit(s), {self.misses} "
+            f"miss(es){hit_rate}, {self.writes} write(s), {self.evictions} eviction(s)"
+        )
@@ -0,0 +1,195 @@
+from typing import Optional
+
+from collections import deque
+
+from contextlib import asynccontextmanager, contextmanager
+
+import asyncio
+
+import threading
+
+import time
+
+from nexusbench.retries import OVERLOADED, RATE_LIMITED, classify_error
+from nexusbench.utils import percentile
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD limit on the number of model requests in flight.
+
+    Every request attempt holds a slot for its whole duration. The limit grows by
+    `increase` after each window of `limit` healthy completions, up to `max_limit`,
+    and is multiplied by `decrease_factor` when a request fails with a
+    rate-limit/overload error, or when the p95 latency of the last `latency_window`
+    requests rises above `latency_tolerance` times the best p95 seen so far.
+
+    Overload errors from requests that were already in flight when the limit was cut
+    do not cut it again, so one burst of 429s shrinks the limit only once.
+
+    Coroutines waiting in `aslot` queue up in order and are handed a slot as soon as
+    one is released or the limit grows.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        max_limit: int,
+        min_limit: int = 1,
+        increase: int = 1,
+        decrease_factor: float = 0.5,
+        latency_window: int = 50,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(max_limit, self.min_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+
+        self.in_flight = 0
+        self.latencies = deque(maxlen=latency_window)
+        self.baseline_p95 = None
+        self.successes_since_change = 0
+        self.last_decrease = 0.0
+
+        self.peak_limit = self.limit
+        self.lowest_limit = self.limit
+        self.num_increases = 0
+        self.num_decreases = 0
+        self.num_overload_errors = 0
+
+        self._condition = threading.Condition()
+        # Futures of the coroutines waiting for a slot, oldest first
+        self._waiters: deque = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self):
+        with self._condition:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Cancelled after being handed a slot
+                with self._condition:
+                    self._return_slot()
+            raise
+
+    def release(self, started: float, error: Optional[Exception] = None):
+        with self._condition:
+            self.in_flight -= 1
+            if error is None:
+                self._on_success(time.monotonic() - started)
+            elif classify_error(error) in (RATE_LIMITED, OVERLOADED):
+                self.num_overload_errors += 1
+                if started >= self.last_decrease:
+                    self._decrease()
+            self._wake_waiters()
+            self._condition.notify_all()
+
+    def _wake_waiters(self):
+        """Hand the free slots to the oldest waiting coroutines. Holds the lock."""
+        while self._waiters and self.in_flight < self.limit:
+            future = self._waiters.popleft()
+            if future.cancelled():
+                continue
+            self.in_flight += 1
+            future.get_loop().call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            with self._condition:
+                self._return_slot()
+        else:
+            future.set_result(None)
+
+    def _return_slot(self):
+        """Give back a slot that was never used. Holds the lock."""
+        self.in_flight -= 1
+        self._wake_waiters()
+        self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.release(started, e)
+            raise
+        self.release(started)
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException as e:
+            self.release(started, e)
+            raise
+        self.release(started)
+
+    def _on_success(self, latency: float):
+        self.latencies.append(latency)
+        self.successes_since_change += 1
+
+        if len(self.latencies) == self.latencies.maxlen:
+            p95 = percentile(self.latencies, 0.95)
+            if self.baseline_p95 is None or p95 < self.baseline_p95:
+                self.baseline_p95 = p95
+            elif p95 > self.latency_tolerance * self.baseline_p95:
+                self._decrease()
+                # Let the baseline drift up, so a lasting shift in request size
+                # (e.g. longer agent histories) does not pin the limit at the floor.
+                self.baseline_p95 *= 1.1
+                return
+
+        if self.successes_since_change >= self.limit:
+            self._increase()
+
+    def _increase(self):
+        self.successes_since_change = 0
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            self.peak_limit = max(self.peak_limit, self.limit)
+            self.num_increases += 1
+            self._wake_waiters()
+            self._condition.notify_all()
+
+    def _decrease(self):
+        self.successes_since_change = 0
+        self.latencies.clear()
+        self.last_decrease = time.monotonic()
+        new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.lowest_limit = min(self.lowest_limit, self.limit)
+            self.num_decreases += 1
+
+    def summary(self) -> str:
+        return (
+            f"Adaptive concurrency settled at {self.limit} in-flight requests "
+            f"(range {self.lowest_limit}-{self.peak_limit}, "
+            f"{self.num_increases} increases, {self.num_decreases} decreases, "
+            f"{self.num_overload_errors} overload errors)"
+        )
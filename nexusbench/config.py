@@ -1,4 +1,4 @@
-from typing import Type, TypedDict
+from typing import Dict, Optional, Tuple, Type, TypedDict
 
 from dataclasses import dataclass
 
@@ -29,16 +29,43 @@ from nexusbench.prompters import (
 @dataclass
 class ClientConfig:
     prompter_class: Type
+    # Default quotas for the shared rate limiter (None means unlimited). Quotas depend
+    # on the account tier, so they are usually set with --requests_per_minute and
+    # --tokens_per_minute instead.
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    # Price of input tokens read from and written to the provider's prompt cache,
+    # relative to the price of other input tokens
+    cache_read_price: float = 1.0
+    cache_write_price: float = 1.0
 
 
 CLIENTS = {
-    "OpenAI": ClientConfig(OpenAIFCPrompter),
-    "Anthropic": ClientConfig(AnthropicFCPrompter),
+    "OpenAI": ClientConfig(OpenAIFCPrompter, cache_read_price=0.5),
+    "Anthropic": ClientConfig(
+        AnthropicFCPrompter, cache_read_price=0.1, cache_write_price=1.25
+    ),
     "Mistral": ClientConfig(MistralFCPrompter),
     "Qwen": ClientConfig(QwenFCPrompter),
 }
 
 
+# USD per million (input, output) tokens of hosted models, used to estimate and report
+# costs. Prices change over time, so they can be overridden on the command line.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-2024-08-06": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-0125-preview": (10.00, 30.00),
+    "claude-3-5-sonnet-20240620": (3.00, 15.00),
+    "claude-3-5-sonnet-20241022": (3.00, 15.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+    "claude-3-opus-20240229": (15.00, 75.00),
+    "mistral-large-2407": (2.00, 6.00),
+}
+
+
 BENCHMARKS = [
     NVDLibraryBenchmark,
     VirusTotalBenchmark,
@@ -0,0 +1,68 @@
+from typing import Any, Dict, Optional
+
+import threading
+
+
+# httpcore trace events of a new connection being established
+CONNECT_EVENTS = {
+    "connection.connect_tcp.complete",
+    "connection.connect_unix_socket.complete",
+}
+
+
+class ConnectionStats:
+    """
+    Counts the requests sent and the connections opened by the HTTP clients of a
+    prompter, through httpx's trace extension.
+
+    With keep-alive, connections are only opened while the pool grows, so many more
+    connections than `max_connections` (or requests per connection close to one)
+    point at connections not being reused.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.opened = 0
+        self._lock = threading.Lock()
+
+    def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name in CONNECT_EVENTS:
+            with self._lock:
+                self.opened += 1
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]):
+        self._trace(event_name, info)
+
+    def _on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._trace
+
+    async def _aon_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self._atrace
+
+    def http_client_kwargs(
+        self, max_connections: Optional[int] = None, is_async: bool = False
+    ) -> Dict[str, Any]:
+        """Keyword arguments of an `httpx.Client` (or `AsyncClient`) counted here."""
+        kwargs = {
+            "event_hooks": {
+                "request": [self._aon_request if is_async else self._on_request]
+            }
+        }
+        if max_connections is not None:
+            import httpx
+
+            kwargs["limits"] = httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            )
+        return kwargs
+
+    def summary(self, name: str) -> str:
+        return (
+            f"{name}: {self.opened} connection(s) opened for {self.requests} "
+            "HTTP request(s)"
+        )
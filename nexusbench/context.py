@@ -0,0 +1,21 @@
+from typing import Optional
+
+from contextlib import contextmanager
+
+from contextvars import ContextVar
+
+
+# Name of the benchmark whose sample is being processed. Set by the sample drivers in
+# `BaseBenchmark`, so that the client layer can keep per-benchmark statistics.
+current_benchmark: ContextVar[Optional[str]] = ContextVar(
+    "current_benchmark", default=None
+)
+
+
+@contextmanager
+def benchmark_context(name: str):
+    token = current_benchmark.set(name)
+    try:
+        yield
+    finally:
+        current_benchmark.reset(token)
@@ -0,0 +1,101 @@
+from typing import Dict, Hashable, Optional
+
+from contextlib import contextmanager
+
+from contextvars import ContextVar
+
+import threading
+
+import time
+
+
+# Monotonic time by which the sample being processed must finish, if it has a budget.
+current_deadline: ContextVar[Optional[float]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+class SampleTimeout(Exception):
+    """Raised when a sample runs out of its time budget. Never retried."""
+
+
+@contextmanager
+def deadline_context(deadline: Optional[float]):
+    token = current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current sample's deadline, or None without one."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def deadline_expired() -> bool:
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline():
+    if deadline_expired():
+        raise SampleTimeout("Sample ran out of its time budget")
+
+
+class Watchdog:
+    """
+    Tracks the samples in flight and periodically reports the longest running ones.
+
+    Samples are registered by the scheduler with `start`/`finish`. Every `interval`
+    seconds, a daemon thread prints the `top` samples that have been in flight
+    longest, so stuck samples can be spotted while the run is going.
+    """
+
+    def __init__(self, interval: float, top: int = 5):
+        self.interval = interval
+        self.top = top
+        self.in_flight: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, key: Hashable):
+        with self._lock:
+            self.in_flight[key] = time.monotonic()
+
+    def finish(self, key: Hashable):
+        with self._lock:
+            self.in_flight.pop(key, None)
+
+    def report(self) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            longest = sorted(self.in_flight.items(), key=lambda item: item[1])
+        if not longest:
+            return None
+
+        lines = [f"Watchdog: {len(longest)} sample(s) in flight, longest running:"]
+        for key, started in longest[: self.top]:
+            name = " / ".join(str(k) for k in key) if isinstance(key, tuple) else key
+            lines.append(f"  {name}: {now - started:.0f}s")
+        return "\n".join(lines)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            report = self.report()
+            if report is not None:
+                print(report)
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,74 @@
+from typing import Dict, List, Tuple
+
+from dataclasses import dataclass
+
+from math import sqrt
+
+from statistics import NormalDist
+
+
+def wilson_interval(
+    successes: float, n: int, confidence: float = 0.95
+) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if n == 0:
+        return 0.0, 1.0
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    denominator = 1 + z**2 / n
+    center = (p + z**2 / (2 * n)) / denominator
+    half_width = z * sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+
+@dataclass
+class AccuracyTally:
+    successes: float = 0
+    n: int = 0
+
+
+class EarlyStopping:
+    """
+    Stops a benchmark once the confidence interval on its Accuracy is narrow enough.
+
+    Results are tallied as they stream in with `BaseBenchmark.sample_accuracy`, the
+    same per-sample rule `get_metrics` uses. A benchmark is stopped once at least
+    `min_samples` results are in and the Wilson interval at `confidence` is at most
+    `target_width` wide. Samples must be scheduled in random order for the interval
+    to be meaningful.
+    """
+
+    def __init__(
+        self, target_width: float, confidence: float = 0.95, min_samples: int = 30
+    ):
+        self.target_width = target_width
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.tallies: Dict[int, AccuracyTally] = {}
+
+    def interval(self, job) -> Tuple[float, float]:
+        tally = self.tallies.get(id(job), AccuracyTally())
+        return wilson_interval(tally.successes, tally.n, self.confidence)
+
+    def update(self, job, result) -> bool:
+        """Tally a result of `job` and return whether the job should stop."""
+        tally = self.tallies.setdefault(id(job), AccuracyTally())
+        tally.successes += job.benchmark.sample_accuracy(result)
+        tally.n += 1
+
+        if tally.n < self.min_samples or tally.n >= len(job.inputs):
+            return False
+        low, high = self.interval(job)
+        return high - low <= self.target_width
+
+    def start(self, jobs: List) -> None:
+        """Tally the results jobs already have (e.g. from a resumed run)."""
+        for job in jobs:
+            for index in sorted(job.completed):
+                if self.update(job, job.results[index]):
+                    job.stopped = True
+
+    def get_metrics(self, job) -> Dict[str, float]:
+        low, high = self.interval(job)
+        return {"Accuracy CI Low": low, "Accuracy CI High": high}
@@ -0,0 +1,151 @@
+from typing import Callable, List, Optional
+
+from dataclasses import dataclass
+
+from contextlib import contextmanager
+
+import itertools
+
+import threading
+
+
+def parse_base_urls(base_url: Optional[str]) -> List[Optional[str]]:
+    """Split a comma-separated list of replica base urls."""
+    if base_url is None:
+        return [None]
+    return [url.strip() for url in base_url.split(",") if url.strip()]
+
+
+def is_endpoint_failure(e: Exception) -> bool:
+    """
+    Whether an error means the replica itself is unhealthy.
+
+    Timeouts, connection errors and 5xx responses count against the replica, while
+    4xx responses (bad requests, rate limits) are the caller's problem and do not.
+    """
+    status_code = getattr(e, "status_code", None) or getattr(e, "http_status", None)
+    if status_code is not None:
+        return status_code >= 500
+
+    if isinstance(e, (TimeoutError, ConnectionError)):
+        return True
+    name = type(e).__name__.lower()
+    return "timeout" in name or "connection" in name
+
+
+def http_health_probe(base_url: str, timeout: float = 5.0) -> bool:
+    """Probe an OpenAI-compatible server: any response below 500 means it is up."""
+    import httpx
+
+    try:
+        response = httpx.get(f"{base_url.rstrip('/')}/models", timeout=timeout)
+    except httpx.HTTPError:
+        return False
+    return response.status_code < 500
+
+
+@dataclass
+class Endpoint:
+    url: str
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    healthy: bool = True
+    num_requests: int = 0
+    num_failures: int = 0
+    num_ejections: int = 0
+
+
+class EndpointPool:
+    """
+    Spreads requests over several replicas of the same model.
+
+    Each request goes to the healthy replica with the fewest outstanding requests.
+    A replica that fails `max_failures` requests in a row (see `is_endpoint_failure`)
+    is ejected, and probed every `probe_interval` seconds until `probe` reports it
+    healthy again. If every replica is ejected, requests keep going to the least
+    loaded one rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        max_failures: int = 3,
+        probe_interval: float = 10.0,
+        probe: Callable[[str], bool] = http_health_probe,
+    ):
+        if not urls:
+            raise ValueError("An endpoint pool needs at least one base url")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.max_failures = max_failures
+        self.probe_interval = probe_interval
+        self.probe = probe
+        self._tie_breaker = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def healthy_endpoints(self) -> List[Endpoint]:
+        return [e for e in self.endpoints if e.healthy]
+
+    def acquire(self) -> Endpoint:
+        with self._lock:
+            candidates = self.healthy_endpoints or self.endpoints
+            # Rotate the starting point so that ties do not all go to the first replica.
+            offset = next(self._tie_breaker) % len(candidates)
+            rotated = candidates[offset:] + candidates[:offset]
+            endpoint = min(rotated, key=lambda e: e.outstanding)
+            endpoint.outstanding += 1
+            endpoint.num_requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, error: Optional[BaseException] = None):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if error is None:
+                endpoint.consecutive_failures = 0
+                return
+            if not isinstance(error, Exception) or not is_endpoint_failure(error):
+                return
+
+            endpoint.num_failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.healthy and endpoint.consecutive_failures >= self.max_failures:
+                endpoint.healthy = False
+                endpoint.num_ejections += 1
+                print(
+                    f"Ejecting endpoint {endpoint.url} after "
+                    f"{endpoint.consecutive_failures} consecutive failures"
+                )
+                self._schedule_probe(endpoint)
+
+    @contextmanager
+    def slot(self):
+        endpoint = self.acquire()
+        try:
+            yield endpoint
+        except BaseException as e:
+            self.release(endpoint, e)
+            raise
+        self.release(endpoint)
+
+    def _schedule_probe(self, endpoint: Endpoint):
+        timer = threading.Timer(self.probe_interval, self._probe, [endpoint])
+        timer.daemon = True
+        timer.start()
+
+    def _probe(self, endpoint: Endpoint):
+        if self.probe(endpoint.url):
+            with self._lock:
+                endpoint.healthy = True
+                endpoint.consecutive_failures = 0
+            print(f"Endpoint {endpoint.url} passed its health probe, reinstating it")
+        else:
+            self._schedule_probe(endpoint)
+
+    def summary(self) -> str:
+        lines = [f"Endpoint pool ({len(self.healthy_endpoints)} healthy):"]
+        for e in self.endpoints:
+            lines.append(
+                f"  {e.url}: {e.num_requests} requests, {e.num_failures} failures, "
+                f"{e.num_ejections} ejections{'' if e.healthy else ' (ejected)'}"
+            )
+        return "\n".join(lines)
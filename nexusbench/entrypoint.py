@@ -1,16 +1,14 @@
-from typing import List, Literal, Type, Optional
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Type, Union
 
 import argparse
 
-from functools import partial
+from dataclasses import dataclass, field
 
-from os import environ
+import random
 
-import json
+import threading
 
-from multiprocessing import Pool
-
-from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor
 
 from rich.console import Console
 from rich.table import Table
@@ -25,78 +23,602 @@ from nexusbench.config import (
     get_unique_settings,
     get_unique_behaviors,
 )
-from nexusbench.utils import print_benchmark_results
+from nexusbench.batch import export_batch, ingest_batch
+from nexusbench.cassettes import CassetteLibrary
+from nexusbench.completion_cache import (
+    CACHE_MODES,
+    DEFAULT_CACHE_PATH,
+    CompletionCache,
+)
+from nexusbench.concurrency import AdaptiveConcurrencyController
+from nexusbench.early_stopping import EarlyStopping
+from nexusbench.endpoints import EndpointPool, parse_base_urls
+from nexusbench.hedging import HedgingPolicy
+from nexusbench.journal import (
+    ResultJournal,
+    load_turn_counts,
+    run_config_key,
+    sample_id,
+)
+from nexusbench.pipeline import Pipeline
+from nexusbench.planner import get_prices, plan_run
+from nexusbench.rate_limits import RateLimiter
+from nexusbench.retries import RetryPolicy
+from nexusbench.scheduler import BenchmarkJob, SCHEDULERS
+from nexusbench.sharding import merge_journals, parse_shard, shard_of
+from nexusbench.usage import usage_metrics
+from nexusbench.utils import print_benchmark_results, print_sweep_results
+
+
+# Defaults of --num_samples_parallel and --num_benchmarks_parallel
+DEFAULT_NUM_SAMPLES_PARALLEL = 32
+DEFAULT_NUM_BENCHMARKS_PARALLEL = 2
+
+
+def default_max_concurrency(
+    num_samples_parallel: Optional[int] = None,
+    num_benchmarks_parallel: Optional[int] = None,
+) -> int:
+    """The global cap on samples in flight when no --max_concurrency is given."""
+    return (num_samples_parallel or DEFAULT_NUM_SAMPLES_PARALLEL) * (
+        num_benchmarks_parallel or 1
+    )
+
+
+def benchmark_metrics(
+    benchmark,
+    results: List[Any],
+    client: Optional[str],
+    model: Optional[str],
+    input_price: Optional[float] = None,
+    output_price: Optional[float] = None,
+) -> Dict[str, float]:
+    """
+    Metrics of a benchmark's finished results: the benchmark's own, the share of
+    samples that timed out, and the token usage and cost of the model.
+    """
+    metrics = benchmark.get_metrics(results)
+    timed_out = sum(isinstance(r, dict) and r.get("Timed Out", False) for r in results)
+    if timed_out:
+        metrics["Timed Out"] = timed_out / len(results)
+
+    # Cached tokens are priced by the client, so without one they go unpriced.
+    prices = get_prices(model, input_price, output_price) if client else None
+    if prices is None:
+        metrics.update(usage_metrics(results))
+    else:
+        metrics.update(
+            usage_metrics(
+                results,
+                prices,
+                CLIENTS[client].cache_read_price,
+                CLIENTS[client].cache_write_price,
+            )
+        )
+    if metrics.get("Cost ($)") and "Accuracy" in metrics:
+        metrics["Accuracy / $"] = metrics["Accuracy"] / metrics["Cost ($)"]
+    return metrics
+
+
+def as_list(value) -> List:
+    """Wrap a single CLI/config value into a list, leaving lists untouched."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+@dataclass
+class ModelTarget:
+    """One (client, model, base_url) configuration evaluated by a run."""
+
+    client: str
+    model: Optional[str]
+    base_url: Optional[str]
+    prompter: Any = field(repr=False)
+    label: str = ""
+
+    def __post_init__(self):
+        self.config_key = run_config_key(self.client, self.model, self.base_url)
+        self.label = self.label or self.model or self.client
+
+
+@dataclass
+class SharedClients:
+    """
+    Prompters (and so their pooled SDK clients), keyed by client, model, base url and
+    API key, with the controllers, rate limiters, endpoint pools and policies their
+    clients are built with. Everything is created on first use.
+
+    A run has its own, while a daemon (see nexusbench.server) passes the same one to
+    every job, so that connections stay warm across jobs and concurrent jobs share
+    one concurrency limit and quota per endpoint.
+    """
+
+    # Upper bound of the adaptive concurrency controllers, and of a daemon's jobs
+    max_concurrency: int = field(default_factory=default_max_concurrency)
+    prompters: Dict[Tuple, Any] = field(default_factory=dict)
+    concurrency_controllers: Dict[Tuple, AdaptiveConcurrencyController] = field(
+        default_factory=dict
+    )
+    rate_limiters: Dict[Tuple, RateLimiter] = field(default_factory=dict)
+    endpoint_pools: Dict[str, EndpointPool] = field(default_factory=dict)
+    retry_policy: Optional[RetryPolicy] = None
+    completion_cache: Optional[CompletionCache] = None
+    hedging_policy: Optional[HedgingPolicy] = None
+    lock: Any = field(default_factory=threading.Lock, repr=False, compare=False)
+
+
+def expand_targets(
+    clients: List[str], models: List[Optional[str]], base_urls: List[Optional[str]]
+) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Zip the client, model and base url lists into (client, model, base_url) triples.
+
+    A list with a single entry is used for every model, so that e.g. several models
+    behind the same endpoint only need one `--client` and `--base_url`.
+    """
+    num_targets = max(len(clients), len(models), len(base_urls))
+    for name, values in (
+        ("client", clients),
+        ("model", models),
+        ("base_url", base_urls),
+    ):
+        if len(values) not in (1, num_targets):
+            raise ValueError(
+                f"Expected 1 or {num_targets} {name} value(s), got {len(values)}"
+            )
+
+    def broadcast(values):
+        return values * num_targets if len(values) == 1 else values
+
+    return list(zip(broadcast(clients), broadcast(models), broadcast(base_urls)))
 
 
 class BenchmarkRunner:
     def __init__(
         self,
-        client: str,
+        client: Union[str, List[str]],
         api_key: Optional[str] = None,
-        model: Optional[str] = None,
-        base_url: Optional[str] = None,
+        model: Union[None, str, List[str]] = None,
+        base_url: Union[None, str, List[str]] = None,
         num_samples_parallel: Optional[int] = None,
         num_benchmarks_parallel: Optional[int] = None,
         debug: Optional[bool] = False,
+        max_concurrency: Optional[int] = None,
+        engine: Literal["threads", "asyncio"] = "threads",
+        adaptive_concurrency: bool = False,
+        min_concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        run_dir: Optional[str] = None,
+        resume: bool = False,
+        shard: Optional[str] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        target_ci: Optional[float] = None,
+        ci_confidence: float = 0.95,
+        ci_min_samples: int = 30,
+        cost_history: Optional[List[str]] = None,
+        request_timeout: Optional[float] = None,
+        max_retries: int = 5,
+        retry_budget: float = 0.2,
+        sample_timeout: Optional[float] = None,
+        benchmark_timeout: Optional[float] = None,
+        watchdog_interval: Optional[float] = None,
+        cpu_workers: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        prompt_caching: bool = False,
+        stream: bool = False,
+        input_price: Optional[float] = None,
+        output_price: Optional[float] = None,
+        cache: Literal["read", "write", "readwrite", "off"] = "off",
+        cache_path: str = DEFAULT_CACHE_PATH,
+        cache_max_mb: int = 2048,
+        record: Optional[str] = None,
+        replay: Optional[str] = None,
+        dataset_cache: Optional[Any] = None,
+        shared_clients: Optional[SharedClients] = None,
+        on_result: Optional[Callable[[BenchmarkJob, int, Any], None]] = None,
     ):
-        self.client = client
-        self.client_config: ClientConfig = CLIENTS[client]
-        self.prompter = self.client_config.prompter_class(api_key, model, base_url)
-        self.model = model
         self.num_samples_parallel = num_samples_parallel
         self.num_benchmarks_parallel = num_benchmarks_parallel
         self.debug = debug
+        if max_concurrency is None:
+            max_concurrency = default_max_concurrency(
+                num_samples_parallel, num_benchmarks_parallel
+            )
+        self.max_concurrency = max_concurrency
+        self.engine = engine
+        self.sample_timeout = sample_timeout
+        self.benchmark_timeout = benchmark_timeout
+        self.watchdog_interval = watchdog_interval
+        self.cpu_workers = cpu_workers
+        # USD per million tokens, overriding the known prices of the models
+        self.input_price = input_price
+        self.output_price = output_price
+        # A daemon keeps samples and tool descriptions across runs, see nexusbench.server
+        self.dataset_cache = dataset_cache
+        self.on_result = on_result
 
-        environ["NUM_SAMPLES_PARALLEL"] = json.dumps(self.num_samples_parallel)
-        environ["DEBUG"] = json.dumps(self.debug)
+        # Cassettes record or replay every model request of every sample.
+        assert not (record and replay), "A run either records or replays cassettes"
+        self.cassettes = None
+        if record or replay:
+            self.cassettes = CassetteLibrary(
+                record or replay, "record" if record else "replay"
+            )
+            # A replayed run sends no requests, so it needs no API key.
+            if replay and api_key is None:
+                api_key = "replay"
 
-    def run_single_benchmark(self, benchmark_class, limit):
-        name = benchmark_class.__name__
-        print(f"Benchmarking {name}")
-        benchmark = benchmark_class()
+        shared = shared_clients or SharedClients(max_concurrency)
+        with shared.lock:
+            # One retry budget for the whole run, so that retries across all models
+            # and endpoints stay a fraction of the requests.
+            if shared.retry_policy is None:
+                shared.retry_policy = RetryPolicy(
+                    max_retries, budget_ratio=retry_budget
+                )
+            # Completions are keyed by their provider, model and endpoint, so one
+            # cache serves all models.
+            if cache != "off" and shared.completion_cache is None:
+                shared.completion_cache = CompletionCache(
+                    cache_path, cache, cache_max_mb * 1024**2
+                )
+            # Latencies are tracked per (benchmark, model), so one policy serves all
+            # models. Every request in flight and its duplicate run on its pool.
+            if hedge and shared.hedging_policy is None:
+                shared.hedging_policy = HedgingPolicy(
+                    hedge_quantile,
+                    max_workers=2 * shared.max_concurrency,
+                )
+        self.shared_clients = shared
+        self.retry_policy = shared.retry_policy
+        self.completion_cache = shared.completion_cache
+        self.hedging_policy = shared.hedging_policy
+        self.concurrency_controllers = shared.concurrency_controllers
+        self.rate_limiters = shared.rate_limiters
+        self.endpoint_pools = shared.endpoint_pools
+
+        # Every model of a sweep gets its own prompter, while samples and tool
+        # descriptions are prepared once and fanned out across all of them.
+        triples = expand_targets(as_list(client), as_list(model), as_list(base_url))
+        models = [m for _, m, _ in triples]
+        self.targets: List[ModelTarget] = []
+        for client_name, model_name, url in triples:
+            label = model_name or client_name
+            if models.count(model_name) > 1:
+                label = f"{label}@{url or client_name}"
+            key = (client_name, model_name, url, api_key)
+            with shared.lock:
+                if key not in shared.prompters:
+                    shared.prompters[key] = self.create_prompter(
+                        client_name,
+                        api_key,
+                        model_name,
+                        url,
+                        request_timeout=request_timeout,
+                        max_connections=max_connections,
+                        prompt_caching=prompt_caching,
+                        stream=stream,
+                        adaptive_concurrency=adaptive_concurrency,
+                        min_concurrency=min_concurrency,
+                        requests_per_minute=requests_per_minute,
+                        tokens_per_minute=tokens_per_minute,
+                    )
+            self.targets.append(
+                ModelTarget(
+                    client_name, model_name, url, shared.prompters[key], label=label
+                )
+            )
+
+        # Early stopping needs samples in random order, see prepare_benchmark.
+        self.early_stopping = None
+        if target_ci is not None:
+            self.early_stopping = EarlyStopping(
+                target_ci, ci_confidence, ci_min_samples
+            )
+
+        # Turn counts of previous runs refine the per-sample cost estimates.
+        self.turn_counts = load_turn_counts(cost_history) if cost_history else {}
+
+        self.shard = parse_shard(shard) if shard is not None else None
+
+        # Every finished sample is journaled to the run directory, and a resumed run
+        # only schedules the samples that are not in the journal yet.
+        self.journal = None
+        self.journaled = {}
+        if run_dir is not None:
+            if resume:
+                self.journaled = ResultJournal.load(run_dir)
+            self.journal = ResultJournal(run_dir)
+            self.journal.write_config(
+                {
+                    "client": [t.client for t in self.targets],
+                    "model": [t.model for t in self.targets],
+                    "base_url": [t.base_url for t in self.targets],
+                    "shard": shard,
+                    "input_price": input_price,
+                    "output_price": output_price,
+                }
+            )
 
+    def create_prompter(
+        self,
+        client_name: str,
+        api_key: Optional[str],
+        model_name: Optional[str],
+        url: Optional[str],
+        request_timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        prompt_caching: bool = False,
+        stream: bool = False,
+        adaptive_concurrency: bool = False,
+        min_concurrency: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        """A prompter of a target, wired to the run's shared controllers and policies."""
+        shared = self.shared_clients
+        prompter = CLIENTS[client_name].prompter_class(api_key, model_name, url)
+        prompter.request_timeout = request_timeout
+        prompter.retry_policy = shared.retry_policy
+        prompter.max_connections = max_connections
+        prompter.prompt_caching = prompt_caching
+        prompter.stream = stream
+        prompter.completion_cache = shared.completion_cache
+        prompter.hedging_policy = shared.hedging_policy
+
+        # A comma-separated base url lists replicas to load balance over.
+        urls = parse_base_urls(url)
+        if len(urls) > 1:
+            if url not in shared.endpoint_pools:
+                shared.endpoint_pools[url] = EndpointPool(urls)
+            prompter.endpoint_pool = shared.endpoint_pools[url]
+
+        # The scheduler cap bounds samples in flight, while the adaptive controller
+        # bounds the model requests they issue and searches for the best level below
+        # it. There is one controller and one rate limiter per (client, base url)
+        # endpoint, so e.g. a local server does not eat into a hosted API's quota.
+        endpoint = (client_name, url)
+        if adaptive_concurrency:
+            if endpoint not in shared.concurrency_controllers:
+                shared.concurrency_controllers[endpoint] = (
+                    AdaptiveConcurrencyController(
+                        initial_limit=max(min_concurrency, shared.max_concurrency // 4),
+                        min_limit=min_concurrency,
+                        max_limit=shared.max_concurrency,
+                    )
+                )
+            prompter.concurrency_controller = shared.concurrency_controllers[endpoint]
+
+        client_config: ClientConfig = CLIENTS[client_name]
+        rpm = requests_per_minute or client_config.requests_per_minute
+        tpm = tokens_per_minute or client_config.tokens_per_minute
+        if rpm or tpm:
+            if endpoint not in shared.rate_limiters:
+                shared.rate_limiters[endpoint] = RateLimiter(rpm, tpm)
+            prompter.rate_limiter = shared.rate_limiters[endpoint]
+        return prompter
+
+    def prepare_benchmark(
+        self, benchmark_class, limit: Optional[int] = None
+    ) -> List[BenchmarkJob]:
+        """Load the samples of a benchmark once and create one job per model target."""
+        name = benchmark_class.__name__
+        print(f"Preparing {name}")
         try:
-            samples = benchmark.get_samples()
+            if self.dataset_cache is not None:
+                benchmark, samples = self.dataset_cache.load(benchmark_class)
+            else:
+                benchmark = benchmark_class()
+                samples = benchmark.get_samples()
             if limit is not None:
                 samples = samples[:limit]
 
-            tool_descriptions = self.prompter.construct_tool_descriptions(
-                benchmark, benchmark.tools
-            )
+            # Tool descriptions only depend on the prompter's format.
+            tool_descriptions = {}
+            for target in self.targets:
+                prompter_class = type(target.prompter)
+                if prompter_class in tool_descriptions:
+                    continue
+                if self.dataset_cache is not None:
+                    tool_descriptions[prompter_class] = (
+                        self.dataset_cache.get_tool_descriptions(
+                            benchmark, target.prompter
+                        )
+                    )
+                else:
+                    tool_descriptions[prompter_class] = (
+                        target.prompter.construct_tool_descriptions(
+                            benchmark, benchmark.tools
+                        )
+                    )
         except Exception as e:
             print(f"Error constructing samples for Benchmark: {name}. Error: {e}")
-            return None
+            return []
 
-        inputs = [
-            (sample, tool_descriptions, benchmark, self.prompter, self.model)
-            for (idx, sample) in enumerate(samples)
+        sample_ids = [
+            sample_id(name, idx, sample) for idx, sample in enumerate(samples)
         ]
+        if self.shard is not None:
+            shard_index, num_shards = self.shard
+            in_shard = [
+                shard_of(name, sid, num_shards) == shard_index for sid in sample_ids
+            ]
+            samples = [s for s, keep in zip(samples, in_shard) if keep]
+            sample_ids = [sid for sid, keep in zip(sample_ids, in_shard) if keep]
 
-        print(f"Number of Samples: {len(inputs)}")
-        correct_calls = benchmark.process_sample(inputs)
-        metrics = benchmark.get_metrics(correct_calls)
-        return benchmark_class, metrics, correct_calls
+        if self.early_stopping is not None:
+            # Seeded by the benchmark, so every model and every resume sees one order.
+            order = list(range(len(samples)))
+            random.Random(name).shuffle(order)
+            samples = [samples[i] for i in order]
+            sample_ids = [sample_ids[i] for i in order]
 
-    def run_benchmarks(self, benchmarks: List[Type], limit: Optional[int] = None):
-        with Pool(self.num_benchmarks_parallel) as pool:
-            run_benchmark = partial(self.run_single_benchmark, limit=limit)
-            all_results = list(
-                tqdm(
-                    pool.imap(run_benchmark, benchmarks),
-                    total=len(benchmarks),
-                    desc="Running benchmarks",
+        print(f"Number of Samples for {name}: {len(samples)}")
+
+        jobs = []
+        for target in self.targets:
+            descriptions = tool_descriptions[type(target.prompter)]
+            inputs = [
+                (sample, descriptions, benchmark, target.prompter, target.model)
+                for sample in samples
+            ]
+            job = BenchmarkJob(
+                benchmark_class,
+                benchmark,
+                inputs,
+                sample_ids=list(sample_ids),
+                target=target,
+            )
+
+            for idx, sid in enumerate(sample_ids):
+                result = self.journaled.get((target.config_key, name, sid))
+                if result is not None:
+                    job.results[idx] = result
+                    job.completed.add(idx)
+            if job.completed:
+                print(
+                    f"Resuming {name} ({target.label}): "
+                    f"{len(job.completed)} sample(s) already journaled"
+                )
+            if self.early_stopping is None:
+                # Longest expected samples first; early stopping needs random order.
+                job.costs = [
+                    self.turn_counts.get((name, sid), benchmark.estimate_cost(sample))
+                    for sample, sid in zip(samples, sample_ids)
+                ]
+            jobs.append(job)
+
+        return jobs
+
+    def record_result(self, job: BenchmarkJob, index: int, result):
+        if self.journal is not None:
+            self.journal.append(
+                job.target.config_key, job.name, job.sample_ids[index], result
+            )
+        if self.on_result is not None:
+            self.on_result(job, index, result)
+
+        # Samples already in flight when a job stops still count towards its interval.
+        if self.early_stopping is not None:
+            if self.early_stopping.update(job, result) and not job.stopped:
+                job.stopped = True
+                low, high = self.early_stopping.interval(job)
+                print(
+                    f"Stopping {job.name} ({job.target.label}) after "
+                    f"{len(job.completed)}/{len(job.inputs)} samples: Accuracy "
+                    f"interval [{low:.1%}, {high:.1%}]"
                 )
+
+    def get_metrics(self, job: BenchmarkJob):
+        metrics = benchmark_metrics(
+            job.benchmark,
+            job.finished_results(),
+            job.target.client,
+            job.target.model,
+            self.input_price,
+            self.output_price,
+        )
+        if self.early_stopping is not None:
+            metrics.update(self.early_stopping.get_metrics(job))
+        return metrics
+
+    def run_single_benchmark(self, benchmark_class, limit):
+        results = self.run_benchmarks([benchmark_class], limit)
+        return results[0] if results else None
+
+    def run_benchmarks(self, benchmarks: List[Type], limit: Optional[int] = None):
+        """Run the benchmarks against a single model and return its results."""
+        assert len(self.targets) == 1, "Use run_sweep to run several models"
+        return self.run_sweep(benchmarks, limit)[0][1]
+
+    def run_sweep(
+        self, benchmarks: List[Type], limit: Optional[int] = None
+    ) -> List[Tuple[ModelTarget, List[Tuple]]]:
+        """Run the benchmarks against every model target and return their results."""
+        # Loading datasets is I/O bound, so benchmarks are prepared concurrently. All
+        # samples of all models are then run from a single queue under one global
+        # concurrency cap.
+        with ThreadPoolExecutor(self.num_benchmarks_parallel) as executor:
+            per_benchmark = list(
+                executor.map(lambda b: self.prepare_benchmark(b, limit), benchmarks)
             )
+        jobs = [job for jobs in per_benchmark for job in jobs]
 
-        return [result for result in all_results if result is not None]
+        if self.early_stopping is not None:
+            self.early_stopping.start(jobs)
 
-    def upload_predictions(self, results):
+        # Tool execution and scoring move to worker processes, so that they do not
+        # hold the GIL while the I/O workers wait on the model.
+        pipeline = Pipeline(self.cpu_workers) if self.cpu_workers else None
+        scheduler = SCHEDULERS[self.engine](
+            self.max_concurrency,
+            self.debug,
+            on_result=self.record_result,
+            sample_timeout=self.sample_timeout,
+            benchmark_timeout=self.benchmark_timeout,
+            watchdog_interval=self.watchdog_interval,
+            pipeline=pipeline,
+            cassettes=self.cassettes,
+        )
+        try:
+            scheduler.run(jobs)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+
+        for controller in self.concurrency_controllers.values():
+            print(controller.summary())
+        for rate_limiter in self.rate_limiters.values():
+            print(rate_limiter.summary())
+        for endpoint_pool in self.endpoint_pools.values():
+            print(endpoint_pool.summary())
+        if self.hedging_policy is not None:
+            print(self.hedging_policy.summary())
+        print(self.retry_policy.summary())
+        if self.completion_cache is not None:
+            print(self.completion_cache.summary())
+        if self.cassettes is not None:
+            print(self.cassettes.summary())
+        counted = [t for t in self.targets if t.prompter.counts_connections]
+        if counted:
+            print("HTTP connections:")
+        for target in counted:
+            print("  " + target.prompter.connection_stats.summary(target.label))
+        for target in self.targets:
+            if target.prompter.prompt_caching:
+                print(target.prompter.prompt_cache_stats.summary(target.label))
+            if target.prompter.stream:
+                print(target.prompter.stream_stats.summary(target.label))
+        if pipeline is not None:
+            print(pipeline.summary())
+
+        return [
+            (
+                target,
+                [
+                    (
+                        job.benchmark_class,
+                        self.get_metrics(job),
+                        job.finished_results(),
+                    )
+                    for job in jobs
+                    if job.target is target
+                ],
+            )
+            for target in self.targets
+        ]
+
+    def upload_predictions(self, results, target: Optional[ModelTarget] = None):
+        target = target or self.targets[0]
         for benchmark_class, metrics, correct_calls in results:
             benchmark_class.upload_predictions(
                 self=benchmark_class,
                 metrics=metrics,
                 correct_calls=correct_calls,
-                prompter=self.prompter,
+                prompter=target.prompter,
             )
 
 
@@ -199,6 +721,96 @@ def get_available_suites():
     return suites
 
 
+def merge_runs(run_dirs: List[str]) -> Dict[str, List[tuple]]:
+    """
+    Print and return the combined metrics of several run directories, e.g. the shards
+    of a run, per model.
+    """
+    configs = {}
+    for run_dir in run_dirs:
+        config = ResultJournal.load_config(run_dir)
+        if config:
+            for client, model, base_url in expand_targets(
+                as_list(config.get("client")),
+                as_list(config.get("model")),
+                as_list(config.get("base_url")),
+            ):
+                key = run_config_key(client, model, base_url)
+                configs[key] = {
+                    "client": client,
+                    "model": model,
+                    "input_price": config.get("input_price"),
+                    "output_price": config.get("output_price"),
+                }
+
+    merged = merge_journals(run_dirs)
+    if not merged:
+        print("No journaled results found!")
+        return {}
+
+    results_per_model = {}
+    for config_key, per_benchmark in merged.items():
+        config = configs.get(config_key, {})
+        accuracies = []
+        for benchmark_class in BENCHMARKS:
+            results = per_benchmark.get(benchmark_class.__name__)
+            if results:
+                metrics = benchmark_metrics(
+                    benchmark_class(),
+                    results,
+                    config.get("client"),
+                    config.get("model"),
+                    config.get("input_price"),
+                    config.get("output_price"),
+                )
+                accuracies.append((benchmark_class, metrics, results))
+
+        unknown = set(per_benchmark) - {b.__name__ for b in BENCHMARKS}
+        for name in sorted(unknown):
+            print(f"Skipping results of unknown benchmark: {name}")
+
+        num_samples = sum(len(results) for _, _, results in accuracies)
+        print(
+            f"\nMerged {num_samples} sample(s) from {len(run_dirs)} run dir(s) for "
+            f"client={config.get('client')} model={config.get('model')}"
+        )
+        print_benchmark_results(accuracies)
+        results_per_model[config.get("model") or config_key] = accuracies
+
+    if len(results_per_model) > 1:
+        print_sweep_results(results_per_model)
+    return results_per_model
+
+
+def select_benchmarks(suite_name: str, benchmark_names: Optional[List[str]]):
+    """The benchmarks of the selected suite(s) followed by the extra benchmarks."""
+    available_suites = get_available_suites()
+
+    # Get the selected suite(s)
+    if suite_name == "all":
+        selected_suites = available_suites.values()
+    else:
+        selected_suites = [available_suites[suite_name]]
+
+    # Collect all benchmarks from selected suites
+    all_benchmarks = []
+    for suite_class in selected_suites:
+        suite = suite_class()
+        suite_benchmarks = suite.get_tasks()
+        all_benchmarks.extend(suite_benchmarks)
+
+    if benchmark_names:
+        if "all" in benchmark_names:
+            benchmark_classes = BENCHMARKS
+        else:
+            bn_to_benchmark = {b.__name__: b for b in BENCHMARKS}
+            benchmark_classes = [bn_to_benchmark[name] for name in benchmark_names]
+
+        all_benchmarks.extend(benchmark_classes)
+
+    return list(dict.fromkeys(all_benchmarks))
+
+
 def main():
     # Get available suites
     available_suites = get_available_suites()
@@ -214,28 +826,209 @@ def main():
     parser.add_argument(
         "--num_benchmarks_parallel",
         type=int,
-        help="How many benchmarks to run in parallel",
-        default=2,
+        help="How many benchmarks to prepare (load samples for) in parallel",
+        default=DEFAULT_NUM_BENCHMARKS_PARALLEL,
     )
     parser.add_argument(
         "--num_samples_parallel",
         type=int,
-        help="How many samples to run in parallel per benchmark",
-        default=32,
+        help="Sizes the global cap on samples in flight across all benchmarks, which is num_samples_parallel * num_benchmarks_parallel unless --max_concurrency is given",
+        default=DEFAULT_NUM_SAMPLES_PARALLEL,
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        help="Global cap on samples in flight across all benchmarks (defaults to num_samples_parallel * num_benchmarks_parallel)",
+        default=None,
+    )
+    parser.add_argument(
+        "--adaptive_concurrency",
+        action="store_true",
+        help="Adapt the number of in-flight requests (AIMD) to 429/overload errors and p95 latency, up to max_concurrency",
+    )
+    parser.add_argument(
+        "--min_concurrency",
+        type=int,
+        help="Lower bound for --adaptive_concurrency",
+        default=1,
+    )
+    parser.add_argument(
+        "--requests_per_minute",
+        type=int,
+        help="Requests-per-minute quota shared by all requests to the same client and base url",
+        default=None,
+    )
+    parser.add_argument(
+        "--tokens_per_minute",
+        type=int,
+        help="Tokens-per-minute quota shared by all requests to the same client and base url",
+        default=None,
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help="Send a duplicate of any request still running after the observed latency quantile of its benchmark and use whichever returns first",
+    )
+    parser.add_argument(
+        "--hedge_quantile",
+        type=float,
+        help="Latency quantile after which --hedge sends the duplicate request",
+        default=0.95,
+    )
+    parser.add_argument(
+        "--target_ci",
+        type=float,
+        metavar="WIDTH",
+        help="Run samples in random order and stop each benchmark once the confidence interval on its Accuracy is at most WIDTH wide (e.g. 0.1)",
+        default=None,
+    )
+    parser.add_argument(
+        "--ci_confidence",
+        type=float,
+        help="Confidence level of the --target_ci interval",
+        default=0.95,
+    )
+    parser.add_argument(
+        "--ci_min_samples",
+        type=int,
+        help="Minimum number of samples per benchmark before --target_ci can stop it",
+        default=30,
+    )
+    parser.add_argument(
+        "--cost_history",
+        nargs="+",
+        metavar="RUN_DIR",
+        help="Run dirs of previous runs whose per-sample turn counts are used to start the longest samples first",
+        default=None,
+    )
+    parser.add_argument(
+        "--request_timeout",
+        type=float,
+        help="Seconds before a single model request is abandoned (and retried)",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        help="Retries of a failed model request, with exponential backoff (errors that cannot succeed are not retried)",
+        default=5,
+    )
+    parser.add_argument(
+        "--retry_budget",
+        type=float,
+        help="Retries of the whole run as a fraction of its requests, beyond which failed requests are not retried",
+        default=0.2,
+    )
+    parser.add_argument(
+        "--sample_timeout",
+        type=float,
+        help="Wall-clock budget in seconds of a sample, after which it is recorded as timed out",
+        default=None,
+    )
+    parser.add_argument(
+        "--benchmark_timeout",
+        type=float,
+        help="Wall-clock budget in seconds of all samples of a benchmark, after which its remaining samples are recorded as timed out",
+        default=None,
+    )
+    parser.add_argument(
+        "--watchdog_interval",
+        type=float,
+        help="Every this many seconds, report the samples that have been in flight longest",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache",
+        choices=CACHE_MODES,
+        help="Serve repeated requests from the on-disk completion cache (read), store completions in it (write), or both",
+        default="off",
+    )
+    parser.add_argument(
+        "--cache_path",
+        type=str,
+        help="SQLite file of the completion cache",
+        default=DEFAULT_CACHE_PATH,
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=int,
+        help="Size of the completion cache beyond which the least recently used completions are evicted",
+        default=2048,
+    )
+    cassettes = parser.add_mutually_exclusive_group()
+    cassettes.add_argument(
+        "--record",
+        type=str,
+        metavar="DIR",
+        help="Record every request and response of the run to cassettes in this directory",
+        default=None,
+    )
+    cassettes.add_argument(
+        "--replay",
+        type=str,
+        metavar="DIR",
+        help="Replay the run from the cassettes in this directory, without any network access",
+        default=None,
+    )
+    parser.add_argument(
+        "--prompt_caching",
+        action="store_true",
+        help="Mark the tools, system prompt and agent history as cacheable by the provider (Anthropic; OpenAI caches long prompts automatically), and report cache reads and writes per benchmark",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream responses (OpenAI, Anthropic and Qwen clients), stop each one once its first tool call is complete, and report time to first token and inter-token latency per benchmark",
+    )
+    parser.add_argument(
+        "--input_price",
+        type=float,
+        help="USD per million input tokens (defaults to the known price of the model)",
+        default=None,
+    )
+    parser.add_argument(
+        "--output_price",
+        type=float,
+        help="USD per million output tokens (defaults to the known price of the model)",
+        default=None,
+    )
+    parser.add_argument(
+        "--max_connections",
+        type=int,
+        help="Cap on the kept-alive HTTP connections of each OpenAI or Anthropic model's client (defaults to the SDK's limit)",
+        default=None,
+    )
+    parser.add_argument(
+        "--cpu_workers",
+        type=int,
+        help="Run tool execution and scoring on a pool of this many processes instead of the I/O workers",
+        default=None,
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["threads", "asyncio"],
+        help="Run samples on a thread pool or as coroutines with async provider clients",
+        default="threads",
     )
     parser.add_argument(
         "--client",
+        nargs="+",
         choices=CLIENTS.keys(),
-        help="The client to use for running the benchmarks",
+        help="The client to use for running the benchmarks (one per model, or one for all models)",
     )
     parser.add_argument(
         "--base_url",
         type=str,
-        help="The base url for the inference backend used by the client.",
+        nargs="+",
+        help="The base url for the inference backend used by the client (one per model, or one for all models). A comma-separated list of replica urls is load balanced.",
         default=None,
     )
     parser.add_argument("--api_key", help="API key for the model (if required)")
-    parser.add_argument("--model", help="Specific model name to use")
+    parser.add_argument(
+        "--model",
+        nargs="+",
+        help="Specific model name(s) to use; several models are run side by side in a single sweep",
+    )
     parser.add_argument(
         "--suite",
         choices=list(available_suites.keys()) + ["all"],
@@ -257,19 +1050,207 @@ def main():
         help="Limit the number of samples per benchmark",
         default=None,
     )
+    parser.add_argument(
+        "--run_dir",
+        type=str,
+        help="Directory to journal every finished sample to, so an interrupted run can be resumed",
+        default=None,
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        metavar="RUN_DIR",
+        help="Resume the run journaled in RUN_DIR, only running samples that are not journaled yet",
+        default=None,
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        metavar="i/N",
+        help="Only run the samples of shard i (0-based) out of N, assigned by a hash of (benchmark, sample id)",
+        default=None,
+    )
     parser.add_argument(
         "--debug",
         help="Print error traceback or just the error repr.",
         action="store_true",
     )
 
+    subparsers = parser.add_subparsers(dest="command")
+    merge_parser = subparsers.add_parser(
+        "merge", help="Combine the journals of several run dirs into one set of metrics"
+    )
+    merge_parser.add_argument(
+        "run_dirs", nargs="+", help="Run directories (e.g. one per shard)"
+    )
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Run a daemon that keeps datasets warm and runs jobs posted to a local HTTP API",
+    )
+    serve_parser.add_argument(
+        "--host", help="Address to listen on", default="127.0.0.1"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, help="Port to listen on", default=8321
+    )
+    serve_parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Listen on a Unix socket at PATH instead of a TCP port",
+        default=None,
+    )
+    serve_parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load the datasets of the selected --suite/--benchmarks at startup",
+    )
+    serve_parser.add_argument(
+        "--jobs_dir",
+        metavar="DIR",
+        help="Directory that the run_dir, record, replay and cost_history paths of jobs are resolved in; jobs cannot name files without it",
+        default=None,
+    )
+    fake_parser = subparsers.add_parser(
+        "fake-server",
+        help="Serve OpenAI/Anthropic-compatible completions that replay the ground truth of the selected benchmarks",
+    )
+    fake_parser.add_argument("--host", help="Address to listen on", default="127.0.0.1")
+    fake_parser.add_argument("--port", type=int, help="Port to listen on", default=8000)
+    fake_parser.add_argument(
+        "--latency",
+        type=float,
+        help="Median seconds per response",
+        default=0.0,
+    )
+    fake_parser.add_argument(
+        "--latency_sigma",
+        type=float,
+        help="Sigma of the log-normal distribution of --latency (0 for a constant latency)",
+        default=0.0,
+    )
+    fake_parser.add_argument(
+        "--token_latency",
+        type=float,
+        help="Seconds added to a response per output token",
+        default=0.0,
+    )
+    fake_parser.add_argument(
+        "--output_tokens",
+        type=int,
+        help="Output tokens reported for every response (defaults to the length of the response)",
+        default=None,
+    )
+    fake_parser.add_argument(
+        "--error_rate",
+        type=float,
+        help="Fraction of requests that fail with --error_status",
+        default=0.0,
+    )
+    fake_parser.add_argument(
+        "--error_status",
+        type=int,
+        help="HTTP status of the failed requests",
+        default=429,
+    )
+    plan_parser = subparsers.add_parser(
+        "plan",
+        help="Estimate the requests, tokens, cost and wall time of a run without sending any request",
+    )
+    plan_parser.add_argument(
+        "--output_tokens_per_turn",
+        type=int,
+        help="Expected tokens of a model call (and of the tool result it gets back)",
+        default=100,
+    )
+    plan_parser.add_argument(
+        "--request_latency",
+        type=float,
+        help="Expected seconds per model request",
+        default=2.0,
+    )
+    # Also accepted before the subcommand, where they price the usage of a run.
+    plan_parser.add_argument(
+        "--input_price",
+        type=float,
+        help="USD per million input tokens (defaults to the known price of the model)",
+        default=argparse.SUPPRESS,
+    )
+    plan_parser.add_argument(
+        "--output_price",
+        type=float,
+        help="USD per million output tokens (defaults to the known price of the model)",
+        default=argparse.SUPPRESS,
+    )
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Export the requests of single-turn benchmarks for a provider batch API, or score its results",
+    )
+    batch_parser.add_argument(
+        "action",
+        choices=["export", "ingest"],
+        help="export: write the batch input file to PATH, ingest: score the batch output file at PATH",
+    )
+    batch_parser.add_argument(
+        "batch_file",
+        metavar="PATH",
+        help="JSONL file in the format of the client's batch API",
+    )
+
     args = parser.parse_args()
 
     if args.discover:
         discover_benchmarks()
         return
 
-    assert args.client is not None, "Please provide a client!"
+    if args.command == "merge":
+        merge_runs(args.run_dirs)
+        return
+
+    if args.command == "serve":
+        from nexusbench.server import CLIENT_OPTIONS, serve
+
+        serve(
+            args.host,
+            args.port,
+            args.socket,
+            args.api_key,
+            select_benchmarks(args.suite, args.benchmarks) if args.preload else None,
+            run_options={name: getattr(args, name) for name in CLIENT_OPTIONS},
+            max_concurrency=args.max_concurrency
+            or default_max_concurrency(
+                args.num_samples_parallel, args.num_benchmarks_parallel
+            ),
+            jobs_dir=args.jobs_dir,
+        )
+        return
+
+    if args.command == "fake-server":
+        from nexusbench.fake_server import FakeServerConfig, serve_fake
+
+        serve_fake(
+            select_benchmarks(args.suite, args.benchmarks),
+            FakeServerConfig(
+                args.latency,
+                args.latency_sigma,
+                args.token_latency,
+                args.output_tokens,
+                args.error_rate,
+                args.error_status,
+            ),
+            args.host,
+            args.port,
+        )
+        return
+
+    if args.resume:
+        # Default to the configuration the resumed run was started with.
+        resumed_config = ResultJournal.load_config(args.resume)
+        args.client = args.client or as_list(resumed_config.get("client"))
+        args.model = args.model or as_list(resumed_config.get("model"))
+        args.base_url = args.base_url or as_list(resumed_config.get("base_url"))
+        args.shard = args.shard or resumed_config.get("shard")
+
+    assert args.client and all(args.client), "Please provide a client!"
 
     runner = BenchmarkRunner(
         args.client,
@@ -279,49 +1260,96 @@ def main():
         args.num_samples_parallel,
         args.num_benchmarks_parallel,
         args.debug,
+        args.max_concurrency,
+        args.engine,
+        args.adaptive_concurrency,
+        args.min_concurrency,
+        args.requests_per_minute,
+        args.tokens_per_minute,
+        # A plan or a batch export does not write a journal, see below.
+        (
+            None
+            if args.command == "plan"
+            or (args.command == "batch" and args.action == "export")
+            else args.resume or args.run_dir
+        ),
+        args.resume is not None,
+        shard=args.shard,
+        hedge=args.hedge,
+        hedge_quantile=args.hedge_quantile,
+        target_ci=args.target_ci,
+        ci_confidence=args.ci_confidence,
+        ci_min_samples=args.ci_min_samples,
+        cost_history=args.cost_history,
+        request_timeout=args.request_timeout,
+        max_retries=args.max_retries,
+        retry_budget=args.retry_budget,
+        sample_timeout=args.sample_timeout,
+        benchmark_timeout=args.benchmark_timeout,
+        watchdog_interval=args.watchdog_interval,
+        cpu_workers=args.cpu_workers,
+        max_connections=args.max_connections,
+        prompt_caching=args.prompt_caching,
+        stream=args.stream,
+        input_price=args.input_price,
+        output_price=args.output_price,
+        cache=args.cache,
+        cache_path=args.cache_path,
+        cache_max_mb=args.cache_max_mb,
+        record=args.record,
+        replay=args.replay,
     )
 
-    # Get the selected suite(s)
-    if args.suite == "all":
-        selected_suites = available_suites.values()
-    else:
-        selected_suites = [available_suites[args.suite]]
-
-    # Collect all benchmarks from selected suites
-    all_benchmarks = []
-    for suite_class in selected_suites:
-        suite = suite_class()
-        suite_benchmarks = suite.get_tasks()
-        all_benchmarks.extend(suite_benchmarks)
+    all_benchmarks = select_benchmarks(args.suite, args.benchmarks)
+    if not all_benchmarks:
+        print("No benchmarks selected to run!")
+        return
 
-    if args.benchmarks:
-        if "all" in args.benchmarks:
-            benchmark_classes = BENCHMARKS
-        else:
-            bn_to_benchmark = {b.__name__: b for b in BENCHMARKS}
-            benchmark_classes = [bn_to_benchmark[name] for name in args.benchmarks]
+    if args.resume and runner.journal is None:
+        # Only the samples a resumed run has left are planned or exported.
+        runner.journaled = ResultJournal.load(args.resume)
 
-        all_benchmarks.extend(benchmark_classes)
+    if args.command == "plan":
+        plan_run(
+            runner,
+            all_benchmarks,
+            args.limit,
+            output_tokens_per_turn=args.output_tokens_per_turn,
+            request_latency=args.request_latency,
+            input_price=args.input_price,
+            output_price=args.output_price,
+        )
+        return
 
-    if not all_benchmarks:
-        print("No benchmarks selected to run!")
+    if args.command == "batch":
+        if args.action == "export":
+            export_batch(runner, all_benchmarks, args.batch_file, args.limit)
+        else:
+            ingest_batch(runner, all_benchmarks, args.batch_file, args.limit)
         return
 
-    all_benchmarks = list(dict.fromkeys(all_benchmarks))
     benchmarks_str = "\n- ".join(b.__name__ for b in all_benchmarks)
+    models_str = "\n- ".join(target.label for target in runner.targets)
     print(
         f"""Running {len(all_benchmarks)} benchmark(s):\n- {benchmarks_str}
 
-Running {runner.num_benchmarks_parallel} benchmark(s) in parallel
-Running {runner.num_samples_parallel} samples per benchmark in parallel
+Against {len(runner.targets)} model(s):\n- {models_str}
+
+Running up to {runner.max_concurrency} sample(s) in parallel across all benchmarks ({runner.engine} engine)
 """
     )
-    accuracies = runner.run_benchmarks(all_benchmarks, args.limit)
+    sweep = runner.run_sweep(all_benchmarks, args.limit)
+
+    for target, accuracies in sweep:
+        if args.upload:
+            runner.upload_predictions(accuracies, target)
 
-    if args.upload:
-        runner.upload_predictions(accuracies)
+        if len(sweep) > 1:
+            print(f"\nResults for {target.label}:")
+        print_benchmark_results(accuracies)
 
-    print_benchmark_results(accuracies)
+    if len(sweep) > 1:
+        print_sweep_results({target.label: accuracies for target, accuracies in sweep})
 
 
 if __name__ == "__main__":
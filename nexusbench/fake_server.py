@@ -0,0 +1,543 @@
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from dataclasses import dataclass
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ast
+
+import itertools
+
+import json
+
+import random
+
+import threading
+
+import time
+
+
+# Values of the required arguments that the ground truth does not give
+PLACEHOLDERS = {
+    "string": "",
+    "integer": 0,
+    "number": 0,
+    "boolean": False,
+    "array": [],
+    "object": {},
+}
+
+# Error types of the providers' error bodies, by status code
+ERROR_TYPES = {
+    400: "invalid_request_error",
+    429: "rate_limit_error",
+    500: "api_error",
+    503: "overloaded_error",
+    529: "overloaded_error",
+}
+
+FINAL_ANSWER = "Done."
+
+# Characters per streamed chunk, about a token
+CHUNK_CHARS = 4
+
+
+def split_chunks(text: Optional[str]) -> List[str]:
+    text = text or ""
+    return [text[i : i + CHUNK_CHARS] for i in range(0, len(text), CHUNK_CHARS)]
+
+
+@dataclass
+class FakeServerConfig:
+    """
+    How the fake server behaves: every response takes a log-normally distributed
+    `latency` (its median, in seconds) plus `token_latency` per output token, and
+    `error_rate` of the requests fail with `error_status` instead.
+    """
+
+    latency: float = 0.0
+    latency_sigma: float = 0.0
+    token_latency: float = 0.0
+    output_tokens: Optional[int] = None
+    error_rate: float = 0.0
+    error_status: int = 429
+
+    def sample_latency(self, output_tokens: int) -> float:
+        latency = self.latency
+        if latency and self.latency_sigma:
+            latency *= random.lognormvariate(0.0, self.latency_sigma)
+        return latency + self.token_latency * output_tokens
+
+
+def parse_call(
+    call: str, parameters: Dict[str, Any]
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    The function name and JSON arguments of a Python call string, given the JSON
+    schema of the function's parameters.
+
+    Positional arguments are named after the schema, arguments that are not literals
+    (e.g. nested calls) are dropped, and missing required arguments get a placeholder
+    of their type, so that the call can still be executed.
+    """
+    try:
+        node = ast.parse(call.strip(), mode="eval").body
+    except SyntaxError:
+        return None
+    if not isinstance(node, ast.Call):
+        return None
+    if isinstance(node.func, ast.Name):
+        name = node.func.id
+    elif isinstance(node.func, ast.Attribute):
+        name = node.func.attr
+    else:
+        return None
+
+    properties = parameters.get("properties", {})
+    arguments = {}
+    named = list(zip(properties, node.args)) + [
+        (keyword.arg, keyword.value) for keyword in node.keywords if keyword.arg
+    ]
+    for arg, value in named:
+        try:
+            arguments[arg] = ast.literal_eval(value)
+        except ValueError:
+            continue
+    for arg in parameters.get("required", []):
+        if arg not in arguments:
+            arg_type = properties.get(arg, {}).get("type")
+            arguments[arg] = PLACEHOLDERS.get(arg_type, "")
+    return name, arguments
+
+
+class GroundTruthIndex:
+    """
+    Reference calls of every sample (see `BaseBenchmark.reference_calls`), looked up
+    by the query that starts a conversation.
+
+    Several benchmarks share queries (e.g. both typewriter benchmarks ask for the same
+    words), so a lookup also picks the sample whose calls the request has tools for.
+    """
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[str, List[str]]]] = {}
+
+    def add(self, name: str, query, calls: List[str]):
+        if isinstance(query, list):
+            query = query[0] if query else ""
+        self.samples.setdefault(str(query).strip(), []).append((name, calls))
+
+    def add_benchmark(self, benchmark_class: Type):
+        benchmark = benchmark_class()
+        for sample in benchmark.get_samples():
+            self.add(
+                benchmark_class.__name__,
+                sample.query,
+                benchmark.reference_calls(sample),
+            )
+
+    def __len__(self) -> int:
+        return sum(len(candidates) for candidates in self.samples.values())
+
+    def lookup(self, query: str, tool_names) -> Optional[List[str]]:
+        candidates = self.samples.get(query.strip(), [])
+        for _, calls in candidates:
+            names = {call.split("(", 1)[0].split(".")[-1].strip() for call in calls}
+            if names <= set(tool_names):
+                return calls
+        return candidates[0][1] if candidates else None
+
+
+def message_text(content) -> Optional[str]:
+    """Text of an OpenAI or Anthropic message content, if it has any."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                return block.get("text")
+    return None
+
+
+class FakeServerStats:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.answered = 0
+        self.unknown = 0
+        self.errors = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def count(self, field_name: str):
+        with self._lock:
+            self.requests += 1
+            setattr(self, field_name, getattr(self, field_name) + 1)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "requests": self.requests,
+            "answered": self.answered,
+            "unknown": self.unknown,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "requests_per_second": self.requests / elapsed if elapsed else 0.0,
+        }
+
+    def summary(self) -> str:
+        stats = self.as_dict()
+        return (
+            f"Fake server: {stats['requests']} request(s), {stats['answered']} "
+            f"answered from the ground truth, {stats['unknown']} unknown sample(s), "
+            f"{stats['errors']} injected error(s), {stats['cancelled']} stream(s) "
+            "cancelled by the client, "
+            f"{stats['requests_per_second']:.1f} requests/s"
+        )
+
+
+class FakeModelHandler(BaseHTTPRequestHandler):
+    """
+    Answers OpenAI chat completions (`.../chat/completions`) and Anthropic messages
+    (`.../messages`) requests with the next reference call of their sample, and
+    with a final text answer once the calls run out. Requests with `stream` set get
+    the response as server-sent events, about a token per event. `GET /stats`
+    reports the requests served so far.
+    """
+
+    # Keep-alive, like the providers' APIs
+    protocol_version = "HTTP/1.1"
+    index: GroundTruthIndex
+    config: FakeServerConfig
+    stats: FakeServerStats
+    ids = itertools.count()
+
+    def send_json(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.stats.as_dict())
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_error_body(400, "Request body is not JSON")
+            return
+
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path.endswith("/chat/completions"):
+            anthropic = False
+        elif path.endswith("/messages"):
+            anthropic = True
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        if random.random() < self.config.error_rate:
+            self.stats.count("errors")
+            time.sleep(self.config.sample_latency(0))
+            self.send_error_body(self.config.error_status, "Injected error", anthropic)
+            return
+
+        tools = {}
+        for tool in body.get("tools") or []:
+            function = tool.get("function", tool)
+            parameters = function.get("parameters", function.get("input_schema", {}))
+            tools[function.get("name")] = parameters or {}
+
+        messages = body.get("messages", [])
+        query = next(
+            (
+                message_text(m.get("content"))
+                for m in messages
+                if m.get("role") == "user" and message_text(m.get("content"))
+            ),
+            "",
+        )
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+        calls = self.index.lookup(query, tools)
+        self.stats.count("answered" if calls is not None else "unknown")
+
+        call = None
+        if calls is not None and turn < len(calls):
+            name = calls[turn].split("(", 1)[0].split(".")[-1].strip()
+            call = parse_call(calls[turn], tools.get(name, {}))
+
+        text = json.dumps(call[1]) if call is not None else FINAL_ANSWER
+        input_tokens = len(json.dumps(messages)) // 4 + len(json.dumps(tools)) // 4
+        output_tokens = self.config.output_tokens or max(1, len(text) // 4)
+        build = self.anthropic_response if anthropic else self.openai_response
+        response = build(body.get("model"), call, input_tokens, output_tokens)
+        if body.get("stream"):
+            if anthropic:
+                events = self.anthropic_events(response)
+            else:
+                include_usage = (body.get("stream_options") or {}).get("include_usage")
+                events = self.openai_events(response, include_usage)
+            self.send_stream(events, output_tokens)
+            return
+
+        time.sleep(self.config.sample_latency(output_tokens))
+        self.send_json(200, response)
+
+    def openai_response(self, model, call, input_tokens, output_tokens):
+        message = {"role": "assistant", "content": FINAL_ANSWER, "tool_calls": None}
+        if call is not None:
+            message["content"] = None
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{next(self.ids)}",
+                    "type": "function",
+                    "function": {"name": call[0], "arguments": json.dumps(call[1])},
+                }
+            ]
+        return {
+            "id": f"chatcmpl-{next(self.ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if call is not None else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def anthropic_response(self, model, call, input_tokens, output_tokens):
+        content = [{"type": "text", "text": FINAL_ANSWER}]
+        if call is not None:
+            content = [
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_{next(self.ids)}",
+                    "name": call[0],
+                    "input": call[1],
+                }
+            ]
+        return {
+            "id": f"msg_{next(self.ids)}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": content,
+            "stop_reason": "tool_use" if call is not None else "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    @staticmethod
+    def openai_events(response, include_usage=False) -> List[Tuple[Optional[str], Any]]:
+        base = {
+            "id": response["id"],
+            "object": "chat.completion.chunk",
+            "created": response["created"],
+            "model": response["model"],
+        }
+        choice = response["choices"][0]
+        message = choice["message"]
+        deltas = [{"role": "assistant", "content": ""}]
+        if message["tool_calls"]:
+            tool_call = message["tool_calls"][0]
+            function = tool_call["function"]
+            deltas.append(
+                {
+                    "tool_calls": [
+                        {
+                            "index": 0,
+                            "id": tool_call["id"],
+                            "type": "function",
+                            "function": {"name": function["name"], "arguments": ""},
+                        }
+                    ]
+                }
+            )
+            deltas.extend(
+                {"tool_calls": [{"index": 0, "function": {"arguments": chunk}}]}
+                for chunk in split_chunks(function["arguments"])
+            )
+        else:
+            deltas.extend(
+                {"content": chunk} for chunk in split_chunks(message["content"])
+            )
+
+        chunks = [
+            {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            for delta in deltas
+        ]
+        chunks.append(
+            {
+                **base,
+                "choices": [
+                    {"index": 0, "delta": {}, "finish_reason": choice["finish_reason"]}
+                ],
+            }
+        )
+        if include_usage:
+            chunks.append({**base, "choices": [], "usage": response["usage"]})
+        return [(None, chunk) for chunk in chunks] + [(None, "[DONE]")]
+
+    @staticmethod
+    def anthropic_events(response) -> List[Tuple[Optional[str], Any]]:
+        usage = response["usage"]
+        start = {
+            **response,
+            "content": [],
+            "stop_reason": None,
+            "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 1},
+        }
+        events = [("message_start", {"type": "message_start", "message": start})]
+        for index, block in enumerate(response["content"]):
+            if block["type"] == "tool_use":
+                content_block = {**block, "input": {}}
+                deltas = [
+                    {"type": "input_json_delta", "partial_json": chunk}
+                    for chunk in split_chunks(json.dumps(block["input"]))
+                ]
+            else:
+                content_block = {"type": "text", "text": ""}
+                deltas = [
+                    {"type": "text_delta", "text": chunk}
+                    for chunk in split_chunks(block["text"])
+                ]
+            events.append(
+                (
+                    "content_block_start",
+                    {
+                        "type": "content_block_start",
+                        "index": index,
+                        "content_block": content_block,
+                    },
+                )
+            )
+            events.extend(
+                (
+                    "content_block_delta",
+                    {"type": "content_block_delta", "index": index, "delta": delta},
+                )
+                for delta in deltas
+            )
+            events.append(
+                ("content_block_stop", {"type": "content_block_stop", "index": index})
+            )
+        events.append(
+            (
+                "message_delta",
+                {
+                    "type": "message_delta",
+                    "delta": {
+                        "stop_reason": response["stop_reason"],
+                        "stop_sequence": None,
+                    },
+                    "usage": {"output_tokens": usage["output_tokens"]},
+                },
+            )
+        )
+        events.append(("message_stop", {"type": "message_stop"}))
+        return events
+
+    def send_stream(self, events: List[Tuple[Optional[str], Any]], output_tokens: int):
+        """
+        Send server-sent events: the first one after the latency of a response
+        without output, and the output tokens spread over the others.
+        """
+        time.sleep(self.config.sample_latency(0))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        delay = self.config.token_latency * output_tokens / max(1, len(events) - 1)
+        try:
+            for position, (name, data) in enumerate(events):
+                if position and delay:
+                    time.sleep(delay)
+                payload = data if isinstance(data, str) else json.dumps(data)
+                event = (f"event: {name}\n" if name else "") + f"data: {payload}\n\n"
+                self.wfile.write(f"{len(event.encode()):x}\r\n{event}\r\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. once it had the tool call it needed.
+            self.stats.cancel()
+            # pylint: disable-next=attribute-defined-outside-init
+            self.close_connection = True
+
+    def send_error_body(self, status: int, message: str, anthropic: bool = False):
+        error = {"type": ERROR_TYPES.get(status, "api_error"), "message": message}
+        self.send_json(
+            status, {"type": "error", "error": error} if anthropic else {"error": error}
+        )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def create_fake_server(
+    index: GroundTruthIndex,
+    config: Optional[FakeServerConfig] = None,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+):
+    handler = type(
+        "BoundFakeModelHandler",
+        (FakeModelHandler,),
+        {
+            "index": index,
+            "config": config or FakeServerConfig(),
+            "stats": FakeServerStats(),
+        },
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_fake(
+    benchmarks: List[Type],
+    config: FakeServerConfig,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+):
+    """Run the fake model server until interrupted."""
+    index = GroundTruthIndex()
+    for benchmark_class in benchmarks:
+        print(f"Loading the ground truth of {benchmark_class.__name__}")
+        try:
+            index.add_benchmark(benchmark_class)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error loading {benchmark_class.__name__}: {e}")
+
+    server = create_fake_server(index, config, host, port)
+    address = f"http://{host}:{server.server_address[1]}"
+    print(
+        f"Answering {len(index)} sample(s) on {address} (--base_url {address}/v1 for "
+        f"OpenAI clients, {address} for Anthropic clients)"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.RequestHandlerClass.stats.summary())
@@ -0,0 +1,149 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from dataclasses import dataclass
+
+from collections import deque
+
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+
+import asyncio
+
+import contextvars
+
+import threading
+
+import time
+
+from nexusbench.utils import percentile
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    fired: int = 0
+    won: int = 0
+
+
+class HedgingPolicy:
+    """
+    Hedged requests: if a request has not returned after the observed `quantile`
+    latency of its key (e.g. a (benchmark, model) pair), a duplicate is sent and
+    whichever finishes first is used.
+
+    No request is hedged until `min_samples` latencies have been observed for its
+    key. Only latencies of successful requests over the last `window` requests are
+    kept, so the threshold follows the endpoint as its load changes.
+
+    Blocking requests that may be hedged run on a pool of `max_workers` threads
+    shared by the whole run, where the losing one finishes in the background.
+    """
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_samples: int = 20,
+        window: int = 200,
+        max_workers: Optional[int] = None,
+    ):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.latencies: Dict[Hashable, deque] = {}
+        self.stats: Dict[Hashable, HedgeStats] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="hedge")
+
+    def _submit(self, func: Callable[[], Any]) -> Future:
+        """Run `func` on the pool, in a copy of the caller's context."""
+        return self._executor.submit(contextvars.copy_context().run, func)
+
+    def delay(self, key: Hashable) -> Optional[float]:
+        """Seconds to wait before hedging a request, or None to not hedge it."""
+        with self._lock:
+            latencies = self.latencies.get(key)
+            if latencies is None or len(latencies) < self.min_samples:
+                return None
+            return percentile(latencies, self.quantile)
+
+    def _record(self, key: Hashable, started: float, fired: bool, won: bool):
+        with self._lock:
+            self.latencies.setdefault(key, deque(maxlen=self.window)).append(
+                time.monotonic() - started
+            )
+            stats = self.stats.setdefault(key, HedgeStats())
+            stats.requests += 1
+            stats.fired += fired
+            stats.won += won
+
+    def run(
+        self, key: Hashable, primary: Callable[[], Any], hedge: Callable[[], Any]
+    ) -> Any:
+        started = time.monotonic()
+        delay = self.delay(key)
+        if delay is None:
+            result = primary()
+            self._record(key, started, fired=False, won=False)
+            return result
+
+        primary_future = self._submit(primary)
+        done, _ = wait([primary_future], timeout=delay)
+        if done:
+            result = primary_future.result()
+            self._record(key, started, fired=False, won=False)
+            return result
+
+        # The losing request cannot be interrupted and finishes in the background.
+        hedge_future = self._submit(hedge)
+        for future in as_completed([primary_future, hedge_future]):
+            if future.exception() is None:
+                self._record(key, started, True, won=future is hedge_future)
+                return future.result()
+        raise primary_future.exception()
+
+    async def arun(
+        self,
+        key: Hashable,
+        primary: Callable[[], Awaitable],
+        hedge: Callable[[], Awaitable],
+    ) -> Any:
+        started = time.monotonic()
+        delay = self.delay(key)
+        if delay is None:
+            result = await primary()
+            self._record(key, started, fired=False, won=False)
+            return result
+
+        tasks = [asyncio.ensure_future(primary())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                result = tasks[0].result()
+                self._record(key, started, fired=False, won=False)
+                return result
+
+            tasks.append(asyncio.ensure_future(hedge()))
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self._record(key, started, True, won=task is tasks[1])
+                        return task.result()
+            raise tasks[0].exception()
+        finally:
+            # Unlike threads, the losing request can be cancelled.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def summary(self) -> str:
+        lines = ["Hedged requests:"]
+        for key, stats in self.stats.items():
+            name = " / ".join(str(k) for k in key) if isinstance(key, tuple) else key
+            lines.append(
+                f"  {name}: {stats.fired} of {stats.requests} request(s) hedged, "
+                f"{stats.won} hedge(s) won"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,117 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import hashlib
+
+import json
+
+import os
+
+import threading
+
+
+JOURNAL_FILENAME = "journal.jsonl"
+CONFIG_FILENAME = "config.json"
+
+
+def sample_id(benchmark_name: str, index: int, sample) -> str:
+    """Stable identifier of a sample: its benchmark, position and query."""
+    key = json.dumps([benchmark_name, index, str(sample.query)])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def run_config_key(client: str, model: Optional[str], base_url: Optional[str]) -> str:
+    """Identifier of the configuration a result was produced with."""
+    key = json.dumps({"client": client, "model": model, "base_url": base_url})
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def serialize_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    JSON-safe copy of a sample result.
+
+    Provider response objects in the context are stored as strings, which is also
+    what `FCAPIPrompter.get_prompt_completions_from_context` reduces them to.
+    """
+    serialized = dict(result)
+    if "context" in serialized:
+        serialized["context"] = [
+            {k: str(v) for k, v in turn.items()} for turn in serialized["context"]
+        ]
+    return json.loads(json.dumps(serialized, default=str))
+
+
+class ResultJournal:
+    """
+    Append-only JSONL journal of finished samples inside a run directory.
+
+    The file is opened for each line, which is flushed and synced to disk as soon as
+    its sample finishes, so a crashed or interrupted run keeps everything that
+    completed. Samples that raised are not journaled and are therefore retried on
+    resume.
+    """
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        self.path = os.path.join(run_dir, JOURNAL_FILENAME)
+        os.makedirs(run_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write_config(self, config: Dict[str, Any]):
+        with open(
+            os.path.join(self.run_dir, CONFIG_FILENAME), "w", encoding="utf-8"
+        ) as f:
+            json.dump(config, f, indent=2)
+
+    def append(self, config_key: str, benchmark: str, sid: str, result: Any):
+        if isinstance(result, Exception):
+            return
+
+        line = json.dumps(
+            {
+                "config": config_key,
+                "benchmark": benchmark,
+                "sample_id": sid,
+                "result": serialize_result(result),
+            }
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def load(run_dir: str) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+        """Map (config key, benchmark, sample id) to the journaled result."""
+        entries = {}
+        path = os.path.join(run_dir, JOURNAL_FILENAME)
+        if not os.path.exists(path):
+            return entries
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write.
+                    continue
+                key = (entry["config"], entry["benchmark"], entry["sample_id"])
+                entries[key] = entry["result"]
+        return entries
+
+    @staticmethod
+    def load_config(run_dir: str) -> Dict[str, Any]:
+        path = os.path.join(run_dir, CONFIG_FILENAME)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def load_turn_counts(run_dirs: List[str]) -> Dict[Tuple[str, str], float]:
+    """Average number of model calls per (benchmark, sample id) in previous runs."""
+    turns: Dict[Tuple[str, str], List[int]] = {}
+    for run_dir in run_dirs:
+        for (_, benchmark, sid), result in ResultJournal.load(run_dir).items():
+            if isinstance(result.get("context"), list):
+                turns.setdefault((benchmark, sid), []).append(len(result["context"]))
+    return {key: sum(counts) / len(counts) for key, counts in turns.items()}
@@ -0,0 +1,187 @@
+from typing import Any, Callable, Optional, Tuple
+
+from dataclasses import dataclass
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from contextlib import contextmanager, nullcontext
+
+from contextvars import ContextVar
+
+import asyncio
+
+import multiprocessing
+
+import pickle
+
+import threading
+
+import time
+
+
+@dataclass
+class CPUTask:
+    """
+    A CPU-bound step of a sample, e.g. running the model's calls or scoring them.
+
+    `BaseBenchmark.sample_steps` yields these besides model requests, and the sample
+    driver sends back `func(*args)`. The function, its arguments and its result must
+    be picklable to run on the CPU pool, otherwise the task runs in the driving
+    thread.
+    """
+
+    func: Callable[..., Any]
+    args: Tuple = ()
+
+    def __call__(self):
+        return self.func(*self.args)
+
+
+class StageDepth:
+    """Number of items in a pipeline stage, with its peak and time-weighted mean."""
+
+    def __init__(self):
+        self.depth = 0
+        self.peak = 0
+        self.area = 0.0
+        self.started = self.updated = time.monotonic()
+
+    def set(self, depth: int):
+        now = time.monotonic()
+        self.area += self.depth * (now - self.updated)
+        self.updated = now
+        self.depth = depth
+        self.peak = max(self.peak, depth)
+
+    def mean(self) -> float:
+        now = time.monotonic()
+        area = self.area + self.depth * (now - self.updated)
+        return area / (now - self.started) if now > self.started else 0.0
+
+
+def _run_inline(e: Exception) -> bool:
+    """Whether a task failed because of the pool rather than by itself."""
+    return isinstance(e, (pickle.PicklingError, BrokenProcessPool)) or (
+        isinstance(e, (TypeError, AttributeError)) and "pickle" in str(e)
+    )
+
+
+class Pipeline:
+    """
+    Hands the CPU-bound steps of samples to a process pool.
+
+    Model requests keep running on the scheduler's I/O workers (threads or
+    coroutines), while tool execution and scoring run on `cpu_workers` processes,
+    outside of the GIL. The depth of every stage is tracked, so the summary shows
+    whether samples mostly wait on the model or on the CPU pool.
+    """
+
+    def __init__(self, cpu_workers: int):
+        self.cpu_workers = cpu_workers
+        # Workers are spawned rather than forked, as the parent runs many threads.
+        self.executor = ProcessPoolExecutor(
+            cpu_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.io = StageDepth()
+        self.cpu_queued = StageDepth()
+        self.cpu_running = StageDepth()
+        self.cpu_tasks = 0
+        self.cpu_time = 0.0
+        self._in_pool = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def io_stage(self):
+        """Counts a model request in flight."""
+        with self._lock:
+            self.io.set(self.io.depth + 1)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.io.set(self.io.depth - 1)
+
+    def _update_pool(self, delta: int):
+        with self._lock:
+            self._in_pool += delta
+            self.cpu_queued.set(max(0, self._in_pool - self.cpu_workers))
+            self.cpu_running.set(min(self._in_pool, self.cpu_workers))
+
+    def submit(self, task: CPUTask) -> Future:
+        started = time.monotonic()
+        self._update_pool(1)
+
+        def done(_):
+            self._update_pool(-1)
+            with self._lock:
+                self.cpu_tasks += 1
+                self.cpu_time += time.monotonic() - started
+
+        future = self.executor.submit(task)
+        future.add_done_callback(done)
+        return future
+
+    def run(self, task: CPUTask) -> Any:
+        try:
+            return self.submit(task).result()
+        except Exception as e:
+            if not _run_inline(e):
+                raise
+        return task()
+
+    async def arun(self, task: CPUTask) -> Any:
+        try:
+            return await asyncio.wrap_future(self.submit(task))
+        except Exception as e:
+            if not _run_inline(e):
+                raise
+        return task()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def summary(self) -> str:
+        mean_time = self.cpu_time / self.cpu_tasks if self.cpu_tasks else 0.0
+        return "\n".join(
+            [
+                "Pipeline stage depths (mean / peak):",
+                f"  Waiting on the model: {self.io.mean():.1f} / {self.io.peak}",
+                f"  Queued for the CPU pool: {self.cpu_queued.mean():.1f} / "
+                f"{self.cpu_queued.peak}",
+                f"  Running on the CPU pool: {self.cpu_running.mean():.1f} / "
+                f"{self.cpu_running.peak} of {self.cpu_workers} worker(s)",
+                f"  {self.cpu_tasks} CPU task(s), {mean_time * 1000:.0f}ms on average "
+                "including queueing",
+            ]
+        )
+
+
+# Pipeline of the run the current sample belongs to, set by the scheduler.
+current_pipeline: ContextVar[Optional[Pipeline]] = ContextVar(
+    "current_pipeline", default=None
+)
+
+
+@contextmanager
+def pipeline_context(pipeline: Optional[Pipeline]):
+    token = current_pipeline.set(pipeline)
+    try:
+        yield
+    finally:
+        current_pipeline.reset(token)
+
+
+def io_stage():
+    pipeline = current_pipeline.get()
+    return pipeline.io_stage() if pipeline is not None else nullcontext()
+
+
+def run_cpu_task(task: CPUTask) -> Any:
+    pipeline = current_pipeline.get()
+    return pipeline.run(task) if pipeline is not None else task()
+
+
+async def arun_cpu_task(task: CPUTask) -> Any:
+    pipeline = current_pipeline.get()
+    return await pipeline.arun(task) if pipeline is not None else task()
@@ -0,0 +1,241 @@
+from typing import Dict, List, Optional, Tuple, Type
+
+from dataclasses import dataclass
+
+from concurrent.futures import ThreadPoolExecutor
+
+from tabulate import tabulate
+
+from nexusbench.config import MODEL_PRICES
+from nexusbench.scheduler import BenchmarkJob
+from nexusbench.utils import estimate_tokens
+
+
+@dataclass
+class BenchmarkPlan:
+    """Expected load of running one benchmark against one model target."""
+
+    benchmark: str
+    label: str
+    client: str
+    samples: int = 0
+    requests: float = 0.0
+    input_tokens: float = 0.0
+    output_tokens: float = 0.0
+    # Turns of the longest sample, which bounds the wall time from below
+    max_turns: float = 0.0
+    # Samples whose first prompt could not be built, and are not counted
+    skipped: int = 0
+    cost: Optional[float] = None
+    base_url: Optional[str] = None
+
+
+def get_prices(
+    model: Optional[str],
+    input_price: Optional[float] = None,
+    output_price: Optional[float] = None,
+) -> Optional[Tuple[float, float]]:
+    """USD per million (input, output) tokens of `model`, or None if unknown."""
+    known = MODEL_PRICES.get(model)
+    if input_price is None and output_price is None:
+        return known
+    known = known or (0.0, 0.0)
+    return (
+        known[0] if input_price is None else input_price,
+        known[1] if output_price is None else output_price,
+    )
+
+
+def first_prompt_tokens(job: BenchmarkJob, index: int) -> Optional[int]:
+    """
+    Tokens of the first prompt of a sample, built with the prompter like a real run.
+
+    The sample's generator is only advanced to its first request, so nothing is sent.
+    """
+    steps = job.benchmark.sample_steps(job.inputs[index])
+    try:
+        prompt, _ = next(steps)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+    finally:
+        steps.close()
+    return estimate_tokens(prompt)
+
+
+def plan_job(
+    job: BenchmarkJob,
+    output_tokens_per_turn: int,
+    prices: Optional[Tuple[float, float]] = None,
+) -> BenchmarkPlan:
+    """
+    Estimate the requests and tokens of the samples of a job that are not finished yet.
+
+    A sample is expected to take as many turns as its cost estimate (see
+    `BaseBenchmark.estimate_cost`). Every turn resends the prompt along with the
+    calls and tool results of the previous turns, each counted as
+    `output_tokens_per_turn` tokens.
+    """
+    plan = BenchmarkPlan(
+        job.name, job.target.label, job.target.client, base_url=job.target.base_url
+    )
+    for index, (sample, *_) in enumerate(job.inputs):
+        if index in job.completed:
+            continue
+        prompt_tokens = first_prompt_tokens(job, index)
+        if prompt_tokens is None:
+            plan.skipped += 1
+            continue
+
+        turns = job.costs[index] if job.costs else job.benchmark.estimate_cost(sample)
+        plan.samples += 1
+        plan.requests += turns
+        # Turn k resends the k previous calls and results: sum(2 * k) = turns * (turns - 1)
+        plan.input_tokens += (
+            turns * prompt_tokens + turns * (turns - 1) * output_tokens_per_turn
+        )
+        plan.output_tokens += turns * output_tokens_per_turn
+        plan.max_turns = max(plan.max_turns, turns)
+
+    if prices is not None:
+        plan.cost = (
+            plan.input_tokens * prices[0] + plan.output_tokens * prices[1]
+        ) / 1e6
+    return plan
+
+
+def estimate_wall_time(
+    plans: List[BenchmarkPlan],
+    max_concurrency: Optional[int],
+    request_latency: float,
+    rate_limits: Optional[
+        Dict[Tuple[str, Optional[str]], Tuple[Optional[float], Optional[float]]]
+    ] = None,
+) -> float:
+    """
+    Lower bound on the wall time of running all plans from one queue, in seconds.
+
+    Samples run their turns one after the other, `max_concurrency` samples at a time
+    (unbounded if None), and each (client, base url) endpoint is further held to its
+    (requests, tokens) per minute quota in `rate_limits`.
+    """
+    requests = sum(plan.requests for plan in plans)
+    if not requests:
+        return 0.0
+
+    concurrency = max_concurrency or sum(plan.samples for plan in plans)
+    bounds = [
+        requests * request_latency / max(1, concurrency),
+        max(plan.max_turns for plan in plans) * request_latency,
+    ]
+    for endpoint, (rpm, tpm) in (rate_limits or {}).items():
+        client_plans = [
+            plan for plan in plans if (plan.client, plan.base_url) == endpoint
+        ]
+        if rpm:
+            bounds.append(sum(plan.requests for plan in client_plans) / rpm * 60)
+        if tpm:
+            bounds.append(sum(plan.input_tokens for plan in client_plans) / tpm * 60)
+    return max(bounds)
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return (
+        f"{hours}h {minutes:02d}m {seconds:02d}s"
+        if hours
+        else f"{minutes}m {seconds:02d}s"
+    )
+
+
+def print_plan(plans: List[BenchmarkPlan], wall_time: float):
+    def format_cost(cost):
+        return "N/A" if cost is None else f"${cost:,.2f}"
+
+    table_data = [
+        [
+            plan.benchmark,
+            plan.label,
+            plan.samples,
+            f"{plan.requests:,.0f}",
+            f"{plan.input_tokens:,.0f}",
+            f"{plan.output_tokens:,.0f}",
+            format_cost(plan.cost),
+        ]
+        for plan in plans
+    ]
+    costs = [plan.cost for plan in plans]
+    table_data.append(
+        [
+            "Total",
+            "",
+            sum(plan.samples for plan in plans),
+            f"{sum(plan.requests for plan in plans):,.0f}",
+            f"{sum(plan.input_tokens for plan in plans):,.0f}",
+            f"{sum(plan.output_tokens for plan in plans):,.0f}",
+            format_cost(None if None in costs else sum(costs)),
+        ]
+    )
+
+    print("\nRun Plan:")
+    print(
+        tabulate(
+            table_data,
+            headers=[
+                "Benchmark",
+                "Model",
+                "Samples",
+                "Requests",
+                "Input Tokens",
+                "Output Tokens",
+                "Cost",
+            ],
+            tablefmt="grid",
+        )
+    )
+    skipped = sum(plan.skipped for plan in plans)
+    if skipped:
+        print(
+            f"{skipped} sample(s) whose first prompt could not be built are not counted"
+        )
+    if None in costs:
+        print("No price is known for some models, pass --input_price/--output_price")
+    print(f"Expected wall time: {format_duration(wall_time)}")
+
+
+def plan_run(
+    runner,
+    benchmarks: List[Type],
+    limit: Optional[int] = None,
+    output_tokens_per_turn: int = 100,
+    request_latency: float = 2.0,
+    input_price: Optional[float] = None,
+    output_price: Optional[float] = None,
+) -> Tuple[List[BenchmarkPlan], float]:
+    """Estimate and print the load of a run without sending a single request."""
+    with ThreadPoolExecutor(runner.num_benchmarks_parallel) as executor:
+        per_benchmark = list(
+            executor.map(lambda b: runner.prepare_benchmark(b, limit), benchmarks)
+        )
+
+    plans = [
+        plan_job(
+            job,
+            output_tokens_per_turn,
+            get_prices(job.target.model, input_price, output_price),
+        )
+        for jobs in per_benchmark
+        for job in jobs
+    ]
+    rate_limits = {
+        endpoint: (
+            limiter.requests.rate_per_second * 60 if limiter.requests else None,
+            limiter.tokens.rate_per_second * 60 if limiter.tokens else None,
+        )
+        for endpoint, limiter in runner.rate_limiters.items()
+    }
+    wall_time = estimate_wall_time(
+        plans, runner.max_concurrency, request_latency, rate_limits
+    )
+    print_plan(plans, wall_time)
+    return plans, wall_time
@@ -0,0 +1,56 @@
+from typing import Any, Dict, List, Optional
+
+import threading
+
+from nexusbench.usage import TokenUsage
+
+
+# Anthropic's marker of the end of a cacheable prefix
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def mark_cacheable(content) -> List[Dict[str, Any]]:
+    """
+    Copy of a message's content (a string or a list of blocks) whose last block ends
+    a cacheable prefix. Blocks that are SDK objects (e.g. a previous response's
+    tool use) are left as they are.
+    """
+    if isinstance(content, str):
+        return [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    content = list(content)
+    if content and isinstance(content[-1], dict):
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+    return content
+
+
+class PromptCacheStats:
+    """
+    Input tokens of the responses of a prompter's clients per benchmark, and how
+    many of them were read from or written to the provider's prompt cache.
+    """
+
+    def __init__(self):
+        self.usage: Dict[Optional[str], TokenUsage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, benchmark: Optional[str], usage: TokenUsage):
+        with self._lock:
+            total = self.usage.setdefault(benchmark, TokenUsage())
+            total.input_tokens += usage.input_tokens
+            total.output_tokens += usage.output_tokens
+            total.cache_read_tokens += usage.cache_read_tokens
+            total.cache_write_tokens += usage.cache_write_tokens
+
+    def summary(self, name: str) -> str:
+        lines = [f"Prompt cache of {name}:"]
+        for benchmark, usage in sorted(self.usage.items(), key=lambda i: str(i[0])):
+            total = usage.total_input_tokens
+            read_rate = f" ({usage.cache_read_tokens / total:.1%})" if total else ""
+            lines.append(
+                f"  {benchmark or 'other'}: {usage.cache_read_tokens} of {total} input "
+                f"token(s) read from the cache{read_rate}, "
+                f"{usage.cache_write_tokens} written"
+            )
+        if len(lines) == 1:
+            lines.append("  no responses")
+        return "\n".join(lines)
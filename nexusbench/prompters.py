@@ -1,6 +1,6 @@
-from typing import Dict, List, Callable, Optional, Tuple
+from typing import Any, Dict, List, Callable, Optional, Tuple
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from collections import OrderedDict
 
@@ -10,12 +10,67 @@ import re
 
 import json
 
+import asyncio
+
+import threading
+
+from nexusbench.cassettes import current_cassette
+from nexusbench.connections import ConnectionStats
+from nexusbench.prompt_caching import CACHE_CONTROL, PromptCacheStats, mark_cacheable
+from nexusbench.streaming import StreamStats
+from nexusbench.usage import track_call
+
 
 @dataclass
 class FCAPIPrompter:
     api_key: str = None
     model: Optional[str] = None
     base_url: Optional[str] = None
+    # Shared by every client this prompter creates, see nexusbench.concurrency
+    concurrency_controller: Optional[Any] = field(
+        default=None, repr=False, compare=False
+    )
+    # Shared by every client this prompter creates, see nexusbench.rate_limits
+    rate_limiter: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Replicas to spread requests over when base_url lists several, see nexusbench.endpoints
+    endpoint_pool: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Shared by every client this prompter creates, see nexusbench.hedging
+    hedging_policy: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Shared by every client of a run, see nexusbench.retries
+    retry_policy: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Seconds before a single request is abandoned (None keeps the SDK default)
+    request_timeout: Optional[float] = None
+    # Cap on the HTTP connections of the prompter's client (None keeps the SDK default)
+    max_connections: Optional[int] = None
+    # Connections opened by the prompter's clients, see nexusbench.connections
+    connection_stats: ConnectionStats = field(
+        default_factory=ConnectionStats, repr=False, compare=False
+    )
+    # Mark the tools, system prompt and history of prompts as cacheable by the provider
+    prompt_caching: bool = False
+    # Prompt cache usage of the prompter's responses, see nexusbench.prompt_caching
+    prompt_cache_stats: PromptCacheStats = field(
+        default_factory=PromptCacheStats, repr=False, compare=False
+    )
+    # Stream responses and stop them once their first tool call is complete
+    stream: bool = False
+    # Latencies of the prompter's streamed responses, see nexusbench.streaming
+    stream_stats: StreamStats = field(
+        default_factory=StreamStats, repr=False, compare=False
+    )
+    # Shared by all prompters of a run, see nexusbench.completion_cache
+    completion_cache: Optional[Any] = field(default=None, repr=False, compare=False)
+    # Whether one client can be shared by all threads, or each thread needs its own
+    thread_safe_client = True
+    # Whether the prompter's clients send over an httpx client of ours, which
+    # `max_connections` caps and `connection_stats` counts
+    counts_connections = True
+    _clients: Dict[Any, Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _clients_lock: Any = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
 
     def get_model_id(self):
         return self.model
@@ -56,9 +111,14 @@ class FCAPIPrompter:
         )
         return contextual_history
 
-    def create_client(self):
+    def create_client(self, **kwargs):
         raise NotImplementedError("Subclasses must implement create_client method")
 
+    def create_async_client(self):
+        raise NotImplementedError(
+            "Subclasses must implement create_async_client method"
+        )
+
     def construct_tool_descriptions(self, benchmark, tools: List[Callable]) -> str:
         return benchmark.get_json_representation
 
@@ -77,9 +137,62 @@ class FCAPIPrompter:
         params = {"api_key": self.api_key}
         if self.base_url is not None:
             params[base_url_key] = self.base_url
+        if self.concurrency_controller is not None:
+            params["concurrency_controller"] = self.concurrency_controller
+        if self.rate_limiter is not None:
+            params["rate_limiter"] = self.rate_limiter
+        if self.endpoint_pool is not None:
+            params["endpoint_pool"] = self.endpoint_pool
+        if self.hedging_policy is not None:
+            params["hedging_policy"] = self.hedging_policy
+        if self.retry_policy is not None:
+            params["retry_policy"] = self.retry_policy
+        if self.request_timeout is not None:
+            params["request_timeout"] = self.request_timeout
+        if self.max_connections is not None:
+            params["max_connections"] = self.max_connections
+        params["connection_stats"] = self.connection_stats
+        params["prompt_cache_stats"] = self.prompt_cache_stats
+        if self.stream:
+            params["stream"] = True
+            params["stream_stats"] = self.stream_stats
 
         return params
 
+    def get_client(self):
+        """
+        The client of this prompter, created on first use and reused by every request
+        (per thread if the client is not thread-safe), so that connections are kept
+        alive across turns and samples.
+        """
+        key = None if self.thread_safe_client else threading.get_ident()
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = self.create_client()
+            return self._clients[key]
+
+    def get_batch_client(self):
+        """
+        A client that only builds and parses batch files, see `nexusbench.batch`. It
+        creates no provider SDK client, so it needs no API key.
+        """
+        return self.create_client(sdk_client=False)
+
+    def get_async_client(self):
+        """Same as `get_client`, for the running event loop."""
+        key = asyncio.get_running_loop()
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = self.create_async_client()
+            return self._clients[key]
+
+    async def aclose(self):
+        """Close the async client of the running event loop, before the loop ends."""
+        with self._clients_lock:
+            client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
     @staticmethod
     def _strip_formatting(s):
         if not isinstance(s, str):
@@ -90,10 +203,73 @@ class FCAPIPrompter:
             s = match.group(1).strip()
         return s.replace("Call:", "").strip()
 
-    def get_completion(self, prompt, model=None, contextual_history=None):
-        result = self.create_client().get_completion(
-            prompt, model=model, contextual_history=contextual_history
+    def get_request_key(self, client, prompt, model) -> Optional[str]:
+        """Key of a request, if the completion cache or a cassette needs one."""
+        if self.completion_cache is None and current_cassette.get() is None:
+            return None
+        from nexusbench.completion_cache import cache_key
+
+        return cache_key(
+            type(self).__name__,
+            model,
+            self.base_url,
+            client.get_request_payload(prompt, model),
         )
+
+    def lookup_completion(self, key: Optional[str]) -> Optional[Any]:
+        """The stored response of a request, from its cassette or the cache."""
+        if key is None:
+            return None
+        cassette = current_cassette.get()
+        if cassette is not None and cassette.replaying:
+            return cassette.replay(key)
+        if self.completion_cache is not None:
+            return self.completion_cache.get(key)
+        return None
+
+    def store_completion(self, key: Optional[str], response, cached: bool = False):
+        if key is None:
+            return
+        cassette = current_cassette.get()
+        if cassette is not None and not cassette.replaying:
+            cassette.record(key, response)
+        if self.completion_cache is not None and not cached:
+            self.completion_cache.put(key, response)
+
+    def get_completion(self, prompt, model=None, contextual_history=None):
+        client = self.get_client()
+        key = self.get_request_key(client, prompt, model)
+        result = self.lookup_completion(key)
+        if result is not None:
+            self.store_completion(key, result, cached=True)
+            with track_call(from_cache=True) as call:
+                call.add_tokens(client.get_token_usage(result))
+            return result
+
+        with track_call() as call:
+            result = client.get_completion(
+                prompt, model=model, contextual_history=contextual_history
+            )
+            call.add_tokens(client.get_token_usage(result))
+        self.store_completion(key, result)
+        return result
+
+    async def aget_completion(self, prompt, model=None, contextual_history=None):
+        client = self.get_async_client()
+        key = self.get_request_key(client, prompt, model)
+        result = self.lookup_completion(key)
+        if result is not None:
+            self.store_completion(key, result, cached=True)
+            with track_call(from_cache=True) as call:
+                call.add_tokens(client.get_token_usage(result))
+            return result
+
+        with track_call() as call:
+            result = await client.get_completion(
+                prompt, model=model, contextual_history=contextual_history
+            )
+            call.add_tokens(client.get_token_usage(result))
+        self.store_completion(key, result)
         return result
 
     def post_process_call(self, call: str) -> Tuple[str, int]:
@@ -253,14 +429,24 @@ class FCAPIPrompter:
 
 @dataclass
 class OpenAIFCPrompter(FCAPIPrompter):
-    def create_client(self):
+    def create_client(self, **kwargs):
         from nexusbench.clients import OpenAIFCClient
 
-        return OpenAIFCClient(**self.get_client_params())
+        return OpenAIFCClient(**self.get_client_params(), **kwargs)
+
+    def create_async_client(self):
+        from nexusbench.clients import AsyncOpenAIFCClient
+
+        return AsyncOpenAIFCClient(**self.get_client_params())
 
 
 @dataclass
 class QwenFCPrompter(FCAPIPrompter):
+    # qwen-agent clients are not documented to be thread-safe.
+    thread_safe_client = False
+    # qwen-agent creates a new OpenAI client for every request.
+    counts_connections = False
+
     def _get_message_from_previous_response(self, previous_response):
         return previous_response
 
@@ -275,10 +461,15 @@ class QwenFCPrompter(FCAPIPrompter):
             "content": str(result),
         }
 
-    def create_client(self):
+    def create_client(self, **kwargs):
         from nexusbench.clients import QwenFCClient
 
-        return QwenFCClient(**self.get_client_params())
+        return QwenFCClient(**self.get_client_params(), **kwargs)
+
+    def create_async_client(self):
+        from nexusbench.clients import AsyncQwenFCClient
+
+        return AsyncQwenFCClient(**self.get_client_params())
 
     def post_process_call(self, call: dict) -> Tuple[str, int]:
         if not "function_call" in call or call["function_call"] is None:
@@ -321,18 +512,31 @@ class QwenFCPrompter(FCAPIPrompter):
 
 @dataclass
 class MistralFCPrompter(FCAPIPrompter):
-    def create_client(self):
+    # MistralClient builds its own httpx client.
+    counts_connections = False
+
+    def create_client(self, **kwargs):
         from nexusbench.clients import MistralFCClient
 
-        return MistralFCClient(**self.get_client_params("endpoint"))
+        return MistralFCClient(**self.get_client_params(), **kwargs)
+
+    def create_async_client(self):
+        from nexusbench.clients import AsyncMistralFCClient
+
+        return AsyncMistralFCClient(**self.get_client_params())
 
 
 @dataclass
 class AnthropicFCPrompter(FCAPIPrompter):
-    def create_client(self):
+    def create_client(self, **kwargs):
         from nexusbench.clients import AnthropicFCClient
 
-        return AnthropicFCClient(**self.get_client_params())
+        return AnthropicFCClient(**self.get_client_params(), **kwargs)
+
+    def create_async_client(self):
+        from nexusbench.clients import AsyncAnthropicFCClient
+
+        return AsyncAnthropicFCClient(**self.get_client_params())
 
     def post_process_call(self, call: str) -> Tuple[str, int]:
         """
@@ -499,4 +703,25 @@ class AnthropicFCPrompter(FCAPIPrompter):
             new_tools.append(new_func)
 
         result["tools"] = new_tools
+        if self.prompt_caching:
+            self._mark_cacheable_prefix(result, bool(contextual_history))
         return result
+
+    @staticmethod
+    def _mark_cacheable_prefix(prompt: Dict, has_history: bool):
+        """
+        Add cache breakpoints after the tools and the system prompt, which are the
+        same for every sample of a benchmark, and for agents after the history, so
+        that every turn reads the prefix the previous turn wrote. A single-turn query
+        is never sent twice and is not worth the price of a cache write.
+        """
+        if prompt["tools"]:
+            prompt["tools"][-1]["cache_control"] = CACHE_CONTROL
+        if prompt["system"]:
+            prompt["system"] = mark_cacheable(prompt["system"])
+        if has_history and prompt["messages"]:
+            last = prompt["messages"][-1]
+            prompt["messages"][-1] = {
+                **last,
+                "content": mark_cacheable(last["content"]),
+            }
@@ -0,0 +1,114 @@
+from typing import Optional
+
+import asyncio
+
+import threading
+
+import time
+
+from nexusbench.deadlines import check_deadline
+from nexusbench.utils import cap_to_deadline
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+
+    The bucket holds at most `burst_seconds` worth of tokens. A request larger than
+    the bucket is admitted once the bucket is full and leaves it in debt, so
+    oversized requests are delayed rather than blocked forever.
+    """
+
+    def __init__(self, rate_per_minute: float, burst_seconds: float = 10.0):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate_per_second * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate_per_second
+        )
+        self.updated = now
+
+    def try_consume(self, amount: float) -> float:
+        """Consume `amount` if possible and return 0, else return the seconds to wait."""
+        with self._lock:
+            self._refill()
+            needed = min(amount, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= amount
+                return 0.0
+            return (needed - self.tokens) / self.rate_per_second
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets shared by every client of an
+    endpoint.
+
+    Callers draw one request and an estimate of the prompt tokens before each request
+    attempt, and reconcile the estimate with the usage reported in the response. A
+    caller never waits past its sample's deadline, and gets a `SampleTimeout` once the
+    deadline has passed.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+    ):
+        self.requests = (
+            TokenBucket(requests_per_minute) if requests_per_minute else None
+        )
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.total_wait = 0.0
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, num_tokens: int) -> float:
+        # Both buckets must admit the request; a request is only charged to the token
+        # bucket once the request bucket has admitted it.
+        if self.requests is not None:
+            wait = self.requests.try_consume(1)
+            if wait > 0:
+                return wait
+        if self.tokens is not None:
+            wait = self.tokens.try_consume(num_tokens)
+            if wait > 0:
+                if self.requests is not None:
+                    self.requests.adjust(-1)
+                return wait
+        return 0.0
+
+    def _record_wait(self, seconds: float):
+        with self._lock:
+            self.total_wait += seconds
+
+    def acquire(self, num_tokens: int = 0):
+        while (wait := self._try_acquire(num_tokens)) > 0:
+            check_deadline()
+            wait = cap_to_deadline(wait)
+            self._record_wait(wait)
+            time.sleep(wait)
+
+    async def aacquire(self, num_tokens: int = 0):
+        while (wait := self._try_acquire(num_tokens)) > 0:
+            check_deadline()
+            wait = cap_to_deadline(wait)
+            self._record_wait(wait)
+            await asyncio.sleep(wait)
+
+    def reconcile(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def summary(self) -> str:
+        return f"Rate limiter delayed requests for {self.total_wait:.1f}s in total"
@@ -0,0 +1,234 @@
+from typing import Callable, Dict, Optional
+
+from email.utils import parsedate_to_datetime
+
+from functools import wraps
+
+import asyncio
+
+import inspect
+
+import random
+
+import threading
+
+import time
+
+from nexusbench.deadlines import SampleTimeout
+from nexusbench.usage import count_retry
+from nexusbench.utils import cap_to_deadline
+
+
+# Messages of rate-limit/overload errors raised without a status code
+OVERLOAD_MESSAGES = ("rate limit", "rate_limit", "overloaded", "too many requests")
+
+# Kinds of request errors, see `classify_error`
+RATE_LIMITED = "rate_limited"
+OVERLOADED = "overloaded"
+SERVER_ERROR = "server_error"
+CONNECTION_ERROR = "connection_error"
+TIMEOUT = "timeout"
+FATAL = "fatal"
+
+# Client errors that are worth retrying; any other 4xx is fatal
+RETRYABLE_STATUS_CODES = {
+    408: TIMEOUT,
+    409: SERVER_ERROR,
+    429: RATE_LIMITED,
+    503: OVERLOADED,
+    529: OVERLOADED,
+}
+
+# Exceptions raised by bugs in the harness or the request, not by the endpoint
+FATAL_EXCEPTIONS = (
+    TypeError,
+    AttributeError,
+    NameError,
+    KeyError,
+    NotImplementedError,
+    AssertionError,
+)
+
+
+def get_status_code(e: Exception) -> Optional[int]:
+    for attr in ("status_code", "http_status", "code"):
+        value = getattr(e, attr, None)
+        if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
+            return int(value)
+    return None
+
+
+def classify_error(e: Exception) -> str:
+    """Kind of a request error raised by any of the provider SDKs."""
+    status_code = get_status_code(e)
+    if status_code is not None:
+        if status_code in RETRYABLE_STATUS_CODES:
+            return RETRYABLE_STATUS_CODES[status_code]
+        return SERVER_ERROR if status_code >= 500 else FATAL
+
+    # The SDKs wrap httpx errors in their own connection and timeout errors.
+    names = [cls.__name__.lower() for cls in type(e).__mro__]
+    if isinstance(e, TimeoutError) or any("timeout" in name for name in names):
+        return TIMEOUT
+    if isinstance(e, ConnectionError) or any("connect" in name for name in names):
+        return CONNECTION_ERROR
+    if any(message in str(e).lower() for message in OVERLOAD_MESSAGES):
+        return RATE_LIMITED
+    if isinstance(e, FATAL_EXCEPTIONS):
+        return FATAL
+    return SERVER_ERROR
+
+
+def get_retry_after(e: Exception) -> Optional[float]:
+    """Seconds the server asked to wait before retrying, from its response headers."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or getattr(e, "headers", None)
+    if not headers:
+        return None
+    try:
+        if (value := headers.get("retry-after-ms")) is not None:
+            return float(value) / 1000
+        if (value := headers.get("retry-after")) is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed request is retried, and how long to wait before.
+
+    Fatal errors (e.g. a 400 for a malformed tool schema) are raised at once. A
+    connection error is retried immediately the first time, as the broken connection
+    is dropped from the pool, and every other retry backs off exponentially from
+    `base_delay` up to `max_delay` with full jitter. A Retry-After hint of the server
+    is honored. A request is retried at most `max_retries` times, and all requests
+    sharing the policy (one per run) retry at most `budget_ratio` of their requests
+    plus `min_budget`, so that a failing endpoint is not hammered with retries.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        budget_ratio: float = 0.2,
+        min_budget: int = 10,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.min_budget = min_budget
+        self.requests = 0
+        self.retries: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+        self.budget_exhausted = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _take_retry(self, kind: str) -> bool:
+        with self._lock:
+            budget = self.min_budget + self.budget_ratio * self.requests
+            if sum(self.retries.values()) >= budget:
+                self.budget_exhausted += 1
+                return False
+            self.retries[kind] = self.retries.get(kind, 0) + 1
+            return True
+
+    def _record_failure(self, kind: str):
+        with self._lock:
+            self.failures[kind] = self.failures.get(kind, 0) + 1
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+    def next_delay(self, e: Exception, kind: str, retry: int) -> Optional[float]:
+        """Seconds to wait before retry number `retry` (from 0), or None to give up."""
+        if kind == FATAL or retry >= self.max_retries or not self._take_retry(kind):
+            self._record_failure(kind)
+            return None
+
+        if kind == CONNECTION_ERROR and retry == 0:
+            return 0.0
+        delay = self.backoff(retry)
+        retry_after = get_retry_after(e)
+        if retry_after is not None:
+            # Spread the retries of requests told to wait the same time.
+            delay = max(delay, retry_after * random.uniform(1.0, 1.1))
+        return delay
+
+    def summary(self) -> str:
+        def counts(by_kind):
+            return ", ".join(f"{k}: {v}" for k, v in sorted(by_kind.items())) or "none"
+
+        return (
+            f"Retries: {sum(self.retries.values())} for {self.requests} request(s) "
+            f"({counts(self.retries)}), failed requests: {counts(self.failures)}, "
+            f"retry budget exhausted {self.budget_exhausted} time(s)"
+        )
+
+
+def with_retries(func: Callable) -> Callable:
+    """
+    Retry a client's request method under the client's `retry_policy`, classifying
+    its errors with the client's `classify_error`.
+    """
+
+    def on_failure(client, e, retry) -> Optional[float]:
+        kind = client.classify_error(e)
+        delay = client.retry_policy.next_delay(e, kind, retry)
+        if delay is None:
+            print(f"Giving up after {retry + 1} attempt(s) ({kind}): {e}")
+        else:
+            count_retry()
+            print(
+                f"Attempt {retry + 1} failed ({kind}): {e}. "
+                f"Retrying in {delay:.1f} seconds..."
+            )
+        return delay
+
+    if inspect.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(client, *args, **kwargs):
+            client.retry_policy.record_request()
+            retry = 0
+            while True:
+                try:
+                    return await func(client, *args, **kwargs)
+                except SampleTimeout:
+                    raise
+                except Exception as e:
+                    delay = on_failure(client, e, retry)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(cap_to_deadline(delay))
+                    retry += 1
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(client, *args, **kwargs):
+        client.retry_policy.record_request()
+        retry = 0
+        while True:
+            try:
+                return func(client, *args, **kwargs)
+            except SampleTimeout:
+                raise
+            except Exception as e:
+                delay = on_failure(client, e, retry)
+                if delay is None:
+                    raise
+                time.sleep(cap_to_deadline(delay))
+                retry += 1
+
+    return wrapper
@@ -0,0 +1,266 @@
+from typing import Any, Callable, List, Optional, Set, Tuple, Type
+
+from dataclasses import dataclass, field
+
+from contextlib import contextmanager, nullcontext
+
+from itertools import chain, zip_longest
+
+import asyncio
+
+import time
+
+from tqdm import tqdm
+
+from nexusbench.cassettes import CassetteLibrary
+from nexusbench.deadlines import Watchdog, deadline_context, deadline_expired
+from nexusbench.pipeline import Pipeline, pipeline_context
+from nexusbench.usage import attach_usage, sample_usage
+from nexusbench.utils import parallel_map, report_exception
+
+
+@dataclass
+class BenchmarkJob:
+    """
+    All the (already prepared) samples of a single benchmark.
+
+    `inputs` are the per-sample tuples consumed by
+    `BaseBenchmark.process_single_sample`, and `results` is filled in the same
+    order as `inputs` once the scheduler has run. Samples listed in `completed`
+    already have their result (e.g. from a resumed run) and are not scheduled.
+    `target` is the model configuration the samples are run against. Once a job is
+    `stopped` (see `nexusbench.early_stopping`), its remaining samples are skipped.
+    `costs` are the expected costs of the samples (see
+    `BaseBenchmark.estimate_cost`); without them, samples run in dataset order.
+    `deadline` is the monotonic time by which the whole benchmark must finish.
+    """
+
+    benchmark_class: Type
+    benchmark: Any
+    inputs: List[Tuple]
+    results: List[Any] = field(default_factory=list)
+    sample_ids: List[str] = field(default_factory=list)
+    completed: Set[int] = field(default_factory=set)
+    target: Any = None
+    stopped: bool = False
+    costs: List[float] = field(default_factory=list)
+    deadline: Optional[float] = None
+
+    def __post_init__(self):
+        if not self.results:
+            self.results = [None] * len(self.inputs)
+
+    @property
+    def name(self) -> str:
+        return self.benchmark_class.__name__
+
+    def describe_sample(self, index: int) -> str:
+        label = getattr(self.target, "label", None)
+        return f"{self.name}[{index}]" + (f" ({label})" if label else "")
+
+    def finished_results(self) -> List[Any]:
+        """Results of the samples that ran, in input order."""
+        return [self.results[i] for i in sorted(self.completed)]
+
+
+# Returned for the samples of a job that was stopped before they started.
+SKIPPED = object()
+
+
+class SampleScheduler:
+    """
+    Runs the samples of many benchmarks out of a single work queue.
+
+    Every (benchmark, sample) pair is flattened into one queue that is drained by a
+    single thread pool, so `max_concurrency` bounds the number of samples in flight
+    across the whole run. Samples of different benchmarks are interleaved, so that
+    every benchmark makes progress from the start and the tail of the run is not
+    left to a single slow benchmark.
+
+    A sample gets `sample_timeout` seconds, and all samples of a benchmark must finish
+    within `benchmark_timeout` seconds of its first sample starting. A sample that
+    runs out of either budget is recorded as `BaseBenchmark.timeout_result`. With a
+    `watchdog_interval`, the longest running samples are reported periodically.
+    With a `pipeline`, the CPU-bound steps of samples run on its process pool, and
+    with `cassettes`, the model requests of every sample are recorded or replayed.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        debug: bool = False,
+        on_result: Optional[Callable[[BenchmarkJob, int, Any], None]] = None,
+        sample_timeout: Optional[float] = None,
+        benchmark_timeout: Optional[float] = None,
+        watchdog_interval: Optional[float] = None,
+        pipeline: Optional[Pipeline] = None,
+        cassettes: Optional[CassetteLibrary] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.debug = debug
+        self.on_result = on_result
+        self.sample_timeout = sample_timeout
+        self.benchmark_timeout = benchmark_timeout
+        self.watchdog = Watchdog(watchdog_interval) if watchdog_interval else None
+        self.pipeline = pipeline
+        self.cassettes = cassettes
+
+    def get_deadline(self, job: BenchmarkJob) -> Optional[float]:
+        """Deadline of a sample of `job` that starts now."""
+        now = time.monotonic()
+        if self.benchmark_timeout is not None and job.deadline is None:
+            job.deadline = now + self.benchmark_timeout
+
+        deadlines = [job.deadline]
+        if self.sample_timeout is not None:
+            deadlines.append(now + self.sample_timeout)
+        return min((d for d in deadlines if d is not None), default=None)
+
+    @contextmanager
+    def sample_context(self, job: BenchmarkJob, index: int):
+        """
+        Runs a sample under its deadline, pipeline and cassette, registered with the
+        watchdog, and yields the list its requests are recorded to.
+        """
+        deadline = self.get_deadline(job)
+        key = job.describe_sample(index)
+        cassette = nullcontext()
+        if self.cassettes is not None:
+            cassette = self.cassettes.sample(
+                job.target.config_key, job.name, job.sample_ids[index]
+            )
+        if self.watchdog is not None:
+            self.watchdog.start(key)
+        try:
+            with (
+                deadline_context(deadline),
+                pipeline_context(self.pipeline),
+                cassette,
+                sample_usage() as calls,
+            ):
+                yield calls
+        finally:
+            if self.watchdog is not None:
+                self.watchdog.finish(key)
+
+    def watching(self):
+        return self.watchdog if self.watchdog is not None else nullcontext()
+
+    def get_work_order(self, jobs: List[BenchmarkJob]) -> List[Tuple[int, int]]:
+        """
+        Round-robin (job index, sample index) pairs across all jobs.
+
+        If any job has sample costs, the most expensive samples are moved to the
+        front (ties keep their round-robin order), so that the longest trajectories
+        do not start last and dominate the tail of the run.
+        """
+        per_job = [
+            [(j, i) for i in range(len(job.inputs)) if i not in job.completed]
+            for j, job in enumerate(jobs)
+        ]
+        work = [item for item in chain.from_iterable(zip_longest(*per_job)) if item]
+        if any(job.costs for job in jobs):
+            work.sort(key=lambda item: -self.get_cost(jobs[item[0]], item[1]))
+        return work
+
+    @staticmethod
+    def get_cost(job: BenchmarkJob, index: int) -> float:
+        return job.costs[index] if job.costs else 1.0
+
+    def run(self, jobs: List[BenchmarkJob]) -> List[BenchmarkJob]:
+        work = self.get_work_order(jobs)
+        if not work:
+            return jobs
+
+        def run_one(item):
+            j, i = item
+            job = jobs[j]
+            if job.stopped:
+                return SKIPPED
+            with self.sample_context(job, i) as calls:
+                if deadline_expired():
+                    result = job.benchmark.timeout_result(job.inputs[i][0])
+                else:
+                    result = job.benchmark.process_single_sample(job.inputs[i])
+            return attach_usage(result, calls)
+
+        with self.watching():
+            for k, result in parallel_map(
+                run_one, work, self.max_concurrency, desc="Processing samples"
+            ):
+                if result is SKIPPED:
+                    continue
+                j, i = work[k]
+                if isinstance(result, Exception):
+                    result = self.handle_exception(result)
+                self.record(jobs[j], i, result)
+
+        return jobs
+
+    def record(self, job: BenchmarkJob, index: int, result: Any):
+        job.results[index] = result
+        job.completed.add(index)
+        if self.on_result is not None:
+            self.on_result(job, index, result)
+
+    def handle_exception(self, e: Exception) -> Exception:
+        report_exception(e, self.debug)
+        return e
+
+
+class AsyncSampleScheduler(SampleScheduler):
+    """
+    Same work queue as `SampleScheduler`, but every sample runs as a coroutine on a
+    single event loop through `BaseBenchmark.aprocess_single_sample`.
+
+    Agent trajectories spend nearly all of their time waiting on the model, so this
+    allows thousands of samples in flight without one OS thread per sample.
+    """
+
+    def run(self, jobs: List[BenchmarkJob]) -> List[BenchmarkJob]:
+        work = self.get_work_order(jobs)
+        if work:
+            with self.watching():
+                asyncio.run(self._run(jobs, work))
+        return jobs
+
+    async def _run(self, jobs: List[BenchmarkJob], work: List[Tuple[int, int]]):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        with tqdm(total=len(work), desc="Processing samples") as pbar:
+
+            async def run_one(j, i):
+                async with semaphore:
+                    job = jobs[j]
+                    if job.stopped:
+                        pbar.update(1)
+                        return
+                    try:
+                        with self.sample_context(job, i) as calls:
+                            if deadline_expired():
+                                result = job.benchmark.timeout_result(job.inputs[i][0])
+                            else:
+                                result = await job.benchmark.aprocess_single_sample(
+                                    job.inputs[i]
+                                )
+                        result = attach_usage(result, calls)
+                    except Exception as e:
+                        result = self.handle_exception(e)
+                    self.record(job, i, result)
+                    pbar.update(1)
+
+            await asyncio.gather(*(run_one(j, i) for j, i in work))
+
+        # Async clients are bound to this event loop, so they are closed before it ends.
+        prompters = {
+            id(p): p for p in (getattr(job.target, "prompter", None) for job in jobs)
+        }
+        for prompter in prompters.values():
+            if hasattr(prompter, "aclose"):
+                await prompter.aclose()
+
+
+SCHEDULERS = {
+    "threads": SampleScheduler,
+    "asyncio": AsyncSampleScheduler,
+}
@@ -0,0 +1,382 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from inspect import signature
+
+import json
+
+import os
+
+import queue
+
+import threading
+
+import time
+
+from nexusbench.entrypoint import (
+    BenchmarkRunner,
+    SharedClients,
+    default_max_concurrency,
+    select_benchmarks,
+)
+from nexusbench.journal import serialize_result
+
+
+# Options of a run that a job cannot set, as they belong to the daemon.
+DAEMON_OPTIONS = {
+    "client",
+    "model",
+    "base_url",
+    "api_key",
+    "dataset_cache",
+    "shared_clients",
+    "on_result",
+}
+
+# Options of the prompters, clients and controllers that every job shares, which are
+# set once when starting the daemon.
+CLIENT_OPTIONS = {
+    "adaptive_concurrency",
+    "min_concurrency",
+    "requests_per_minute",
+    "tokens_per_minute",
+    "hedge",
+    "hedge_quantile",
+    "request_timeout",
+    "max_retries",
+    "retry_budget",
+    "max_connections",
+    "prompt_caching",
+    "stream",
+    "cache",
+    "cache_path",
+    "cache_max_mb",
+}
+
+# Options of a job naming files, which must lie within the daemon's jobs dir.
+PATH_OPTIONS = {"run_dir", "record", "replay", "cost_history"}
+
+
+class DatasetCache:
+    """
+    Benchmarks, their samples and their tool descriptions, loaded once per process.
+
+    Shared by every job of a daemon, so that only the first job of a benchmark pays
+    for downloading and parsing its dataset.
+    """
+
+    def __init__(self):
+        self.benchmarks: Dict[Type, Tuple[Any, List]] = {}
+        self.tool_descriptions: Dict[Tuple[Type, Type], Any] = {}
+        self._locks: Dict[Any, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def load(self, benchmark_class: Type) -> Tuple[Any, List]:
+        """The benchmark instance and all of its samples."""
+        with self._key_lock(benchmark_class):
+            if benchmark_class not in self.benchmarks:
+                benchmark = benchmark_class()
+                self.benchmarks[benchmark_class] = (benchmark, benchmark.get_samples())
+            return self.benchmarks[benchmark_class]
+
+    def get_tool_descriptions(self, benchmark, prompter):
+        key = (type(benchmark), type(prompter))
+        with self._key_lock(key):
+            if key not in self.tool_descriptions:
+                self.tool_descriptions[key] = prompter.construct_tool_descriptions(
+                    benchmark, benchmark.tools
+                )
+            return self.tool_descriptions[key]
+
+
+def warm_imports():
+    """Import the provider SDKs and tool modules up front, instead of in every job."""
+    # pylint: disable=import-outside-toplevel,unused-import
+    import nexusbench.clients
+
+    try:
+        import mistralai.client
+    except ImportError:
+        pass
+
+
+def resolve_job_path(path: str, jobs_dir: Optional[str]) -> str:
+    """Resolve a path given by a job within `jobs_dir`, rejecting any outside of it."""
+    if jobs_dir is None:
+        raise ValueError(
+            "The daemon was started without --jobs_dir, so jobs cannot name files"
+        )
+    root = os.path.realpath(jobs_dir)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"{path} is outside of the jobs dir")
+    return resolved
+
+
+def job_events(
+    job: Dict[str, Any],
+    dataset_cache: DatasetCache,
+    api_key: Optional[str] = None,
+    shared_clients: Optional[SharedClients] = None,
+    run_options: Optional[Dict[str, Any]] = None,
+    jobs_dir: Optional[str] = None,
+) -> Callable[[Callable[[Dict[str, Any]], None]], None]:
+    """
+    Validate a job request and return a function running it, which calls `emit` with
+    every event as the job progresses.
+    """
+    job = dict(job)
+    client = job.pop("client", None)
+    if not client:
+        raise ValueError("A job needs a client")
+    model = job.pop("model", None)
+    base_url = job.pop("base_url", None)
+    api_key = job.pop("api_key", api_key)
+    suite = job.pop("suite", "per_task")
+    benchmark_names = job.pop("benchmarks", None)
+    limit = job.pop("limit", None)
+
+    options = set(signature(BenchmarkRunner).parameters) - DAEMON_OPTIONS
+    unknown = set(job) - options
+    if unknown:
+        raise ValueError(f"Unknown job option(s): {', '.join(sorted(unknown))}")
+    daemon_level = set(job) & CLIENT_OPTIONS
+    if daemon_level:
+        raise ValueError(
+            f"Option(s) {', '.join(sorted(daemon_level))} are set when starting the daemon"
+        )
+    # Jobs run up to the daemon's cap on samples in flight, or fewer if they ask to.
+    if shared_clients is not None:
+        cap = shared_clients.max_concurrency
+        job["max_concurrency"] = min(job.get("max_concurrency") or cap, cap)
+    for name in PATH_OPTIONS & set(job):
+        if isinstance(job[name], list):
+            job[name] = [resolve_job_path(path, jobs_dir) for path in job[name]]
+        elif job[name] is not None:
+            job[name] = resolve_job_path(job[name], jobs_dir)
+
+    benchmarks = select_benchmarks(suite, benchmark_names)
+    if not benchmarks:
+        raise ValueError("No benchmarks selected to run")
+
+    def run(emit):
+        started = time.monotonic()
+
+        def on_result(benchmark_job, index, result):
+            event = {
+                "event": "result",
+                "model": benchmark_job.target.label,
+                "benchmark": benchmark_job.name,
+                "index": index,
+                "sample_id": benchmark_job.sample_ids[index],
+            }
+            if isinstance(result, Exception):
+                event["error"] = repr(result)
+            else:
+                event["result"] = serialize_result(result)
+            emit(event)
+
+        runner = BenchmarkRunner(
+            client,
+            api_key,
+            model,
+            base_url,
+            dataset_cache=dataset_cache,
+            shared_clients=shared_clients,
+            on_result=on_result,
+            **(run_options or {}),
+            **job,
+        )
+        emit(
+            {
+                "event": "started",
+                "models": [target.label for target in runner.targets],
+                "benchmarks": [b.__name__ for b in benchmarks],
+                "max_concurrency": runner.max_concurrency,
+            }
+        )
+        for target, accuracies in runner.run_sweep(benchmarks, limit):
+            for benchmark_class, metrics, _ in accuracies:
+                emit(
+                    {
+                        "event": "metrics",
+                        "model": target.label,
+                        "benchmark": benchmark_class.__name__,
+                        "metrics": metrics,
+                    }
+                )
+        emit({"event": "done", "elapsed": time.monotonic() - started})
+
+    return run
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    `POST /jobs` runs a job and streams its events back as JSON lines; `GET /health`
+    and `GET /benchmarks` describe the daemon.
+    """
+
+    dataset_cache: DatasetCache
+    api_key: Optional[str] = None
+    shared_clients: Optional[SharedClients] = None
+    run_options: Optional[Dict[str, Any]] = None
+    jobs_dir: Optional[str] = None
+
+    def send_json(self, status: int, body: Dict[str, Any]):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/benchmarks":
+            self.send_json(
+                200,
+                {"cached": sorted(b.__name__ for b in self.dataset_cache.benchmarks)},
+            )
+        else:
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self.send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length) or b"{}")
+            run = job_events(
+                job,
+                self.dataset_cache,
+                self.api_key,
+                self.shared_clients,
+                self.run_options,
+                self.jobs_dir,
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        # The job runs on its own thread, and its events are written out as they
+        # come, so a client sees every sample as soon as it finishes.
+        events = queue.Queue()
+
+        def run_job():
+            try:
+                run(events.put)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                events.put({"event": "error", "error": repr(e)})
+            finally:
+                events.put(None)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        threading.Thread(target=run_job, daemon=True).start()
+        while (event := events.get()) is not None:
+            try:
+                self.wfile.write((json.dumps(event, default=str) + "\n").encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The job cannot be interrupted and finishes in the background.
+                return
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        print(f"[serve] {format % args}")
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        return request, ("unix", 0)
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 8321,
+    socket_path: Optional[str] = None,
+    api_key: Optional[str] = None,
+    dataset_cache: Optional[DatasetCache] = None,
+    shared_clients: Optional[SharedClients] = None,
+    run_options: Optional[Dict[str, Any]] = None,
+    jobs_dir: Optional[str] = None,
+):
+    if dataset_cache is None:
+        dataset_cache = DatasetCache()
+    if shared_clients is None:
+        shared_clients = SharedClients()
+    handler = type(
+        "BoundJobRequestHandler",
+        (JobRequestHandler,),
+        {
+            "dataset_cache": dataset_cache,
+            "api_key": api_key,
+            "shared_clients": shared_clients,
+            "run_options": run_options,
+            "jobs_dir": jobs_dir,
+        },
+    )
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8321,
+    socket_path: Optional[str] = None,
+    api_key: Optional[str] = None,
+    preload: Optional[List[Type]] = None,
+    run_options: Optional[Dict[str, Any]] = None,
+    max_concurrency: Optional[int] = None,
+    jobs_dir: Optional[str] = None,
+):
+    """Run the job daemon until interrupted."""
+    warm_imports()
+    dataset_cache = DatasetCache()
+    for benchmark_class in preload or []:
+        print(f"Preloading {benchmark_class.__name__}")
+        try:
+            dataset_cache.load(benchmark_class)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Error preloading {benchmark_class.__name__}: {e}")
+
+    # Prompters and their connection pools stay warm across jobs, and jobs running at
+    # the same time share one concurrency controller and rate limiter per endpoint.
+    shared_clients = SharedClients(max_concurrency or default_max_concurrency())
+    server = create_server(
+        host,
+        port,
+        socket_path,
+        api_key,
+        dataset_cache,
+        shared_clients,
+        run_options,
+        jobs_dir,
+    )
+    address = socket_path or f"http://{host}:{server.server_address[1]}"
+    print(f"Serving benchmark jobs on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,40 @@
+from typing import Any, Dict, List, Tuple
+
+import hashlib
+
+from nexusbench.journal import ResultJournal
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse `i/N` into `(i, N)`, with shards numbered from 0."""
+    try:
+        index, num_shards = (int(part) for part in shard.split("/"))
+    except ValueError as e:
+        raise ValueError(f"Shard must look like i/N, got {shard!r}") from e
+
+    if num_shards < 1 or not 0 <= index < num_shards:
+        raise ValueError(f"Shard index must be in [0, {num_shards}), got {index}")
+    return index, num_shards
+
+
+def shard_of(benchmark_name: str, sid: str, num_shards: int) -> int:
+    """Deterministically assign a sample to a shard by hashing (benchmark, sample id)."""
+    digest = hashlib.sha1(f"{benchmark_name}:{sid}".encode()).hexdigest()
+    return int(digest, 16) % num_shards
+
+
+def merge_journals(run_dirs: List[str]) -> Dict[str, Dict[str, List[Any]]]:
+    """
+    Combine the journals of several (shard) run directories.
+
+    Returns the results grouped by run configuration key and then by benchmark name.
+    A sample journaled by more than one run directory is only counted once.
+    """
+    entries = {}
+    for run_dir in run_dirs:
+        entries.update(ResultJournal.load(run_dir))
+
+    merged: Dict[str, Dict[str, List[Any]]] = {}
+    for (config_key, benchmark, _), result in sorted(entries.items()):
+        merged.setdefault(config_key, {}).setdefault(benchmark, []).append(result)
+    return merged
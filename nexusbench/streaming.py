@@ -0,0 +1,273 @@
+from typing import Any, Dict, List, Optional
+
+import json
+
+import threading
+
+import time
+
+from nexusbench.utils import percentile
+
+
+def parse_arguments(arguments: str) -> Optional[Dict[str, Any]]:
+    """The arguments of a streamed tool call once they form a complete JSON object."""
+    try:
+        parsed = json.loads(arguments or "")
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+class StreamTimer:
+    """
+    Time to the first chunk of output of a streamed response, and the mean latency
+    between the following ones. Providers stream output about a token per chunk.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+        self.chunks = 0
+
+    def tick(self):
+        now = time.monotonic()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.chunks += 1
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first is None else self.first - self.started
+
+    @property
+    def inter_token_latency(self) -> Optional[float]:
+        if self.chunks < 2:
+            return None
+        return (self.last - self.first) / (self.chunks - 1)
+
+
+class OpenAIStreamAccumulator:
+    """
+    Builds a `ChatCompletion` out of the chunks of a streamed chat completion, and
+    tells once its first tool call is complete.
+
+    Usage is only streamed after the last chunk, so a stream that is cut off reports
+    `estimated_input_tokens` and a token per chunk instead.
+    """
+
+    def __init__(self, estimated_input_tokens: int = 0):
+        self.estimated_input_tokens = estimated_input_tokens
+        self.timer = StreamTimer()
+        self.cut_off = False
+        self.completion: Dict[str, Any] = {"choices": []}
+        self.content: List[str] = []
+        self.tool_calls: Dict[int, Dict[str, Any]] = {}
+        self.finish_reason: Optional[str] = None
+
+    def add(self, chunk) -> bool:
+        """Add a chunk, and return whether the first tool call is complete."""
+        self.completion.update(
+            id=chunk.id, created=chunk.created, model=chunk.model, usage=chunk.usage
+        )
+        for choice in chunk.choices:
+            if choice.index != 0:
+                continue
+            delta = choice.delta
+            if delta.content or delta.tool_calls:
+                self.timer.tick()
+            if delta.content:
+                self.content.append(delta.content)
+            for tool_call in delta.tool_calls or []:
+                call = self.tool_calls.setdefault(
+                    tool_call.index,
+                    {"id": None, "type": "function", "name": "", "arguments": ""},
+                )
+                call["id"] = tool_call.id or call["id"]
+                if tool_call.function is not None:
+                    call["name"] += tool_call.function.name or ""
+                    call["arguments"] += tool_call.function.arguments or ""
+            self.finish_reason = choice.finish_reason or self.finish_reason
+
+        first = self.tool_calls.get(min(self.tool_calls, default=0))
+        return (
+            self.finish_reason is None
+            and first is not None
+            and bool(first["name"])
+            and parse_arguments(first["arguments"]) is not None
+        )
+
+    def result(self):
+        import openai
+
+        tool_calls = [
+            {
+                "id": call["id"] or f"call_{index}",
+                "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]},
+            }
+            for index, call in sorted(self.tool_calls.items())
+        ]
+        finish_reason = self.finish_reason
+        usage = self.completion.get("usage")
+        if self.cut_off:
+            finish_reason = "tool_calls"
+            if usage is None:
+                usage = {
+                    "prompt_tokens": self.estimated_input_tokens,
+                    "completion_tokens": self.timer.chunks,
+                    "total_tokens": self.estimated_input_tokens + self.timer.chunks,
+                }
+        message = {
+            "role": "assistant",
+            "content": "".join(self.content) or None,
+            "tool_calls": tool_calls or None,
+        }
+        return openai.types.chat.ChatCompletion.model_validate(
+            {
+                "object": "chat.completion",
+                **self.completion,
+                "usage": usage,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": finish_reason or "stop",
+                    }
+                ],
+            }
+        )
+
+
+class AnthropicStreamAccumulator:
+    """
+    Builds a `Message` out of the events of a streamed message, and tells once its
+    first tool use block is complete.
+    """
+
+    def __init__(self):
+        self.timer = StreamTimer()
+        self.cut_off = False
+        self.message: Dict[str, Any] = {}
+        self.blocks: Dict[int, Dict[str, Any]] = {}
+
+    def add(self, event) -> bool:
+        """Add an event, and return whether the first tool use is complete."""
+        if event.type == "message_start":
+            self.message = event.message.model_dump()
+        elif event.type == "content_block_start":
+            block = event.content_block.model_dump()
+            if block["type"] == "tool_use":
+                block["partial_json"] = ""
+            self.blocks[event.index] = block
+        elif event.type == "content_block_delta":
+            self.timer.tick()
+            block = self.blocks[event.index]
+            if event.delta.type == "text_delta":
+                block["text"] += event.delta.text
+            elif event.delta.type == "input_json_delta":
+                block["partial_json"] += event.delta.partial_json
+        elif event.type == "content_block_stop":
+            return self.blocks[event.index]["type"] == "tool_use"
+        elif event.type == "message_delta":
+            self.message.update(event.delta.model_dump(exclude_none=True))
+            self.message.setdefault("usage", {}).update(
+                event.usage.model_dump(exclude_none=True)
+            )
+        return False
+
+    def result(self):
+        import anthropic
+
+        content = []
+        for _, block in sorted(self.blocks.items()):
+            block = dict(block)
+            if block["type"] == "tool_use":
+                block["input"] = parse_arguments(block.pop("partial_json")) or {}
+            content.append(block)
+        message = {**self.message, "content": content}
+        if self.cut_off:
+            message["stop_reason"] = "tool_use"
+            # The final output token count is only sent after the last block.
+            usage = message.get("usage") or {}
+            message["usage"] = {
+                **usage,
+                "output_tokens": max(
+                    usage.get("output_tokens") or 0, self.timer.chunks
+                ),
+            }
+        return anthropic.types.Message.model_validate(message)
+
+
+class QwenStreamAccumulator:
+    """
+    Keeps the latest of the cumulative responses streamed by qwen-agent, and tells
+    once its function call is complete.
+    """
+
+    def __init__(self):
+        self.timer = StreamTimer()
+        self.cut_off = False
+        self.responses: List[Any] = []
+
+    def add(self, responses) -> bool:
+        """Add the responses so far, and return whether the function call is complete."""
+        self.timer.tick()
+        self.responses = responses
+        if not responses or "function_call" not in responses[0]:
+            return False
+        function_call = responses[0]["function_call"]
+        return (
+            function_call is not None
+            and bool(function_call["name"])
+            and parse_arguments(function_call["arguments"]) is not None
+        )
+
+    def result(self):
+        return self.responses[0]
+
+
+class StreamStats:
+    """
+    Time to first token and inter-token latency of the streamed responses of a
+    prompter's clients per benchmark, and how many of them were cut off once their
+    first tool call was complete.
+    """
+
+    def __init__(self):
+        self.time_to_first_token: Dict[Optional[str], List[float]] = {}
+        self.inter_token_latency: Dict[Optional[str], List[float]] = {}
+        self.responses: Dict[Optional[str], int] = {}
+        self.cut_off: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, benchmark: Optional[str], timer: StreamTimer, cut_off: bool):
+        with self._lock:
+            self.responses[benchmark] = self.responses.get(benchmark, 0) + 1
+            self.cut_off[benchmark] = self.cut_off.get(benchmark, 0) + cut_off
+            if timer.time_to_first_token is not None:
+                self.time_to_first_token.setdefault(benchmark, []).append(
+                    timer.time_to_first_token
+                )
+            if timer.inter_token_latency is not None:
+                self.inter_token_latency.setdefault(benchmark, []).append(
+                    timer.inter_token_latency
+                )
+
+    def summary(self, name: str) -> str:
+        lines = [f"Streaming of {name}:"]
+        for benchmark in sorted(self.responses, key=str):
+            ttft = self.time_to_first_token.get(benchmark, [])
+            itl = self.inter_token_latency.get(benchmark, [])
+            mean_itl = sum(itl) / len(itl) if itl else 0.0
+            lines.append(
+                f"  {benchmark or 'other'}: {self.responses[benchmark]} response(s), "
+                f"time to first token p50 {percentile(ttft, 0.5):.2f}s "
+                f"p95 {percentile(ttft, 0.95):.2f}s, inter-token latency "
+                f"{mean_itl * 1000:.1f}ms, {self.cut_off[benchmark]} cut off after "
+                "the first tool call"
+            )
+        if len(lines) == 1:
+            lines.append("  no responses")
+        return "\n".join(lines)
@@ -0,0 +1,167 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from contextlib import contextmanager
+
+from contextvars import ContextVar
+
+from dataclasses import asdict, dataclass, fields
+
+import time
+
+from nexusbench.utils import percentile
+
+
+@dataclass
+class TokenUsage:
+    """Tokens of a response, with its input split by how the prompt cache served it."""
+
+    # Input tokens that were neither read from nor written to the cache
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def total_input_tokens(self) -> int:
+        return self.input_tokens + self.cache_read_tokens + self.cache_write_tokens
+
+
+@dataclass
+class CallUsage(TokenUsage):
+    """Tokens, wall latency (retries included) and retries of one model request."""
+
+    latency: float = 0.0
+    retries: int = 0
+    # Answered by the completion cache or a cassette, so neither paid for nor timed
+    from_cache: bool = False
+    # Still failing once out of retries
+    failed: bool = False
+    # Hedged copies of the request (see `nexusbench.hedging`), whose tokens are included
+    duplicates: int = 0
+
+    def add_tokens(self, usage: Optional[TokenUsage]):
+        if usage is not None:
+            self.input_tokens += usage.input_tokens
+            self.output_tokens += usage.output_tokens
+            self.cache_read_tokens += usage.cache_read_tokens
+            self.cache_write_tokens += usage.cache_write_tokens
+
+    def cost(
+        self,
+        prices: Tuple[float, float],
+        cache_read_price: float = 1.0,
+        cache_write_price: float = 1.0,
+    ) -> float:
+        """USD cost at `prices` per million (input, output) tokens."""
+        input_price, output_price = prices
+        input_tokens = (
+            self.input_tokens
+            + self.cache_read_tokens * cache_read_price
+            + self.cache_write_tokens * cache_write_price
+        )
+        return (input_tokens * input_price + self.output_tokens * output_price) / 1e6
+
+
+CALL_FIELDS = {f.name for f in fields(CallUsage)}
+
+# Requests of the sample being processed, set by the schedulers
+current_calls: ContextVar[Optional[List[CallUsage]]] = ContextVar(
+    "current_calls", default=None
+)
+# Request in flight, whose retries `nexusbench.retries.with_retries` counts
+current_call: ContextVar[Optional[CallUsage]] = ContextVar("current_call", default=None)
+
+
+@contextmanager
+def sample_usage():
+    """Collects the requests of the sample run inside this context."""
+    calls: List[CallUsage] = []
+    token = current_calls.set(calls)
+    try:
+        yield calls
+    finally:
+        current_calls.reset(token)
+
+
+@contextmanager
+def track_call(from_cache: bool = False):
+    """Times a request of the current sample, and records it once it is done."""
+    call = CallUsage(from_cache=from_cache)
+    token = current_call.set(call)
+    started = time.monotonic()
+    try:
+        yield call
+    except BaseException:
+        call.failed = True
+        raise
+    finally:
+        current_call.reset(token)
+        call.latency = 0.0 if from_cache else time.monotonic() - started
+        calls = current_calls.get()
+        if calls is not None:
+            calls.append(call)
+
+
+def count_retry():
+    call = current_call.get()
+    if call is not None:
+        call.retries += 1
+
+
+def count_duplicate(usage: Optional[TokenUsage]):
+    """Bill the losing copy of a hedged request to the request in flight."""
+    call = current_call.get()
+    if call is not None:
+        call.duplicates += 1
+        call.add_tokens(usage)
+
+
+def attach_usage(result: Any, calls: List[CallUsage]) -> Any:
+    """Store the requests of a sample in its result, where it is journaled with it."""
+    if isinstance(result, dict) and calls:
+        result["Usage"] = [asdict(call) for call in calls]
+    return result
+
+
+def usage_metrics(
+    results: List[Any],
+    prices: Optional[Tuple[float, float]] = None,
+    cache_read_price: float = 1.0,
+    cache_write_price: float = 1.0,
+) -> Dict[str, float]:
+    """
+    Total tokens and tokens per sample, latency percentiles per request, retries per
+    request and the total cost (if `prices` are known) of the samples whose requests
+    were recorded.
+    """
+    samples = [r["Usage"] for r in results if isinstance(r, dict) and "Usage" in r]
+    if not samples:
+        return {}
+    calls = [
+        CallUsage(**{k: v for k, v in call.items() if k in CALL_FIELDS})
+        for sample in samples
+        for call in sample
+    ]
+    input_tokens = sum(c.total_input_tokens for c in calls)
+    output_tokens = sum(c.output_tokens for c in calls)
+    metrics = {
+        "Input Tokens": float(input_tokens),
+        "Output Tokens": float(output_tokens),
+        "Input Tokens / Sample": input_tokens / len(samples),
+        "Output Tokens / Sample": output_tokens / len(samples),
+    }
+    if input_tokens and any(c.cache_read_tokens for c in calls):
+        metrics["Cached Input"] = sum(c.cache_read_tokens for c in calls) / input_tokens
+
+    # Requests answered locally cost nothing and say nothing about the endpoint.
+    sent = [c for c in calls if not c.from_cache]
+    if sent:
+        latencies = [c.latency for c in sent]
+        metrics["Latency p50 (s)"] = percentile(latencies, 0.5)
+        metrics["Latency p95 (s)"] = percentile(latencies, 0.95)
+        metrics["Retries / Request"] = sum(c.retries for c in sent) / len(sent)
+    if prices is not None:
+        metrics["Cost ($)"] = sum(
+            c.cost(prices, cache_read_price, cache_write_price) for c in sent
+        )
+    return metrics
@@ -1,16 +1,10 @@
-from typing import Callable, List, Dict
-
-from os import getenv
+from typing import Any, Callable, Iterable, Iterator, List, Dict, Optional, Tuple
 
 import statistics
 
-import time
-
 import json
 
-from traceback import print_exc
-
-from functools import wraps
+from traceback import print_exception
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -18,67 +12,110 @@ from tabulate import tabulate
 
 from tqdm import tqdm
 
-
-EXECUTION_RETRY_NUM = 3
-EXECUTION_RETRY_DELAY = 1
-
-
-def handle_exceptions(func: Callable) -> Callable:
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        retry_delay = EXECUTION_RETRY_DELAY
-        for attempt in range(EXECUTION_RETRY_NUM):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt < EXECUTION_RETRY_NUM - 1:
-                    print(
-                        f"Attempt {attempt + 1} failed: {str(e)}. Retrying in {retry_delay} seconds..."
-                    )
-                    time.sleep(retry_delay)
-                    if attempt == EXECUTION_RETRY_NUM - 2:
-                        retry_delay = (
-                            60  # avoid spurious failures due to Anthropic rate limits
-                        )
-                else:
-                    print(f"Max retries reached. Last error: {str(e)}")
-                    raise ValueError("Max Retries Reached")
-
-    return wrapper
-
-
-def parallelize():
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            max_workers = json.loads(getenv("NUM_SAMPLES_PARALLEL"))
-            debug = json.loads(getenv("DEBUG"))
-
-            futures = []
-            total = len(args[1])
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                for arg in args[1]:
-                    future = executor.submit(func, arg)
-                    futures.append(future)
-
-                results = []
-                with tqdm(total=total, desc=f"Processing {func.__name__}") as pbar:
-                    for future, arg in zip(as_completed(futures), args[1]):
-                        try:
-                            results.append(future.result())
-                        except Exception as e:
-                            if debug:
-                                print_exc()
-                            else:
-                                print(e)
-                            results.append(e)
-                        finally:
-                            pbar.update(1)
-            return results
-
-        return wrapper
-
-    return decorator
+from nexusbench.deadlines import remaining_time
+
+
+# Rough characters-per-token ratio of English text and JSON for BPE tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(payload) -> int:
+    """Approximate number of tokens in a prompt or any JSON-like payload."""
+    if payload is None:
+        return 0
+    if not isinstance(payload, str):
+        payload = json.dumps(payload, default=str)
+    return len(payload) // CHARS_PER_TOKEN + 1
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def cap_to_deadline(delay: float) -> float:
+    """Do not sleep past the current sample's deadline; the next attempt then times out."""
+    remaining = remaining_time()
+    return delay if remaining is None else max(0.0, min(delay, remaining))
+
+
+def report_exception(e: Exception, debug: bool = False):
+    if debug:
+        print_exception(e)
+    else:
+        print(e)
+
+
+def parallel_map(
+    func: Callable,
+    items: Iterable,
+    max_workers: Optional[int] = None,
+    on_result: Optional[Callable[[int, Any], None]] = None,
+    desc: Optional[str] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Streaming, index-preserving parallel map over a thread pool.
+
+    Yields `(index, result)` pairs in completion order as soon as each item finishes,
+    where `index` is the position of the item in `items`. An exception raised by
+    `func` is yielded as the result of its item instead of being raised. `on_result`,
+    if given, is called with the same pair before it is yielded.
+
+    Closing the generator early (e.g. breaking out of the loop) cancels the items
+    that have not started yet.
+    """
+    items = list(items)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(func, item): idx for idx, item in enumerate(items)}
+        with tqdm(total=len(items), desc=desc, disable=desc is None) as pbar:
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                if on_result is not None:
+                    on_result(idx, result)
+                pbar.update(1)
+                yield idx, result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Formats of the metrics that are not fractions, see `nexusbench.usage.usage_metrics`
+METRIC_FORMATS = {
+    "Input Tokens": "{:,.0f}",
+    "Output Tokens": "{:,.0f}",
+    "Input Tokens / Sample": "{:,.0f}",
+    "Output Tokens / Sample": "{:,.0f}",
+    "Latency p50 (s)": "{:.2f}",
+    "Latency p95 (s)": "{:.2f}",
+    "Retries / Request": "{:.2f}",
+    "Cost ($)": "${:,.4f}",
+    "Accuracy / $": "{:,.2f}",
+}
+
+
+# Metrics that add up across benchmarks, while the others (accuracy, ratios, latency)
+# are averaged
+SUMMED_METRICS = {"Input Tokens", "Output Tokens", "Cost ($)"}
+
+
+def format_metric(metric: str, value) -> str:
+    if not isinstance(value, float):
+        return value
+    return METRIC_FORMATS.get(metric, "{:.2%}").format(value)
+
+
+def summarize_metric(metric: str, values: List[float]) -> float:
+    """A metric across benchmarks: the total of a count or cost, else the mean."""
+    if metric in SUMMED_METRICS:
+        return float(sum(values))
+    return float(statistics.mean(values))
 
 
 def print_benchmark_results(accuracies: List[tuple[str, Dict[str, float]]]):
@@ -97,17 +134,15 @@ def print_benchmark_results(accuracies: List[tuple[str, Dict[str, float]]]):
     for name, metrics, _ in accuracies:
         row = [name.__name__]
         for metric in sorted_metrics:
-            value = metrics.get(metric, "N/A")
-            row.append(f"{value:.2%}" if isinstance(value, float) else value)
+            row.append(format_metric(metric, metrics.get(metric, "N/A")))
         table_data.append(row)
 
-    # Calculate and add average row
-    avg_row = ["Average"]
+    # Calculate and add the row of totals and averages
+    avg_row = ["Total / Average"]
     for metric in sorted_metrics:
         values = [metrics[metric] for _, metrics, _ in accuracies if metric in metrics]
         if values:
-            avg_value = statistics.mean(values)
-            avg_row.append(f"{avg_value:.2%}")
+            avg_row.append(format_metric(metric, summarize_metric(metric, values)))
         else:
             avg_row.append("N/A")
     table_data.append(avg_row)
@@ -115,3 +150,41 @@ def print_benchmark_results(accuracies: List[tuple[str, Dict[str, float]]]):
     # Print the results in a pretty table
     print("\nBenchmark Results:")
     print(tabulate(table_data, headers=headers, tablefmt="grid"))
+
+
+def print_sweep_results(results_per_model: Dict[str, List[tuple]]):
+    """Side-by-side table with one row per (benchmark, metric) and one column per model."""
+    labels = list(results_per_model)
+    rows: Dict[tuple, Dict[str, float]] = {}
+    for label, accuracies in results_per_model.items():
+        for benchmark_class, metrics, _ in accuracies:
+            for metric, value in metrics.items():
+                rows.setdefault((benchmark_class.__name__, metric), {})[label] = value
+
+    table_data = []
+    for (name, metric), values in rows.items():
+        table_data.append(
+            [name, metric]
+            + [format_metric(metric, values.get(label, "N/A")) for label in labels]
+        )
+
+    # Calculate and add one row of the total or average per metric
+    for metric in sorted({metric for _, metric in rows}):
+        avg_row = ["Total" if metric in SUMMED_METRICS else "Average", metric]
+        for label in labels:
+            values = [
+                v[label]
+                for (_, m), v in rows.items()
+                if m == metric and isinstance(v.get(label), float)
+            ]
+            avg_row.append(
+                format_metric(metric, summarize_metric(metric, values))
+                if values
+                else "N/A"
+            )
+        table_data.append(avg_row)
+
+    print("\nSweep Results:")
+    print(
+        tabulate(table_data, headers=["Benchmark", "Metric"] + labels, tablefmt="grid")
+    )
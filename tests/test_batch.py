@@ -0,0 +1,103 @@
+import json
+
+from nexusbench.batch import export_batch, ingest_batch
+from nexusbench.benchmarks import ClimateBenchmark, Sample, TicketTracking
+from nexusbench.clients import AnthropicFCClient, BatchRequestError
+from nexusbench.entrypoint import BenchmarkRunner
+
+
+class Tickets(TicketTracking):
+    def get_samples(self):
+        return [
+            Sample(f"ticket {i}", "search_tickets(statuses=['PENDING'])")
+            for i in range(3)
+        ]
+
+
+class Climate(ClimateBenchmark):
+    def get_samples(self):
+        return [Sample("where am I", ["get_current_location()"])]
+
+
+def openai_result(custom_id, arguments):
+    message = {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {
+                "id": "call_0",
+                "type": "function",
+                "function": {"name": "search_tickets", "arguments": arguments},
+            }
+        ],
+    }
+    body = {
+        "id": "chatcmpl-0",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls"}],
+    }
+    return {
+        "id": "batch_req_0",
+        "custom_id": custom_id,
+        "response": {"status_code": 200, "body": body},
+        "error": None,
+    }
+
+
+def test_export_and_ingest_score_like_a_run(tmp_path, monkeypatch):
+    # Batch files are built and parsed without a provider SDK client or an API key.
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    runner = BenchmarkRunner("OpenAI", None, "gpt-4o", None, 4)
+    requests_path = tmp_path / "requests.jsonl"
+    assert export_batch(runner, [Tickets, Climate], str(requests_path)) == 3
+
+    requests = [json.loads(line) for line in requests_path.read_text().splitlines()]
+    assert all(r["url"] == "/v1/chat/completions" for r in requests)
+    assert all(r["body"]["model"] == "gpt-4o" for r in requests)
+    assert requests[0]["body"]["messages"][-1]["content"] == "ticket 0"
+    custom_ids = [r["custom_id"] for r in requests]
+    assert len(set(custom_ids)) == 3
+
+    results = [
+        openai_result(custom_ids[0], '{"statuses": ["PENDING"]}'),
+        openai_result(custom_ids[1], '{"statuses": ["OPEN"]}'),
+        {
+            "custom_id": custom_ids[2],
+            "response": None,
+            "error": {"code": "batch_expired", "message": "expired"},
+        },
+    ]
+    results_path = tmp_path / "results.jsonl"
+    results_path.write_text("\n".join(json.dumps(r) for r in reversed(results)))
+
+    ((benchmark_class, metrics, finished),) = ingest_batch(
+        runner, [Tickets], str(results_path)
+    )
+    assert benchmark_class is Tickets
+    assert metrics["Accuracy"] == 1 / 3
+    assert [r["Final Accuracy"] for r in finished] == [True, False, False]
+
+
+def test_anthropic_batch_results_are_parsed():
+    client = AnthropicFCClient("key")
+    message = {
+        "id": "msg_0",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-5-sonnet-20241022",
+        "content": [{"type": "text", "text": "Done."}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 2},
+    }
+    custom_id, response = client.parse_batch_result(
+        {"custom_id": "a", "result": {"type": "succeeded", "message": message}}
+    )
+    assert (custom_id, response.content[0].text) == ("a", "Done.")
+
+    _, error = client.parse_batch_result(
+        {"custom_id": "b", "result": {"type": "errored", "error": {}}}
+    )
+    assert isinstance(error, BatchRequestError)
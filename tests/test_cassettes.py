@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from nexusbench.benchmarks import Sample, TicketTracking
+from nexusbench.cassettes import CassetteLibrary, CassetteMismatch, current_cassette
+from nexusbench.prompters import OpenAIFCPrompter
+
+
+def test_recorded_requests_are_replayed_in_order(tmp_path):
+    recorder = CassetteLibrary(str(tmp_path), "record")
+    with recorder.sample("config", "Bench", "sample") as cassette:
+        assert current_cassette.get() is cassette
+        cassette.record("first", {"content": 1})
+        cassette.record("second", {"content": 2})
+    assert current_cassette.get() is None
+    assert recorder.recorded == 1
+
+    replayer = CassetteLibrary(str(tmp_path), "replay")
+    with replayer.sample("config", "Bench", "sample") as cassette:
+        assert cassette.replay("first") == {"content": 1}
+        assert cassette.replay("second") == {"content": 2}
+        with pytest.raises(CassetteMismatch):
+            cassette.replay("third")
+    assert (replayer.replayed, replayer.interactions) == (1, 2)
+
+
+def test_changed_requests_and_missing_cassettes_fail(tmp_path):
+    with CassetteLibrary(str(tmp_path), "record").sample("c", "B", "s") as cassette:
+        cassette.record("key", "response")
+
+    replayer = CassetteLibrary(str(tmp_path), "replay")
+    with replayer.sample("c", "B", "s") as cassette:
+        with pytest.raises(CassetteMismatch):
+            cassette.replay("other key")
+    with pytest.raises(CassetteMismatch):
+        with replayer.sample("c", "B", "unrecorded"):
+            pass
+
+
+def test_failed_samples_are_not_recorded(tmp_path):
+    recorder = CassetteLibrary(str(tmp_path), "record")
+    with pytest.raises(RuntimeError):
+        with recorder.sample("c", "B", "s") as cassette:
+            cassette.record("key", "response")
+            raise RuntimeError("sample failed")
+    assert recorder.recorded == 0
+    assert not (tmp_path / "c").exists()
+
+
+def test_changed_prompt_is_a_sample_error_not_a_model_answer(tmp_path):
+    with CassetteLibrary(str(tmp_path), "record").sample("c", "B", "s") as cassette:
+        cassette.record("key of an older prompt", "response")
+
+    benchmark = TicketTracking()
+    prompter = OpenAIFCPrompter("key", "model", "http://127.0.0.1:1/v1")
+    sample = Sample("Show me the pending tickets", "search_tickets()")
+    descriptions = prompter.construct_tool_descriptions(benchmark, benchmark.tools)
+    inputs = (sample, descriptions, benchmark, prompter, "model")
+
+    replayer = CassetteLibrary(str(tmp_path), "replay")
+    with replayer.sample("c", "B", "s"):
+        with pytest.raises(CassetteMismatch):
+            benchmark.process_single_sample(inputs)
+    with replayer.sample("c", "B", "s"):
+        with pytest.raises(CassetteMismatch):
+            asyncio.run(benchmark.aprocess_single_sample(inputs))
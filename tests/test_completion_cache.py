@@ -0,0 +1,50 @@
+import pytest
+
+from nexusbench.completion_cache import CompletionCache, cache_key
+
+
+def test_keys_are_canonical():
+    payload = {"messages": [{"role": "user", "content": "hi"}], "temperature": 0.0}
+    reordered = {"temperature": 0.0, "messages": [{"content": "hi", "role": "user"}]}
+    assert cache_key("OpenAI", "m", None, payload) == cache_key(
+        "OpenAI", "m", None, reordered
+    )
+    assert cache_key("OpenAI", "m", None, payload) != cache_key(
+        "OpenAI", "m", "http://x/v1", payload
+    )
+
+
+def test_hits_misses_and_modes(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = CompletionCache(path, "readwrite")
+    assert cache.get("a") is None
+    cache.put("a", {"choices": [1]})
+    assert cache.get("a") == {"choices": [1]}
+    assert (cache.hits, cache.misses, cache.writes) == (1, 1, 1)
+
+    read_only = CompletionCache(path, "read")
+    read_only.put("b", "ignored")
+    assert read_only.get("a") == {"choices": [1]}
+    assert read_only.get("b") is None
+
+    write_only = CompletionCache(path, "write")
+    assert write_only.get("a") is None
+    write_only.put("a", "refreshed")
+    assert cache.get("a") == "refreshed"
+
+    with pytest.raises(ValueError):
+        CompletionCache(path, "sometimes")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CompletionCache(str(tmp_path / "cache.sqlite"), max_bytes=3000)
+    for key in "abc":
+        cache.put(key, "x" * 900)
+    # Reading "a" makes "b" the least recently used entry.
+    assert cache.get("a") is not None
+    cache.put("d", "x" * 900)
+
+    assert cache.evictions >= 1
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("d") is not None
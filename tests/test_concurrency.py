@@ -0,0 +1,96 @@
+import asyncio
+
+import time
+
+import pytest
+
+from nexusbench.concurrency import AdaptiveConcurrencyController
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_only_overload_errors_shrink_limit():
+    controller = AdaptiveConcurrencyController(initial_limit=8, max_limit=8)
+    for error in [ValueError("invalid tool schema"), Exception("overloaded_error")]:
+        controller.acquire()
+        controller.release(time.monotonic(), error)
+    assert controller.limit == 4
+    assert controller.num_overload_errors == 1
+
+
+def test_limit_grows_while_healthy_up_to_max():
+    controller = AdaptiveConcurrencyController(initial_limit=2, max_limit=4)
+    for _ in range(50):
+        with controller.slot():
+            pass
+    assert controller.limit == 4
+    assert controller.num_increases == 2
+
+
+def test_burst_of_overload_errors_halves_once():
+    controller = AdaptiveConcurrencyController(initial_limit=8, max_limit=8)
+    for _ in range(4):
+        controller.acquire()
+    started = time.monotonic()
+    for _ in range(4):
+        controller.release(started, RateLimitError("429"))
+
+    assert controller.limit == 4
+    assert controller.num_decreases == 1
+    assert controller.num_overload_errors == 4
+    assert controller.in_flight == 0
+
+
+def test_slot_releases_and_reraises():
+    controller = AdaptiveConcurrencyController(
+        initial_limit=4, max_limit=8, min_limit=3
+    )
+    with pytest.raises(RateLimitError):
+        with controller.slot():
+            raise RateLimitError("429")
+    assert controller.in_flight == 0
+    assert controller.limit == 3
+
+
+def test_rising_latency_shrinks_limit():
+    controller = AdaptiveConcurrencyController(
+        initial_limit=100, max_limit=100, latency_window=10
+    )
+    for _ in range(10):
+        controller.acquire()
+        controller.release(time.monotonic() - 0.01)
+    for _ in range(10):
+        controller.acquire()
+        controller.release(time.monotonic() - 1.0)
+    assert controller.limit < 100
+
+
+def test_waiting_coroutines_get_slots_in_order():
+    controller = AdaptiveConcurrencyController(initial_limit=1, max_limit=2)
+    order = []
+
+    async def request(i):
+        async with controller.aslot():
+            order.append(i)
+            await asyncio.sleep(0.001)
+
+    async def main():
+        tasks = [asyncio.create_task(request(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        # A cancelled waiter does not hold on to the slot it is handed.
+        tasks[1].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    assert order == [0, 2, 3, 4]
+    assert controller.in_flight == 0
+
+
+def test_limit_grows_from_one_up_to_its_ceiling():
+    controller = AdaptiveConcurrencyController(initial_limit=1, max_limit=4)
+    for _ in range(50):
+        controller.acquire()
+        controller.release(time.monotonic())
+    assert controller.limit == 4
@@ -0,0 +1,53 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from nexusbench.connections import ConnectionStats
+from nexusbench.prompters import MistralFCPrompter, OpenAIFCPrompter, QwenFCPrompter
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_kept_alive_connections_are_counted_once():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stats = ConnectionStats()
+    try:
+        with httpx.Client(**stats.http_client_kwargs(max_connections=1)) as client:
+            for _ in range(5):
+                client.get(f"http://127.0.0.1:{server.server_address[1]}/")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert stats.requests == 5
+    assert stats.opened == 1
+
+
+def test_prompter_reuses_its_client():
+    prompter = OpenAIFCPrompter("key", "model", "http://127.0.0.1:1/v1")
+    prompter.max_connections = 4
+    client = prompter.get_client()
+    assert prompter.get_client() is client
+    assert client.connection_stats is prompter.connection_stats
+    assert client.client is not prompter.create_client().client
+
+
+def test_only_clients_on_our_http_client_count_connections():
+    assert OpenAIFCPrompter("key", "model").counts_connections
+    # qwen-agent and MistralClient open connections on httpx clients of their own.
+    assert not QwenFCPrompter("key", "model").counts_connections
+    assert not MistralFCPrompter("key", "model").counts_connections
@@ -0,0 +1,130 @@
+import asyncio
+import sys
+import time
+import types
+
+import httpx
+
+from nexusbench.benchmarks import BaseBenchmark
+from nexusbench.clients import MistralFCClient, QwenFCClient
+from nexusbench.deadlines import Watchdog, deadline_context
+from nexusbench.scheduler import AsyncSampleScheduler, BenchmarkJob, SampleScheduler
+
+
+class SleepyPrompter:
+    def get_completion(self, prompt, model=None, contextual_history=None):
+        time.sleep(prompt)
+        return "done"
+
+    async def aget_completion(self, prompt, model=None, contextual_history=None):
+        await asyncio.sleep(prompt)
+        return "done"
+
+
+class TwoStepBenchmark(BaseBenchmark):
+    get_samples = tools = get_json_representation = None
+
+    def sample_steps(self, inputs):
+        delay = inputs[0]
+        yield delay, []
+        yield delay, []
+        return {"Final Accuracy": True, "context": []}
+
+
+def make_job(delays):
+    prompter = SleepyPrompter()
+    inputs = [(delay, None, None, prompter, None) for delay in delays]
+    return BenchmarkJob(TwoStepBenchmark, TwoStepBenchmark(), inputs)
+
+
+def test_sample_timeout_records_timeout_result():
+    job = make_job([0.01, 0.2])
+    SampleScheduler(max_concurrency=2, sample_timeout=0.1).run([job])
+    assert job.results[0] == {"Final Accuracy": True, "context": []}
+    assert job.results[1]["Timed Out"] and not job.results[1]["Final Accuracy"]
+
+
+def test_async_sample_is_cut_off_at_its_deadline():
+    job = make_job([0.01, 5])
+    started = time.monotonic()
+    AsyncSampleScheduler(max_concurrency=2, sample_timeout=0.1).run([job])
+    assert time.monotonic() - started < 1
+    assert "Timed Out" not in job.results[0]
+    assert job.results[1]["Timed Out"]
+
+
+def test_benchmark_timeout_times_out_remaining_samples():
+    job = make_job([0.05] * 10)
+    SampleScheduler(max_concurrency=1, benchmark_timeout=0.3).run([job])
+    timed_out = [r.get("Timed Out", False) for r in job.results]
+    assert 0 < sum(timed_out) < 10
+    assert timed_out == sorted(timed_out)
+
+
+class RecordingQwenModel:
+    def __init__(self):
+        self.kwargs = None
+
+    def chat(self, **kwargs):
+        self.kwargs = kwargs
+        yield [{"role": "assistant", "content": "done"}]
+
+
+class RecordingQwenClient(QwenFCClient):
+    def create_client(self, base_url=None):
+        return RecordingQwenModel()
+
+
+def test_qwen_request_timeout_is_capped_by_the_deadline():
+    client = RecordingQwenClient("key", None, "qwen", request_timeout=30)
+    with deadline_context(time.monotonic() + 5):
+        client.get_completion({"messages": [], "tools": []})
+    timeout = client.client.kwargs["extra_generate_cfg"]["request_timeout"]
+    assert 0 < timeout <= 5
+    # The timeout is not part of the request's cache key.
+    assert "request_timeout" not in str(
+        client.get_request_payload({"messages": [], "tools": []}, "qwen")
+    )
+
+
+class RecordingMistralClient:
+    """Stands in for mistralai's MistralClient, sending over an httpx client."""
+
+    def __init__(self, api_key, endpoint=None, max_retries=5, timeout=120):
+        self.timeouts = []
+        self._client = httpx.Client(
+            timeout=timeout, transport=httpx.MockTransport(self.handle)
+        )
+
+    def handle(self, request):
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        return httpx.Response(200, json={})
+
+    def chat(self, **kwargs):
+        return self._client.post("http://mistral/v1/chat/completions", json={})
+
+
+def test_mistral_request_timeout_is_capped_by_the_deadline(monkeypatch):
+    module = types.ModuleType("mistralai.client")
+    module.MistralClient = RecordingMistralClient
+    monkeypatch.setitem(sys.modules, "mistralai.client", module)
+
+    client = MistralFCClient("key", request_timeout=30)
+    client.get_completion({"messages": [], "tools": []})
+    with deadline_context(time.monotonic() + 5):
+        client.get_completion({"messages": [], "tools": []})
+    first, second = client.client.timeouts
+    assert first == 30 and 0 < second <= 5
+
+
+def test_watchdog_reports_longest_running_first():
+    watchdog = Watchdog(interval=60, top=1)
+    watchdog.start("slow")
+    time.sleep(0.01)
+    watchdog.start("fast")
+    report = watchdog.report()
+    assert "2 sample(s) in flight" in report
+    assert "slow" in report and "fast" not in report
+    watchdog.finish("slow")
+    watchdog.finish("fast")
+    assert watchdog.report() is None
@@ -0,0 +1,38 @@
+from nexusbench.benchmarks import BaseBenchmark
+from nexusbench.early_stopping import EarlyStopping, wilson_interval
+from nexusbench.scheduler import AsyncSampleScheduler, BenchmarkJob
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100)
+    assert 0.40 < low < 0.41 and 0.59 < high < 0.60
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(10, 10)
+    assert high == 1.0 and low > 0.6
+
+
+class CoinBenchmark(BaseBenchmark):
+    get_samples = tools = get_json_representation = None
+
+    def process_single_sample(self, inputs):
+        return {"Final Accuracy": inputs[0] % 2 == 0}
+
+    async def aprocess_single_sample(self, inputs):
+        return self.process_single_sample(inputs)
+
+
+def test_job_stops_once_interval_is_narrow():
+    job = BenchmarkJob(CoinBenchmark, CoinBenchmark(), [(i,) for i in range(1000)])
+    early_stopping = EarlyStopping(target_width=0.2, min_samples=30)
+
+    def on_result(job, index, result):
+        if early_stopping.update(job, result):
+            job.stopped = True
+
+    AsyncSampleScheduler(max_concurrency=1, on_result=on_result).run([job])
+
+    finished = job.finished_results()
+    assert 30 <= len(finished) < 200
+    low, high = early_stopping.interval(job)
+    assert high - low <= 0.2
+    assert low <= job.benchmark.get_metrics(finished)["Accuracy"] <= high
@@ -0,0 +1,50 @@
+import time
+
+from nexusbench.endpoints import EndpointPool, is_endpoint_failure, parse_base_urls
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_parse_base_urls():
+    assert parse_base_urls(None) == [None]
+    assert parse_base_urls("http://a/v1, http://b/v1") == ["http://a/v1", "http://b/v1"]
+
+
+def test_least_outstanding_requests():
+    pool = EndpointPool(["a", "b", "c"])
+    held = [pool.acquire() for _ in range(3)]
+    assert sorted(e.url for e in held) == ["a", "b", "c"]
+
+    pool.release(held[0])
+    assert pool.acquire() is held[0]
+
+
+def test_failing_endpoint_is_ejected_and_reinstated_after_probe():
+    pool = EndpointPool(
+        ["a", "b"], max_failures=2, probe_interval=0.01, probe=lambda url: False
+    )
+    bad = pool.endpoints[0]
+    bad.outstanding = 2
+    pool.release(bad, StatusError(503))
+    assert bad.healthy
+    pool.release(bad, StatusError(503))
+    assert not bad.healthy
+    assert all(pool.acquire().url == "b" for _ in range(5))
+
+    pool.probe = lambda url: True
+    deadline = time.monotonic() + 2
+    while not bad.healthy and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert bad.healthy
+
+
+def test_client_errors_do_not_count_against_endpoint():
+    assert is_endpoint_failure(StatusError(500))
+    assert is_endpoint_failure(TimeoutError())
+    assert not is_endpoint_failure(StatusError(429))
+    assert not is_endpoint_failure(StatusError(400))
+    assert not is_endpoint_failure(ValueError("bad arguments"))
@@ -0,0 +1,103 @@
+import threading
+
+import openai
+
+import pytest
+
+from nexusbench.benchmarks import LangChainTypeWriterHard, Sample, TicketTracking
+from nexusbench.entrypoint import BenchmarkRunner
+from nexusbench.fake_server import (
+    FakeServerConfig,
+    GroundTruthIndex,
+    create_fake_server,
+    parse_call,
+)
+
+
+def start(index, config=None):
+    server = create_fake_server(index, config, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_calls_are_converted_to_json_arguments():
+    parameters = {
+        "properties": {"city": {"type": "string"}, "days": {"type": "integer"}},
+        "required": ["city", "days"],
+    }
+    assert parse_call("weather('Paris', days=3)", parameters) == (
+        "weather",
+        {"city": "Paris", "days": 3},
+    )
+    # Arguments that are not literals are replaced by a placeholder.
+    assert parse_call("weather(city=lookup(1))", parameters) == (
+        "weather",
+        {"city": "", "days": 0},
+    )
+    assert parse_call("not a call", parameters) is None
+
+
+def test_shared_queries_are_told_apart_by_tools():
+    index = GroundTruthIndex()
+    index.add("Letters", "hi", ["h()", "i()"])
+    index.add("Typewriter", "hi", ["type_letter(letter='h')"])
+    assert index.lookup("hi", {"type_letter"}) == ["type_letter(letter='h')"]
+    assert index.lookup("hi ", {"h", "i"}) == ["h()", "i()"]
+    assert index.lookup("unknown", {"h"}) is None
+
+
+def test_runs_are_answered_from_the_ground_truth():
+    class Tickets(TicketTracking):
+        def get_samples(self):
+            return [
+                Sample(f"ticket {i}", "search_tickets(statuses=['PENDING'])")
+                for i in range(3)
+            ]
+
+    class Typewriter(LangChainTypeWriterHard):
+        def get_samples(self):
+            return [LangChainTypeWriterHard.MTHSample("a-b", "a-b", breadth=1)]
+
+    index = GroundTruthIndex()
+    index.add_benchmark(Tickets)
+    index.add_benchmark(Typewriter)
+    server, base_url = start(index)
+    try:
+        runner = BenchmarkRunner("OpenAI", "key", "fake", base_url, 4)
+        results = runner.run_benchmarks([Tickets, Typewriter])
+    finally:
+        server.shutdown()
+
+    assert [metrics["Accuracy"] for _, metrics, _ in results] == [1.0, 1.0]
+    stats = server.RequestHandlerClass.stats
+    # One request per ticket, and one per character plus the final answer.
+    assert (stats.requests, stats.answered) == (7, 7)
+
+
+def test_errors_are_injected():
+    server, base_url = start(GroundTruthIndex(), FakeServerConfig(error_rate=1.0))
+    try:
+        client = openai.OpenAI(api_key="key", base_url=base_url, max_retries=0)
+        with pytest.raises(openai.RateLimitError):
+            client.chat.completions.create(
+                model="fake", messages=[{"role": "user", "content": "hi"}]
+            )
+    finally:
+        server.shutdown()
+
+
+def test_asyncio_runs_without_num_samples_parallel():
+    class Tickets(TicketTracking):
+        def get_samples(self):
+            return [Sample("ticket", "search_tickets(statuses=['PENDING'])")]
+
+    index = GroundTruthIndex()
+    index.add_benchmark(Tickets)
+    server, base_url = start(index)
+    try:
+        runner = BenchmarkRunner("OpenAI", "key", "fake", base_url, engine="asyncio")
+        assert runner.max_concurrency == 32
+        ((_, metrics, _),) = runner.run_benchmarks([Tickets])
+    finally:
+        server.shutdown()
+    assert metrics["Accuracy"] == 1.0
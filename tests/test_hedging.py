@@ -0,0 +1,155 @@
+import asyncio
+import time
+
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from nexusbench.clients import BaseClient
+from nexusbench.concurrency import AdaptiveConcurrencyController
+from nexusbench.context import benchmark_context
+from nexusbench.hedging import HedgingPolicy
+from nexusbench.retries import with_retries
+from nexusbench.usage import sample_usage, track_call
+
+
+def warm_up(policy, key, latency=0.01):
+    for _ in range(policy.min_samples):
+        policy.run(key, lambda: time.sleep(latency), lambda: None)
+
+
+def test_no_hedge_before_enough_samples():
+    policy = HedgingPolicy(min_samples=3)
+    assert policy.delay("b") is None
+    warm_up(policy, "b")
+    assert policy.delay("b") is not None
+    assert policy.stats["b"].fired == 0
+
+
+def test_slow_request_is_hedged_and_hedge_wins():
+    policy = HedgingPolicy(min_samples=3)
+    warm_up(policy, "b")
+
+    started = time.monotonic()
+    result = policy.run("b", lambda: time.sleep(1) or "primary", lambda: "hedge")
+    assert result == "hedge"
+    assert time.monotonic() - started < 0.5
+    assert policy.stats["b"].fired == 1
+    assert policy.stats["b"].won == 1
+
+
+def test_failed_hedge_falls_back_to_primary():
+    policy = HedgingPolicy(min_samples=3)
+    warm_up(policy, "b")
+
+    def hedge():
+        raise ValueError("hedge failed")
+
+    assert policy.run("b", lambda: time.sleep(0.1) or "primary", hedge) == "primary"
+    assert policy.stats["b"].won == 0
+
+    def primary():
+        raise RuntimeError("primary failed")
+
+    with pytest.raises(RuntimeError):
+        policy.run("b", primary, hedge)
+
+
+def test_async_hedge_cancels_the_loser():
+    policy = HedgingPolicy(min_samples=3)
+    cancelled = []
+
+    async def fast():
+        await asyncio.sleep(0.01)
+        return "fast"
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "slow"
+
+    async def main():
+        for _ in range(3):
+            await policy.arun("b", fast, fast)
+        return await policy.arun("b", slow, fast)
+
+    assert asyncio.run(main()) == "fast"
+    assert cancelled == [True]
+    assert policy.stats["b"].won == 1
+
+
+class SleepyClient(BaseClient):
+    """
+    Answers after the next of `latencies`, with 100 input and 10 output tokens, and
+    as many tokens in total as milliseconds it took.
+    """
+
+    def __init__(self, latencies, **kwargs):
+        self.latencies = iter(latencies)
+        super().__init__("key", **kwargs)
+
+    def create_client(self, base_url=None):
+        return None
+
+    def get_completion_kwargs(self, prompt, model):
+        return {"prompt": prompt}
+
+    @with_retries
+    def get_completion(self, prompt, model=None, contextual_history=None):
+        with self.request_slot(prompt) as attempt:
+            attempt.response = self.send(attempt, model)
+        return attempt.response
+
+    def create_completion(self, client, prompt, model):
+        latency = next(self.latencies)
+        time.sleep(latency)
+        usage = SimpleNamespace(
+            prompt_tokens=100,
+            completion_tokens=10,
+            prompt_tokens_details=None,
+            total_tokens=round(latency * 1000),
+        )
+        return SimpleNamespace(usage=usage)
+
+
+class RecordingRateLimiter:
+    """Records the actual tokens every request is reconciled with."""
+
+    def __init__(self):
+        self.reconciled = []
+
+    def acquire(self, tokens):
+        pass
+
+    def reconcile(self, estimated, actual):
+        self.reconciled.append(actual)
+
+
+def test_losing_copy_holds_its_slot_and_is_billed():
+    policy = HedgingPolicy(min_samples=3)
+    policy.latencies[("b", "m")] = deque([0.01] * 3)
+    controller = AdaptiveConcurrencyController(initial_limit=4, max_limit=4)
+    rate_limiter = RecordingRateLimiter()
+    client = SleepyClient(
+        [0.5, 0.01],
+        hedging_policy=policy,
+        concurrency_controller=controller,
+        rate_limiter=rate_limiter,
+    )
+
+    with benchmark_context("b"), sample_usage() as calls, track_call():
+        client.get_completion("prompt", "m")
+
+    assert policy.stats[("b", "m")].won == 1
+    # The slow primary is still running, and still counts as in flight.
+    assert controller.in_flight == 1
+    assert (calls[0].duplicates, calls[0].input_tokens) == (1, 100)
+    assert rate_limiter.reconciled == [10]
+    time.sleep(0.6)
+    assert controller.in_flight == 0
+    # Each copy is reconciled once, with its own usage.
+    assert rate_limiter.reconciled == [10, 500]
@@ -0,0 +1,58 @@
+from nexusbench.benchmarks import Sample
+from nexusbench.journal import (
+    ResultJournal,
+    load_turn_counts,
+    run_config_key,
+    sample_id,
+)
+
+
+def test_sample_id_is_stable_and_distinct():
+    sample = Sample(query="What is 2 + 2?", reference="add(a=2, b=2)")
+    assert sample_id("LangChainMath", 0, sample) == sample_id(
+        "LangChainMath", 0, sample
+    )
+    assert sample_id("LangChainMath", 0, sample) != sample_id(
+        "LangChainMath", 1, sample
+    )
+    assert sample_id("LangChainMath", 0, sample) != sample_id(
+        "MultiverseMathHard", 0, sample
+    )
+
+
+def test_journal_round_trip(tmp_path):
+    config_key = run_config_key("OpenAI", "gpt-4o", None)
+    journal = ResultJournal(str(tmp_path))
+    result = {
+        "Final Accuracy": True,
+        "context": [{"previous_response": object(), "previous_call": "add(a=2, b=2)"}],
+    }
+    journal.append(config_key, "LangChainMath", "abc", result)
+    journal.append(config_key, "LangChainMath", "def", ValueError("failed"))
+
+    entries = ResultJournal.load(str(tmp_path))
+    assert list(entries) == [(config_key, "LangChainMath", "abc")]
+    loaded = entries[(config_key, "LangChainMath", "abc")]
+    assert loaded["Final Accuracy"] is True
+    assert loaded["context"][0]["previous_call"] == "add(a=2, b=2)"
+    assert isinstance(loaded["context"][0]["previous_response"], str)
+
+
+def test_journal_skips_torn_last_line(tmp_path):
+    journal = ResultJournal(str(tmp_path))
+    journal.append("cfg", "TicketTracking", "abc", {"Final Accuracy": False})
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"config": "cfg", "benchmark": "TicketTr')
+
+    entries = ResultJournal.load(str(tmp_path))
+    assert entries == {("cfg", "TicketTracking", "abc"): {"Final Accuracy": False}}
+
+
+def test_load_turn_counts(tmp_path):
+    for run, turns in (("a", 2), ("b", 4)):
+        journal = ResultJournal(str(tmp_path / run))
+        context = [{"previous_call": "add(a=1, b=2)"}] * turns
+        journal.append("cfg", "LangChainMath", "abc", {"context": context})
+
+    counts = load_turn_counts([str(tmp_path / "a"), str(tmp_path / "b")])
+    assert counts == {("LangChainMath", "abc"): 3.0}
@@ -0,0 +1,47 @@
+import asyncio
+
+import os
+
+import pytest
+
+from nexusbench.pipeline import (
+    CPUTask,
+    Pipeline,
+    pipeline_context,
+    run_cpu_task,
+)
+
+
+def test_cpu_tasks_run_in_worker_processes():
+    pipeline = Pipeline(2)
+    try:
+        assert pipeline.run(CPUTask(pow, (2, 10))) == 1024
+        assert pipeline.run(CPUTask(os.getpid)) != os.getpid()
+        assert asyncio.run(pipeline.arun(CPUTask(pow, (3, 2)))) == 9
+        assert pipeline.cpu_tasks == 3
+        assert pipeline.cpu_running.peak == 1
+        assert pipeline.cpu_queued.peak == 0
+    finally:
+        pipeline.close()
+
+
+def test_unpicklable_tasks_run_inline():
+    pipeline = Pipeline(1)
+    try:
+        with pipeline_context(pipeline):
+            assert run_cpu_task(CPUTask(lambda: os.getpid())) == os.getpid()
+    finally:
+        pipeline.close()
+
+
+def test_task_errors_are_raised():
+    pipeline = Pipeline(1)
+    try:
+        with pytest.raises(ValueError):
+            pipeline.run(CPUTask(int, ("not a number",)))
+    finally:
+        pipeline.close()
+
+
+def test_tasks_run_inline_without_pipeline():
+    assert run_cpu_task(CPUTask(os.getpid)) == os.getpid()
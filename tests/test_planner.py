@@ -0,0 +1,53 @@
+from nexusbench.benchmarks import ClimateBenchmark, Sample
+from nexusbench.entrypoint import BenchmarkRunner
+from nexusbench.planner import (
+    BenchmarkPlan,
+    estimate_wall_time,
+    get_prices,
+    plan_run,
+)
+
+
+class TinyClimate(ClimateBenchmark):
+    def get_samples(self):
+        return [
+            Sample(query=f"where am I {i}", reference=["get_current_location()"] * i)
+            for i in range(1, 4)
+        ]
+
+
+def test_plan_counts_turns_and_tokens_without_requests():
+    runner = BenchmarkRunner("OpenAI", "key", "gpt-4o", None, 4, 1)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("planning must not send requests")
+
+    runner.targets[0].prompter.get_completion = fail
+    (plan,), wall_time = plan_run(runner, [TinyClimate], output_tokens_per_turn=10)
+
+    # One turn per reference step, plus the call that ends the trajectory.
+    assert plan.samples == 3
+    assert plan.requests == 2 + 3 + 4
+    assert plan.max_turns == 4
+    assert plan.output_tokens == 9 * 10
+    # Later turns resend the history, so input tokens grow faster than turns.
+    assert plan.input_tokens > plan.requests * 10
+    assert plan.cost is not None and plan.cost > 0
+    assert wall_time == 4 * 2.0
+
+
+def test_prices_fall_back_to_overrides():
+    assert get_prices("gpt-4o") == (2.50, 10.00)
+    assert get_prices("my-checkpoint") is None
+    assert get_prices("my-checkpoint", 1.0) == (1.0, 0.0)
+    assert get_prices("gpt-4o", output_price=1.0) == (2.50, 1.0)
+
+
+def test_wall_time_respects_concurrency_and_rate_limits():
+    plans = [
+        BenchmarkPlan("A", "a", "OpenAI", samples=10, requests=100, max_turns=10),
+        BenchmarkPlan("B", "b", "Anthropic", samples=10, requests=20, max_turns=2),
+    ]
+    assert estimate_wall_time(plans, 10, 1.0) == 12
+    assert estimate_wall_time(plans, None, 1.0) == 10
+    assert estimate_wall_time(plans, 10, 1.0, {("OpenAI", None): (60, None)}) == 100
@@ -0,0 +1,110 @@
+import anthropic
+
+import openai
+
+from nexusbench.clients import AnthropicFCClient, OpenAIFCClient
+from nexusbench.context import benchmark_context
+from nexusbench.prompt_caching import CACHE_CONTROL, PromptCacheStats
+from nexusbench.prompters import AnthropicFCPrompter
+from nexusbench.usage import TokenUsage
+
+TOOLS = {
+    "get_weather": {
+        "name": "get_weather",
+        "description": "Weather of a city",
+        "parameters": {
+            "type": "object",
+            "properties": {"city": {"type": "string"}},
+            "required": ["city"],
+        },
+    },
+    "get_time": {"name": "get_time", "description": "Current time"},
+}
+
+
+def anthropic_message(content, **usage):
+    return anthropic.types.Message.model_validate(
+        {
+            "id": "msg_0",
+            "type": "message",
+            "role": "assistant",
+            "model": "claude-3-5-sonnet-20241022",
+            "content": content,
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 5, **usage},
+        }
+    )
+
+
+def test_static_prefix_is_marked_only_when_enabled():
+    plain = AnthropicFCPrompter("key").create_prompt(TOOLS, "weather?", "Be brief.")
+    assert "cache_control" not in str(plain)
+
+    prompt = AnthropicFCPrompter("key", prompt_caching=True).create_prompt(
+        TOOLS, "weather?", "Be brief."
+    )
+    assert "cache_control" not in prompt["tools"][0]
+    assert prompt["tools"][-1]["cache_control"] == CACHE_CONTROL
+    assert prompt["system"] == [
+        {"type": "text", "text": "Be brief.", "cache_control": CACHE_CONTROL}
+    ]
+    # A single-turn query is not cached.
+    assert prompt["messages"] == [{"role": "user", "content": "weather?"}]
+
+
+def test_agent_history_is_marked():
+    prompter = AnthropicFCPrompter("key", prompt_caching=True)
+    response = anthropic_message(
+        [{"type": "tool_use", "id": "toolu_0", "name": "get_time", "input": {}}]
+    )
+    history = [
+        {
+            "previous_query": "time?",
+            "previous_response": response,
+            "previous_result": "noon",
+        }
+    ]
+    prompt = prompter.create_prompt(TOOLS, "time?", "", history)
+
+    assert prompt["system"] == ""
+    *prefix, last = prompt["messages"]
+    assert last["content"][-1]["type"] == "tool_result"
+    assert last["content"][-1]["cache_control"] == CACHE_CONTROL
+    assert "cache_control" not in str(prefix)
+
+
+def test_cache_usage_is_recorded_per_benchmark():
+    stats = PromptCacheStats()
+    client = AnthropicFCClient("key", prompt_cache_stats=stats)
+    response = anthropic_message(
+        [{"type": "text", "text": "Done."}],
+        cache_read_input_tokens=900,
+        cache_creation_input_tokens=90,
+    )
+    assert client.get_token_usage(response) == TokenUsage(10, 5, 900, 90)
+
+    with benchmark_context("VirusTotalAgentic"):
+        with client.request_slot() as attempt:
+            attempt.response = response
+    assert stats.usage["VirusTotalAgentic"] == TokenUsage(10, 5, 900, 90)
+    assert "900 of 1000 input token(s) read from the cache (90.0%)" in stats.summary(
+        "claude"
+    )
+
+    completion = openai.types.chat.ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-0",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [],
+            "usage": {
+                "prompt_tokens": 2000,
+                "completion_tokens": 5,
+                "total_tokens": 2005,
+                "prompt_tokens_details": {"cached_tokens": 1536},
+            },
+        }
+    )
+    assert OpenAIFCClient("key").get_token_usage(completion) == TokenUsage(464, 5, 1536)
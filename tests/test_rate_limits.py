@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from nexusbench.deadlines import SampleTimeout, deadline_context
+from nexusbench.rate_limits import RateLimiter, TokenBucket
+
+
+def test_bucket_admits_burst_then_asks_to_wait():
+    bucket = TokenBucket(rate_per_minute=60, burst_seconds=2)
+    assert bucket.try_consume(1) == 0
+    assert bucket.try_consume(1) == 0
+    wait = bucket.try_consume(1)
+    assert 0 < wait <= 1.0
+
+
+def test_oversized_request_is_admitted_when_full():
+    bucket = TokenBucket(rate_per_minute=600, burst_seconds=1)
+    assert bucket.try_consume(100) == 0
+    assert bucket.tokens < 0
+    assert bucket.try_consume(1) > 0
+
+
+def test_rate_limiter_paces_requests():
+    limiter = RateLimiter(requests_per_minute=1200)
+    limiter.requests.capacity = limiter.requests.tokens = 1
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.monotonic() - started >= 0.14
+    assert limiter.total_wait > 0
+
+
+def test_token_bucket_reconciles_with_actual_usage():
+    limiter = RateLimiter(tokens_per_minute=6000)
+    limiter.acquire(100)
+    before = limiter.tokens.tokens
+    limiter.reconcile(estimated_tokens=100, actual_tokens=400)
+    assert limiter.tokens.tokens < before - 250
+
+
+def test_rejected_token_draw_refunds_request():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60)
+    limiter.tokens.tokens = 0
+    requests_before = limiter.requests.tokens
+    assert limiter._try_acquire(10) > 0
+    assert abs(limiter.requests.tokens - requests_before) < 0.1
+
+
+def test_throttled_sample_stops_at_its_deadline():
+    limiter = RateLimiter(requests_per_minute=6)
+    limiter.requests.tokens = 0
+    started = time.monotonic()
+    with deadline_context(started + 0.1):
+        with pytest.raises(SampleTimeout):
+            limiter.acquire()
+    assert time.monotonic() - started < 1.0
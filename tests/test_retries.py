@@ -0,0 +1,99 @@
+import types
+
+import pytest
+
+from nexusbench.retries import (
+    CONNECTION_ERROR,
+    FATAL,
+    OVERLOADED,
+    RATE_LIMITED,
+    SERVER_ERROR,
+    TIMEOUT,
+    RetryPolicy,
+    classify_error,
+    get_retry_after,
+    with_retries,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(headers=headers or {})
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+class APITimeoutError(APIConnectionError):
+    pass
+
+
+def test_errors_are_classified():
+    assert classify_error(StatusError(400)) == FATAL
+    assert classify_error(StatusError(429)) == RATE_LIMITED
+    assert classify_error(StatusError(529)) == OVERLOADED
+    assert classify_error(StatusError(502)) == SERVER_ERROR
+    assert classify_error(APITimeoutError()) == TIMEOUT
+    assert classify_error(ConnectionResetError()) == CONNECTION_ERROR
+    assert classify_error(APIConnectionError()) == CONNECTION_ERROR
+    assert classify_error(TypeError("unexpected keyword argument")) == FATAL
+
+
+def test_retry_after_is_honored():
+    assert get_retry_after(StatusError(429, {"retry-after": "7"})) == 7.0
+    assert get_retry_after(StatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert get_retry_after(StatusError(429)) is None
+
+    policy = RetryPolicy(max_delay=1.0)
+    e = StatusError(429, {"retry-after": "5"})
+    assert 5.0 <= policy.next_delay(e, RATE_LIMITED, 0) <= 5.5
+
+
+def test_delays_back_off_and_give_up():
+    policy = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=3.0)
+    e = StatusError(500)
+    assert policy.next_delay(StatusError(400), FATAL, 0) is None
+    assert policy.next_delay(ConnectionResetError(), CONNECTION_ERROR, 0) == 0.0
+    assert all(0 <= policy.next_delay(e, SERVER_ERROR, r) <= 3.0 for r in range(3))
+    assert policy.next_delay(e, SERVER_ERROR, 3) is None
+    assert policy.failures == {FATAL: 1, SERVER_ERROR: 1}
+
+
+def test_retries_are_capped_by_the_run_budget():
+    policy = RetryPolicy(budget_ratio=0.5, min_budget=1)
+    for _ in range(4):
+        policy.record_request()
+    e = StatusError(500)
+    assert [policy.next_delay(e, SERVER_ERROR, 0) is not None for _ in range(4)] == [
+        True,
+        True,
+        True,
+        False,
+    ]
+    assert policy.budget_exhausted == 1
+
+
+def test_client_methods_are_retried():
+    class Client:
+        retry_policy = RetryPolicy(base_delay=0.0)
+        classify_error = staticmethod(classify_error)
+        calls = 0
+
+        @with_retries
+        def get_completion(self, fail_with):
+            self.calls += 1
+            if self.calls < 3:
+                raise fail_with
+            return "completion"
+
+    client = Client()
+    assert client.get_completion(StatusError(503)) == "completion"
+    assert client.calls == 3
+
+    client = Client()
+    with pytest.raises(StatusError):
+        client.get_completion(StatusError(400))
+    assert client.calls == 1
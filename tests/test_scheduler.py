@@ -0,0 +1,110 @@
+import asyncio
+
+import threading
+
+import time
+
+from nexusbench.scheduler import AsyncSampleScheduler, BenchmarkJob, SampleScheduler
+
+
+class SleepyBenchmark:
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def process_single_sample(self, inputs):
+        value, delay = inputs
+        with self.tracker["lock"]:
+            self.tracker["in_flight"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["in_flight"])
+        time.sleep(delay)
+        with self.tracker["lock"]:
+            self.tracker["in_flight"] -= 1
+        if value < 0:
+            raise ValueError("negative sample")
+        return {"value": value}
+
+
+def make_tracker():
+    return {"lock": threading.Lock(), "in_flight": 0, "peak": 0}
+
+
+def test_results_keep_input_order():
+    tracker = make_tracker()
+    job = BenchmarkJob(
+        SleepyBenchmark,
+        SleepyBenchmark(tracker),
+        [(i, 0.02 * (5 - i)) for i in range(5)],
+    )
+    SampleScheduler(max_concurrency=5).run([job])
+    assert [r["value"] for r in job.results] == list(range(5))
+
+
+def test_global_concurrency_cap_across_benchmarks():
+    tracker = make_tracker()
+    jobs = [
+        BenchmarkJob(
+            SleepyBenchmark, SleepyBenchmark(tracker), [(i, 0.01) for i in range(8)]
+        )
+        for _ in range(3)
+    ]
+    SampleScheduler(max_concurrency=4).run(jobs)
+    assert tracker["peak"] <= 4
+    assert all(len(job.results) == 8 for job in jobs)
+
+
+def test_work_order_interleaves_benchmarks():
+    jobs = [
+        BenchmarkJob(SleepyBenchmark, None, [(0, 0)] * 3),
+        BenchmarkJob(SleepyBenchmark, None, [(0, 0)] * 1),
+    ]
+    order = SampleScheduler(max_concurrency=1).get_work_order(jobs)
+    assert order == [(0, 0), (1, 0), (0, 1), (0, 2)]
+
+
+def test_exceptions_are_recorded_per_sample():
+    tracker = make_tracker()
+    job = BenchmarkJob(
+        SleepyBenchmark, SleepyBenchmark(tracker), [(1, 0), (-1, 0), (2, 0)]
+    )
+    SampleScheduler(max_concurrency=2).run([job])
+    assert job.results[0] == {"value": 1}
+    assert isinstance(job.results[1], ValueError)
+    assert job.results[2] == {"value": 2}
+
+
+class AsyncEchoBenchmark:
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def aprocess_single_sample(self, inputs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return {"value": inputs}
+
+
+def test_async_scheduler_runs_coroutines_under_cap():
+    benchmark = AsyncEchoBenchmark()
+    job = BenchmarkJob(AsyncEchoBenchmark, benchmark, list(range(50)))
+    AsyncSampleScheduler(max_concurrency=20).run([job])
+    assert [r["value"] for r in job.results] == list(range(50))
+    assert benchmark.peak == 20
+
+
+def test_work_order_starts_most_expensive_samples_first():
+    tracker = make_tracker()
+    short = BenchmarkJob(
+        SleepyBenchmark, SleepyBenchmark(tracker), [(i, 0) for i in range(3)]
+    )
+    long = BenchmarkJob(
+        SleepyBenchmark,
+        SleepyBenchmark(tracker),
+        [(i, 0) for i in range(3)],
+        costs=[2.0, 9.0, 5.0],
+    )
+    long.completed.add(2)
+
+    work = SampleScheduler(max_concurrency=1).get_work_order([short, long])
+    assert work == [(1, 1), (1, 0), (0, 0), (0, 1), (0, 2)]
@@ -0,0 +1,158 @@
+import json
+
+import threading
+
+import types
+
+import urllib.request
+
+import pytest
+
+from nexusbench.benchmarks import Sample, TicketTracking
+from nexusbench.prompters import OpenAIFCPrompter
+from nexusbench.entrypoint import SharedClients
+from nexusbench.server import DatasetCache, create_server, job_events
+
+
+def fake_completion(self, prompt, model=None, contextual_history=None):
+    call = types.SimpleNamespace(
+        id="c1",
+        type="function",
+        function=types.SimpleNamespace(
+            name="search_tickets", arguments=json.dumps({"statuses": ["PENDING"]})
+        ),
+    )
+    message = types.SimpleNamespace(role="assistant", content="", tool_calls=[call])
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+async def afake_completion(self, prompt, model=None, contextual_history=None):
+    return fake_completion(self, prompt, model, contextual_history)
+
+
+def post(url, body):
+    request = urllib.request.Request(
+        url, json.dumps(body).encode(), {"Content-Type": "application/json"}
+    )
+    return urllib.request.urlopen(request, timeout=30)
+
+
+def test_jobs_stream_results_and_reuse_cached_samples(monkeypatch):
+    monkeypatch.setattr(OpenAIFCPrompter, "get_completion", fake_completion)
+    loads = []
+
+    class CountingTicketTracking(TicketTracking):
+        def get_samples(self):
+            loads.append(1)
+            return [
+                Sample(f"ticket {i}", "search_tickets(statuses=['PENDING'])")
+                for i in range(3)
+            ]
+
+    # Jobs name benchmarks by their class name, so the cache is keyed by the real one.
+    cache = DatasetCache()
+    cache.benchmarks[TicketTracking] = (
+        CountingTicketTracking(),
+        CountingTicketTracking().get_samples(),
+    )
+    shared_clients = SharedClients()
+    server = create_server(port=0, dataset_cache=cache, shared_clients=shared_clients)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        job = {
+            "client": "OpenAI",
+            "api_key": "key",
+            "model": "m",
+            "suite": "per_task",
+            "benchmarks": ["TicketTracking"],
+            "limit": 2,
+            "max_concurrency": 2,
+        }
+        for _ in range(2):
+            with post(f"{url}/jobs", job) as response:
+                events = [json.loads(line) for line in response]
+
+            kinds = [event["event"] for event in events]
+            assert kinds[0] == "started" and kinds[-1] == "done"
+            results = [e for e in events if e["event"] == "result"]
+            assert sorted(e["index"] for e in results) == [0, 1]
+            assert all(e["result"]["Final Accuracy"] for e in results)
+            (metrics,) = [e for e in events if e["event"] == "metrics"]
+            assert metrics["metrics"]["Accuracy"] == 1.0
+
+        assert len(loads) == 1
+        # Both jobs sent their requests with the same prompter and its clients.
+        assert list(shared_clients.prompters) == [("OpenAI", "m", None, "key")]
+
+        with urllib.request.urlopen(f"{url}/benchmarks") as response:
+            assert json.load(response) == {"cached": ["TicketTracking"]}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_jobs_run_under_the_daemons_concurrency_cap(monkeypatch):
+    monkeypatch.setattr(OpenAIFCPrompter, "aget_completion", afake_completion)
+    cache = DatasetCache()
+    samples = [Sample("ticket", "search_tickets(statuses=['PENDING'])")]
+    cache.benchmarks[TicketTracking] = (TicketTracking(), samples)
+    shared_clients = SharedClients(8)
+    server = create_server(
+        port=0,
+        dataset_cache=cache,
+        shared_clients=shared_clients,
+        run_options={"adaptive_concurrency": True},
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        job = {
+            "client": "OpenAI",
+            "api_key": "key",
+            "model": "m",
+            "benchmarks": ["TicketTracking"],
+            "engine": "asyncio",
+        }
+        for asked, granted in ((None, 8), (100, 8), (2, 2)):
+            with post(f"{url}/jobs", {**job, "max_concurrency": asked}) as response:
+                events = [json.loads(line) for line in response]
+            assert events[0]["max_concurrency"] == granted
+            assert events[-1]["event"] == "done"
+        (controller,) = shared_clients.concurrency_controllers.values()
+        assert controller.max_limit == 8
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_invalid_jobs_are_rejected():
+    server = create_server(port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            post(f"{url}/jobs", {"client": "OpenAI", "bogus_option": 1})
+        assert e.value.code == 400
+        assert "bogus_option" in json.load(e.value)["error"]
+
+        for option in ({"hedge": True}, {"run_dir": "runs/a"}):
+            with pytest.raises(urllib.error.HTTPError) as e:
+                post(f"{url}/jobs", {"client": "OpenAI", **option})
+            assert e.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_job_paths_are_kept_within_the_jobs_dir(tmp_path):
+    cache = DatasetCache()
+    job = {"client": "OpenAI", "benchmarks": ["TicketTracking"]}
+    job_events({**job, "run_dir": "runs/a"}, cache, jobs_dir=tmp_path)
+    for path in ("../elsewhere", "/tmp/run", "runs/../../elsewhere"):
+        with pytest.raises(ValueError, match="outside of the jobs dir"):
+            job_events({**job, "run_dir": path}, cache, jobs_dir=tmp_path)
+    with pytest.raises(ValueError, match="outside of the jobs dir"):
+        job_events(
+            {**job, "cost_history": ["ok", "/etc/passwd"]}, cache, jobs_dir=tmp_path
+        )
@@ -0,0 +1,57 @@
+import pytest
+
+from nexusbench.benchmarks import TicketTracking
+from nexusbench.entrypoint import merge_runs
+from nexusbench.journal import ResultJournal, run_config_key
+from nexusbench.sharding import merge_journals, parse_shard, shard_of
+
+
+def test_parse_shard():
+    assert parse_shard("0/4") == (0, 4)
+    assert parse_shard("3/4") == (3, 4)
+    for bad in ("4/4", "-1/2", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_shards_partition_samples():
+    sids = [f"sample-{i}" for i in range(200)]
+    shards = [shard_of("TicketTracking", sid, 3) for sid in sids]
+    assert shards == [shard_of("TicketTracking", sid, 3) for sid in sids]
+    assert set(shards) == {0, 1, 2}
+
+
+def test_merge_journals_dedupes_samples(tmp_path):
+    for name, sids in (("s0", ["a", "b"]), ("s1", ["b", "c"])):
+        journal = ResultJournal(str(tmp_path / name))
+        for sid in sids:
+            journal.append("cfg", "TicketTracking", sid, {"Final Accuracy": True})
+
+    merged = merge_journals([str(tmp_path / "s0"), str(tmp_path / "s1")])
+    assert list(merged) == ["cfg"]
+    assert len(merged["cfg"]["TicketTracking"]) == 3
+
+
+def test_merged_shards_report_the_metrics_of_a_run(tmp_path):
+    usage = [{"input_tokens": 1000, "output_tokens": 100, "latency": 1.0}]
+    results = {
+        "s0": {"a": {"Final Accuracy": True, "Usage": usage}},
+        "s1": {"b": {"Final Accuracy": False, "Timed Out": True, "Usage": usage}},
+    }
+    config_key = run_config_key("OpenAI", "gpt-4o", None)
+    for name, shard in results.items():
+        journal = ResultJournal(str(tmp_path / name))
+        journal.write_config(
+            {"client": ["OpenAI"], "model": ["gpt-4o"], "base_url": [None]}
+        )
+        for sid, result in shard.items():
+            journal.append(config_key, "TicketTracking", sid, result)
+
+    merged = merge_runs([str(tmp_path / "s0"), str(tmp_path / "s1")])
+    ((benchmark_class, metrics, _),) = merged["gpt-4o"]
+    assert benchmark_class is TicketTracking
+    assert metrics["Accuracy"] == 0.5
+    assert metrics["Timed Out"] == 0.5
+    assert metrics["Input Tokens"] == 2000
+    # 2000 input tokens at $2.50 and 200 output tokens at $10 per million
+    assert metrics["Cost ($)"] == pytest.approx(0.007)
@@ -0,0 +1,83 @@
+import threading
+
+import anthropic
+
+import pydantic
+
+from nexusbench.benchmarks import Sample, TicketTracking
+from nexusbench.entrypoint import BenchmarkRunner
+from nexusbench.fake_server import (
+    FakeModelHandler,
+    FakeServerConfig,
+    GroundTruthIndex,
+    create_fake_server,
+)
+from nexusbench.streaming import AnthropicStreamAccumulator, StreamTimer
+
+
+class Tickets(TicketTracking):
+    def get_samples(self):
+        return [
+            Sample(f"ticket {i}", "search_tickets(statuses=['PENDING'])")
+            for i in range(3)
+        ]
+
+
+def test_streamed_runs_stop_after_the_tool_call():
+    index = GroundTruthIndex()
+    index.add_benchmark(Tickets)
+    config = FakeServerConfig(latency=0.01, token_latency=0.001, output_tokens=50)
+    server = create_fake_server(index, config, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        runner = BenchmarkRunner("OpenAI", "key", "fake", base_url, 2, stream=True)
+        ((_, metrics, _),) = runner.run_benchmarks([Tickets])
+    finally:
+        server.shutdown()
+
+    assert metrics["Accuracy"] == 1.0
+    stats = runner.targets[0].prompter.stream_stats
+    assert stats.responses == {"Tickets": 3}
+    assert stats.cut_off == {"Tickets": 3}
+    assert all(ttft >= 0.01 for ttft in stats.time_to_first_token["Tickets"])
+    assert "3 cut off after the first tool call" in stats.summary("fake")
+
+
+def anthropic_events(content):
+    handler = FakeModelHandler.__new__(FakeModelHandler)
+    response = handler.anthropic_response("claude", content, 10, 5)
+    adapter = pydantic.TypeAdapter(anthropic.types.RawMessageStreamEvent)
+    return [
+        adapter.validate_python(data)
+        for _, data in FakeModelHandler.anthropic_events(response)
+    ]
+
+
+def test_anthropic_events_build_a_message():
+    accumulator = AnthropicStreamAccumulator()
+    events = anthropic_events(("get_weather", {"city": "Paris", "days": 3}))
+    for position, event in enumerate(events):
+        if accumulator.add(event):
+            break
+    # Cut off at the end of the tool use, before the message's final events.
+    assert events[position].type == "content_block_stop"
+    assert position < len(events) - 1
+    accumulator.cut_off = True
+    message = accumulator.result()
+    assert message.stop_reason == "tool_use"
+    assert message.content[0].input == {"city": "Paris", "days": 3}
+
+    accumulator = AnthropicStreamAccumulator()
+    assert not any(accumulator.add(event) for event in anthropic_events(None))
+    message = accumulator.result()
+    assert (message.content[0].text, message.usage.output_tokens) == ("Done.", 5)
+
+
+def test_timer_measures_first_and_inter_token_latency():
+    timer = StreamTimer()
+    assert timer.time_to_first_token is None
+    timer.started, timer.chunks = 0.0, 3
+    timer.first, timer.last = 0.5, 0.7
+    assert timer.time_to_first_token == 0.5
+    assert abs(timer.inter_token_latency - 0.1) < 1e-9
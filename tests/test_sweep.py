@@ -0,0 +1,25 @@
+import pytest
+
+from nexusbench.entrypoint import BenchmarkRunner, expand_targets
+
+
+def test_expand_targets_broadcasts_single_values():
+    assert expand_targets(["OpenAI"], ["a", "b"], ["http://x/v1"]) == [
+        ("OpenAI", "a", "http://x/v1"),
+        ("OpenAI", "b", "http://x/v1"),
+    ]
+    assert expand_targets(["OpenAI", "Anthropic"], ["a", "b"], [None]) == [
+        ("OpenAI", "a", None),
+        ("Anthropic", "b", None),
+    ]
+    with pytest.raises(ValueError):
+        expand_targets(["OpenAI"], ["a", "b", "c"], ["x", "y"])
+
+
+def test_runner_builds_one_target_per_model():
+    runner = BenchmarkRunner(
+        "OpenAI", "key", ["a", "b", "a"], ["http://x/v1", "http://x/v1", "http://y/v1"]
+    )
+    assert [t.label for t in runner.targets] == ["a@http://x/v1", "b", "a@http://y/v1"]
+    assert len({t.config_key for t in runner.targets}) == 3
+    assert len({id(t.prompter) for t in runner.targets}) == 3
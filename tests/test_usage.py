@@ -0,0 +1,83 @@
+import pytest
+
+from nexusbench.streaming import OpenAIStreamAccumulator
+from nexusbench.usage import (
+    CallUsage,
+    attach_usage,
+    count_retry,
+    sample_usage,
+    track_call,
+    usage_metrics,
+)
+from nexusbench.utils import format_metric, summarize_metric
+
+
+def test_calls_of_a_sample_are_recorded():
+    with sample_usage() as calls:
+        with track_call() as call:
+            count_retry()
+            count_retry()
+        with pytest.raises(RuntimeError):
+            with track_call():
+                raise RuntimeError("out of retries")
+        with track_call(from_cache=True):
+            pass
+    # Outside of a request or a sample, nothing is recorded.
+    count_retry()
+    with track_call():
+        pass
+
+    assert calls[0] is call and call.retries == 2 and not call.failed
+    assert calls[1].failed
+    assert calls[2].from_cache and calls[2].latency == 0.0
+    assert len(calls) == 3
+
+    result = attach_usage({"Accuracy": 1.0}, calls)
+    assert result["Usage"][0]["retries"] == 2
+    assert attach_usage({"Accuracy": 1.0}, []) == {"Accuracy": 1.0}
+    assert attach_usage(None, calls) is None
+
+
+def test_metrics_price_cached_tokens_and_skip_cache_hits():
+    sent = CallUsage(100, 10, 900, 0, latency=1.0, retries=1)
+    cached = CallUsage(1000, 10, latency=0.0, from_cache=True)
+    results = [
+        attach_usage({}, [sent, CallUsage(1000, 10, latency=3.0)]),
+        attach_usage({}, [cached]),
+        None,
+    ]
+    metrics = usage_metrics(results, (2.0, 10.0), cache_read_price=0.5)
+
+    assert (metrics["Input Tokens"], metrics["Output Tokens"]) == (3000, 30)
+    assert metrics["Input Tokens / Sample"] == 1500
+    assert metrics["Output Tokens / Sample"] == 15
+    assert metrics["Cached Input"] == 0.3
+    assert metrics["Retries / Request"] == 0.5
+    assert metrics["Latency p95 (s)"] == 3.0
+    # (100 + 900 * 0.5 + 1000) * $2 + 20 * $10 per million tokens
+    assert metrics["Cost ($)"] == pytest.approx(3300 / 1e6)
+
+    assert "Cost ($)" not in usage_metrics(results)
+    assert not usage_metrics([{"Accuracy": 1.0}])
+
+
+def test_cut_off_streams_estimate_their_usage():
+    accumulator = OpenAIStreamAccumulator(estimated_input_tokens=120)
+    accumulator.completion.update(id="chatcmpl-0", created=0, model="gpt-4o")
+    accumulator.timer.chunks = 7
+    accumulator.cut_off = True
+    usage = accumulator.result().usage
+    assert (usage.prompt_tokens, usage.completion_tokens) == (120, 7)
+
+
+def test_metrics_are_formatted_by_kind():
+    assert format_metric("Accuracy", 0.5) == "50.00%"
+    assert format_metric("Cost ($)", 1.5) == "$1.5000"
+    assert format_metric("Input Tokens / Sample", 1234.4) == "1,234"
+
+
+def test_costs_and_tokens_add_up_across_benchmarks():
+    assert summarize_metric("Cost ($)", [1.0, 2.0]) == 3.0
+    assert summarize_metric("Output Tokens", [10.0, 30.0]) == 40.0
+    assert summarize_metric("Accuracy", [0.5, 1.0]) == 0.75
+    assert summarize_metric("Accuracy / $", [10.0, 30.0]) == 20.0
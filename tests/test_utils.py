@@ -0,0 +1,53 @@
+import threading
+
+import time
+
+from nexusbench.utils import parallel_map
+
+
+def test_parallel_map_tags_results_with_input_index():
+    delays = [0.05, 0.0, 0.03, 0.01]
+
+    def work(delay):
+        time.sleep(delay)
+        return delay
+
+    pairs = list(parallel_map(work, delays, max_workers=4))
+    assert sorted(idx for idx, _ in pairs) == [0, 1, 2, 3]
+    assert all(delays[idx] == result for idx, result in pairs)
+    # Results stream back in completion order, not input order.
+    assert pairs[0][0] == 1
+
+
+def test_parallel_map_yields_exceptions_and_calls_back():
+    seen = []
+
+    def work(x):
+        if x == 2:
+            raise ValueError("bad item")
+        return x * 10
+
+    results = dict(
+        parallel_map(
+            work, [1, 2, 3], max_workers=2, on_result=lambda i, r: seen.append(i)
+        )
+    )
+    assert results[0] == 10 and results[2] == 30
+    assert isinstance(results[1], ValueError)
+    assert sorted(seen) == [0, 1, 2]
+
+
+def test_parallel_map_cancels_pending_items_when_closed():
+    started = []
+    lock = threading.Lock()
+
+    def work(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.02)
+        return x
+
+    stream = parallel_map(work, range(20), max_workers=2)
+    next(stream)
+    stream.close()
+    assert len(started) < 20